@@ -1,14 +1,26 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from datetime import datetime, timedelta
-import jwt
+from flask_socketio import SocketIO, ConnectionRefusedError, join_room
+from functools import wraps
+from werkzeug.exceptions import RequestEntityTooLarge
 from config import Config
-from database import db
+# Same modules the services use, so each worker has a single client manager
+from backend.database import storage_stats
+from backend.concurrency import cooperative
+from backend.metrics import REGISTRY, create_profiler, init_app as init_metrics
 from services.scraper_service import ScraperService
 from services.recommendation_service import RecommendationService
 from services.analytics_service import AnalyticsService
-from firebase_config import get_all_users, get_user_by_id, create_user, update_user, delete_user
-from services.auth_service import AuthService
+from services.live_analytics import LiveAnalytics
+from services.user_repository import ADMIN_ROLE, FirestoreUserRepository, MongoUserRepository, \
+    create_user_repository, migrate_users, public_user
+from services.auth_service import AuthService, AuthError
+from services.job_service import JobService
+from services.interaction_service import InteractionService, InteractionError
+from services.scrape_history import ScrapeHistory, SUMMARY_FIELDS
+from services.bulk_onboarding import BulkOnboarding, BulkSignupError, parse_upload
+import click
+import itertools
 import os
 from dotenv import load_dotenv
 
@@ -16,27 +28,97 @@ from dotenv import load_dotenv
 load_dotenv()
 
 app = Flask(__name__)
+# Caps every request body, including chunked ones that send no Content-Length.
+# The upload routes are the only ones that take large bodies. A chunked body
+# is cut off at the cap rather than rejected, so the cap is one byte over
+# their limits and a cut-off body still fails their size checks.
+app.config['MAX_CONTENT_LENGTH'] = max(Config.INTERACTION_MAX_BYTES, Config.BULK_SIGNUP_MAX_BYTES) + 1
+
+CORS_ORIGINS = ["http://localhost:8080", "https://reccyai2.vercel.app"]
 
 # Configure CORS
 CORS(app, resources={
+    # The tracking snippet posts from customer sites, so any origin may send events
+    r"/track-interaction": {
+        "origins": "*",
+        "methods": ["POST", "OPTIONS"],
+        "allow_headers": ["Content-Type", "X-User-Id"]
+    },
     r"/*": {
-        "origins": ["http://localhost:8080", "https://reccyai2.vercel.app"],
+        "origins": CORS_ORIGINS,
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         "allow_headers": ["Content-Type", "Authorization"]
     }
 })
 
+# Live dashboard updates; WebSockets need the eventlet server mode (see gunicorn.conf.py)
+socketio = SocketIO(
+    app,
+    cors_allowed_origins=CORS_ORIGINS,
+    async_mode='eventlet' if cooperative() else 'threading',
+    message_queue=Config.SOCKETIO_MESSAGE_QUEUE
+)
+live_analytics = LiveAnalytics(
+    lambda event, data, room: socketio.emit(event, data, to=room, namespace='/analytics'),
+    local_only=not Config.SOCKETIO_MESSAGE_QUEUE
+)
+
 # Initialize services
 scraper_service = ScraperService()
 recommendation_service = RecommendationService()
-analytics_service = AnalyticsService()
-auth_service = AuthService()
+analytics_service = AnalyticsService(listeners=[live_analytics.record])
+user_repository = create_user_repository()
+auth_service = AuthService(user_repository)
+job_service = JobService()
+interaction_service = InteractionService(user_repository)
+scrape_history = ScrapeHistory(user_repository)
+bulk_onboarding = BulkOnboarding(auth_service, scraper_service, recommendation_service, scrape_history, job_service)
+
+# Per-route latency histograms (GET /metrics) and the opt-in slow request profiler
+init_metrics(app, create_profiler())
+REGISTRY.gauge('live_analytics_dashboards', 'Dashboards connected to this worker',
+               lambda: [((), live_analytics.stats()['dashboards'])])
+REGISTRY.gauge('cache_entries', 'Entries held by in-process caches',
+               lambda: [(('recommendations',), len(recommendation_service.cache)),
+                        (('auth_tokens',), len(auth_service.token_cache))], ('cache',))
+REGISTRY.gauge('cache_hit_ratio', 'Hit ratio of in-process caches',
+               lambda: [(('recommendations',), recommendation_service.cache_stats()['hit_rate']),
+                        (('auth_tokens',), auth_service.token_cache.stats()['hit_rate'])], ('cache',))
+
+def is_admin():
+    """Whether the authenticated user has the admin role (looked up once per request)"""
+    if 'is_admin' not in g:
+        user = user_repository.get(g.user_id, fields=['role'])
+        g.is_admin = bool(user) and user.get('role') == ADMIN_ROLE
+    return g.is_admin
+
+def require_auth(view):
+    """
+    Verify the request's token once and put its user_id on flask.g.
+    Routes with a <user_id> in their URL are limited to that user's own token
+    (or an admin's).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if 'user_id' not in g:
+            try:
+                payload = auth_service.verify(request.headers.get('Authorization'))
+            except AuthError as e:
+                return jsonify({'error': str(e)}), 401
+            g.user_id = payload['user_id']
+        if 'user_id' in kwargs and kwargs['user_id'] != g.user_id and not is_admin():
+            return jsonify({'error': 'Unauthorized'}), 403
+        return view(*args, **kwargs)
+    return wrapper
 
-# Predefined industry categories
-INDUSTRY_CATEGORIES = [
-    "Technology", "E-commerce", "Finance", "Healthcare", "Education",
-    "Entertainment", "Real Estate", "Automotive", "Travel", "Food"
-]
+def require_admin(view):
+    """require_auth, limited to users with the admin role"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin():
+            return jsonify({'error': 'Unauthorized'}), 403
+        return view(*args, **kwargs)
+    return require_auth(wrapper)
 
 # Root route
 @app.route('/')
@@ -48,11 +130,28 @@ def index():
         'endpoints': {
             'users': '/api/users',
             'signup': '/signup',
+            'bulk_signup': '/signup/bulk',
             'scrape': '/scrape',
-            'analytics': '/analytics/<user_id>'
+            'jobs': '/jobs/<job_id>',
+            'track_interaction': '/track-interaction',
+            'analytics': '/analytics/<user_id>',
+            'scrape_history': '/scrape-history/<user_id>',
+            'health': '/health',
+            'metrics': '/metrics',
+            'live_analytics': '/socket.io (namespace /analytics)'
         }
     })
 
+@app.route('/health', methods=['GET'])
+def health():
+    """Storage availability and connection pool usage of this worker"""
+    return jsonify(storage_stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Request latency, span and storage metrics of this worker in the Prometheus text format"""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Error handlers
 @app.errorhandler(404)
 def not_found_error(error):
@@ -68,63 +167,184 @@ def internal_error(error):
         'message': 'An unexpected error has occurred.'
     }), 500
 
-# Firebase Users Endpoints
+# Users Endpoints (stored in USER_STORE); admins manage every account, users only their own
 @app.route('/api/users', methods=['GET'])
+@require_admin
 def get_users():
-    """Get all users from Firestore"""
+    """
+    List users a page at a time.
+    ?limit= sets the page size, ?start_after= takes the previous page's
+    next_page_token and ?fields=a,b limits the fields returned. ?ids=a,b
+    fetches just those users (through the user cache) instead. With
+    ?format=ndjson (or Accept: application/x-ndjson) every user from
+    start_after on is streamed as one JSON document per line instead.
+    """
     try:
-        users = get_all_users()
-        return jsonify(users), 200
+        start_after = request.args.get('start_after')
+        fields = request.args.get('fields')
+        fields = [field for field in fields.split(',') if field] if fields else None
+
+        if request.args.get('format') == 'ndjson' or \
+                request.accept_mimetypes.best == 'application/x-ndjson':
+            users = user_repository.iter(fields=fields, start_after=start_after, page_size=Config.USERS_PAGE_SIZE)
+            # Read the first page now, so a bad page token is still answered with a 400
+            first = next(users, None)
+
+            def generate():
+                try:
+                    for user in itertools.chain([first] if first else [], users):
+                        yield app.json.dumps(public_user(user)) + '\n'
+                except Exception as e:
+                    # Headers are already sent; report the failure in-band
+                    yield app.json.dumps({'error': str(e)}) + '\n'
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        ids = request.args.get('ids')
+        if ids:
+            ids = [user_id for user_id in ids.split(',') if user_id][:Config.USERS_MAX_PAGE_SIZE]
+            users = user_repository.get_many(ids, fields)
+            return jsonify({
+                'users': [public_user(user) for user in users if user is not None],
+                'missing': [user_id for user_id, user in zip(ids, users) if user is None]
+            }), 200
+
+        limit = min(max(request.args.get('limit', Config.USERS_PAGE_SIZE, type=int), 1), Config.USERS_MAX_PAGE_SIZE)
+        users, next_page_token = user_repository.page(limit, start_after, fields)
+        return jsonify({
+            'users': [public_user(user) for user in users],
+            'next_page_token': next_page_token
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/users/<user_id>', methods=['GET'])
+@require_auth
 def get_user(user_id):
-    """Get a specific user by ID from Firestore"""
+    """Get a specific user by ID"""
     try:
-        user = get_user_by_id(user_id)
+        user = user_repository.get(user_id)
         if user:
-            return jsonify(user), 200
+            return jsonify(public_user(user)), 200
         return jsonify({'error': 'User not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/users', methods=['POST'])
+@require_admin
 def add_user():
-    """Create a new user in Firestore"""
+    """Create a new user"""
     try:
         user_data = request.get_json()
         if not user_data:
             return jsonify({'error': 'No data provided'}), 400
         
-        new_user = create_user(user_data)
-        return jsonify(new_user), 201
+        new_user = user_repository.create(user_data)
+        return jsonify(public_user(new_user)), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/users/<user_id>', methods=['PUT'])
+@require_auth
 def update_user_endpoint(user_id):
-    """Update a user in Firestore"""
+    """Update a user"""
     try:
         user_data = request.get_json()
         if not user_data:
             return jsonify({'error': 'No data provided'}), 400
+        user_data.pop('id', None)
+        if 'role' in user_data and not is_admin():
+            return jsonify({'error': 'Only admins can change roles'}), 403
         
-        updated_user = update_user(user_id, user_data)
-        return jsonify(updated_user), 200
+        if not user_repository.update(user_id, user_data):
+            return jsonify({'error': 'User not found'}), 404
+        user_data['id'] = user_id
+        return jsonify(public_user(user_data)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/users/<user_id>', methods=['DELETE'])
+@require_auth
 def delete_user_endpoint(user_id):
-    """Delete a user from Firestore"""
+    """Delete a user"""
     try:
-        if delete_user(user_id):
+        if user_repository.delete(user_id):
             return jsonify({'message': 'User deleted successfully'}), 200
         return jsonify({'error': 'User not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def analyze_signup_site(payload):
+    """Job handler: scrape a new user's site and store their industry and first recommendations"""
+    website_url = payload['website_url']
+
+    # Scrape website content
+    scrape = scraper_service.scrape_page(website_url)
+    if scrape.get('error'):
+        raise RuntimeError(f"Could not fetch {website_url}: {scrape['error']}")
+    scraped_data = scrape['content']
+
+    # Get initial recommendations (reused from the scrape cache when the site is unchanged)
+    recommendations = scrape['recommendations']
+    if recommendations is None:
+        recommendations = recommendation_service.get_recommendations(scraped_data)
+        scraper_service.save_recommendations(website_url, recommendations)
+
+    # Keep the result in the user's scrape history; the user only stores a reference
+    reference = scrape_history.record(payload['user_id'], website_url, scraped_data, recommendations)
+
+    return {
+        'industry': recommendations['industry'],
+        'recommendations': recommendations,
+        'scrape_version': reference['version']
+    }
+
+def scrape_user_site(payload):
+    """Job handler: scrape a URL for a user, store the result and track analytics"""
+    user_id = payload['user_id']
+    url = payload['url']
+
+    # Scrape the website (a single page, or same-site pages in crawl mode).
+    # Either way a site that cannot be fetched fails the job, so it is retried
+    # and never replaces the user's industry with a guess from no content
+    if payload.get('crawl'):
+        content = scraper_service.crawl_site(
+            url,
+            max_depth=payload['max_depth'],
+            max_pages=payload['max_pages'],
+            use_sitemap=payload['use_sitemap']
+        )
+        recommendations = recommendation_service.get_recommendations(content)
+    else:
+        scrape = scraper_service.scrape_page(url)
+        if scrape.get('error'):
+            raise RuntimeError(f"Could not fetch {url}: {scrape['error']}")
+        content = scrape['content']
+
+        # Get recommendations based on the content (cached for unchanged pages)
+        recommendations = scrape['recommendations']
+        if recommendations is None:
+            recommendations = recommendation_service.get_recommendations(content)
+            scraper_service.save_recommendations(url, recommendations)
+
+    # Store the scrape result in the user's history; the user only keeps a reference
+    reference = scrape_history.record(user_id, url, content, recommendations)
+
+    # Track analytics
+    analytics_service.track_recommendation(user_id, recommendations['recommendations'], recommendations['industry'])
+
+    return {
+        'recommendations': recommendations,
+        'scrape_version': reference['version'],
+        'history_url': f"/scrape-history/{user_id}/{reference['version']}"
+    }
+
+job_service.register('analyze_signup', analyze_signup_site)
+job_service.register('scrape', scrape_user_site)
+# Recover jobs left behind by workers that died, even if this one never enqueues any
+job_service.start()
+
 @app.route('/signup', methods=['POST'])
 def signup():
     try:
@@ -137,118 +357,149 @@ def signup():
             return jsonify({'error': 'Email, password, and website URL are required'}), 400
 
         # Check if user already exists
-        existing_user = db.users.find_one({'email': email})
+        try:
+            existing_user = user_repository.find_by_email(email, fields=['email'])
+        except RuntimeError:
+            return jsonify({'error': 'Database unavailable'}), 503
         if existing_user:
             return jsonify({'error': 'Email already exists'}), 400
 
-        # Scrape website content
-        scraped_data = scraper_service.scrape_text(website_url)
-        
-        # Get initial recommendations
-        recommendations = recommendation_service.get_recommendations(" ".join(word for word, count in scraped_data))
-        
-        # Create user
-        user = {
-            'email': email,
-            'password': password,  # In production, this should be hashed
-            'website_url': website_url,
-            'industry': recommendations['industry'],
-            'created_at': datetime.utcnow(),
-            'last_scrape': {
-                'content': scraped_data,
-                'recommendations': recommendations,
-                'scraped_at': datetime.utcnow()
-            }
-        }
-        
-        result = db.users.insert_one(user)
-        user_id = str(result.inserted_id)
+        # Create user; industry and recommendations are filled in by the analysis job
+        user = auth_service.create_user(email, password, website_url)
+        user_id = user['id']
+
+        # Scrape and classify the website in the background
+        job = job_service.enqueue(
+            'analyze_signup',
+            {'user_id': user_id, 'website_url': website_url},
+            user_id=user_id,
+            dedup_key=f'analyze_signup:{user_id}'
+        )
         
         # Generate JWT token
-        token = jwt.encode(
-            {'user_id': user_id, 'exp': datetime.utcnow() + timedelta(seconds=Config.JWT_ACCESS_TOKEN_EXPIRES)},
-            Config.JWT_SECRET_KEY,
-            algorithm='HS256'
-        )
+        token = auth_service.generate_token(user)
         
         return jsonify({
             'user_id': user_id,
             'token': token,
-            'industry': recommendations['industry'],
+            'job_id': job['job_id'],
+            'status_url': f"/jobs/{job['job_id']}",
             'dashboard_url': f'/dashboard/{user_id}'
-        }), 201
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/signup/bulk', methods=['POST'])
+@require_auth
+def bulk_signup():
+    """
+    Sign up many sites from one CSV (a header row naming email, password and
+    website_url) or NDJSON upload on behalf of the authenticated user (e.g.
+    an agency). Rows are rate limited per uploading user. Results stream back
+    as NDJSON, one line per row as its batch is written, followed by a
+    summary line.
+    """
+    try:
+        if request.content_length and request.content_length > Config.BULK_SIGNUP_MAX_BYTES:
+            return jsonify({'error': 'Upload is too large'}), 413
+        try:
+            rows = parse_upload(request.get_data(cache=False), request.content_type)
+            bulk_onboarding.admit(g.user_id, rows)
+        except BulkSignupError as e:
+            response = jsonify({'error': str(e)})
+            if e.retry_after is not None:
+                response.headers['Retry-After'] = str(max(1, int(e.retry_after + 0.999)))
+            return response, e.status
+        created_by = g.user_id
+
+        def generate():
+            try:
+                for result in bulk_onboarding.run(rows, created_by=created_by):
+                    yield app.json.dumps(result) + '\n'
+            except Exception as e:
+                # Headers are already sent; report the failure in-band
+                yield app.json.dumps({'error': str(e)}) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/scrape', methods=['POST'])
+@require_auth
 def scrape_website():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'A JSON object body is required'}), 400
         url = data.get('url')
         if not url:
             return jsonify({'error': 'URL is required'}), 400
 
-        # Get user_id from token
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'error': 'Authorization token is required'}), 401
+        user_id = g.user_id
+        job_payload = {'user_id': user_id, 'url': url, 'crawl': bool(data.get('crawl'))}
+        if job_payload['crawl']:
+            try:
+                max_depth = int(data.get('max_depth', Config.CRAWL_MAX_DEPTH))
+                max_pages = int(data.get('max_pages', Config.CRAWL_MAX_PAGES))
+            except (TypeError, ValueError, OverflowError):
+                return jsonify({'error': 'max_depth and max_pages must be integers'}), 400
+            job_payload.update(
+                max_depth=min(max(max_depth, 0), Config.CRAWL_MAX_DEPTH),
+                max_pages=min(max(max_pages, 1), Config.CRAWL_MAX_PAGES),
+                use_sitemap=bool(data.get('use_sitemap', True))
+            )
 
-        try:
-            payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-            user_id = payload['user_id']
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
-
-        # Scrape the website
-        content = scraper_service.scrape_text(url)
-        
-        # Get recommendations based on the content
-        recommendations = recommendation_service.get_recommendations(" ".join(word for word, count in content))
-        
-        # Store the scrape result and recommendations
-        db.users.update_one(
-            {'_id': user_id},
-            {
-                '$set': {
-                    'last_scrape': {
-                        'url': url,
-                        'content': content,
-                        'recommendations': recommendations,
-                        'scraped_at': datetime.utcnow()
-                    }
-                }
-            }
-        )
-        
-        # Track analytics
-        analytics_service.track_recommendation(user_id, recommendations['recommendations'])
+        # One in-flight scrape per user; a repeat request returns the running job
+        job = job_service.enqueue('scrape', job_payload, user_id=user_id, dedup_key=f'scrape:{user_id}')
         
         return jsonify({
-            'content': content,
-            'recommendations': recommendations
-        })
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'status_url': f"/jobs/{job['job_id']}"
+        }), 202
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/analytics/<user_id>', methods=['GET'])
-def get_analytics(user_id):
+@app.route('/jobs/<job_id>', methods=['GET'])
+@require_auth
+def get_job(job_id):
+    try:
+        job = job_service.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        # The job's user, or whoever queued it for them (a bulk signup's uploader)
+        if g.user_id not in (job['user_id'], job['created_by']):
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/track-interaction', methods=['POST'])
+def track_interaction():
     try:
-        # Verify token
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'error': 'Authorization token is required'}), 401
+        # Events belong to the site owner whose tracking snippet sent them
+        user_id = request.args.get('user_id') or request.headers.get('X-User-Id')
+        if request.content_length and request.content_length > Config.INTERACTION_MAX_BYTES:
+            return jsonify({'error': 'Batch is too large'}), 413
 
         try:
-            payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-            if payload['user_id'] != user_id:
-                return jsonify({'error': 'Unauthorized'}), 403
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
+            result = interaction_service.ingest(user_id, request.get_data(cache=False))
+        except RequestEntityTooLarge:
+            return jsonify({'error': 'Batch is too large'}), 413
+        except InteractionError as e:
+            response = jsonify({'error': str(e)})
+            if e.retry_after is not None:
+                response.headers['Retry-After'] = str(max(1, int(e.retry_after + 0.999)))
+            return response, e.status
+
+        return jsonify(result), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+@app.route('/analytics/<user_id>', methods=['GET'])
+@require_auth
+def get_analytics(user_id):
+    try:
         # Get time range from query params
         time_range = request.args.get('range', 'daily')  # daily, weekly, or monthly
         
@@ -259,9 +510,104 @@ def get_analytics(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@socketio.on('connect', namespace='/analytics')
+def analytics_connect(auth=None):
+    """
+    Dashboards connect with their token (auth={'token': ...} or ?token=) and
+    receive 'analytics_delta' frames: per changed hourly and daily bucket, the
+    events and per-industry recommendations to add since the last frame.
+    """
+    token = (auth or {}).get('token') or request.args.get('token') or request.headers.get('Authorization')
+    try:
+        user_id = auth_service.verify(token)['user_id']
+    except AuthError as e:
+        raise ConnectionRefusedError(str(e))
+    join_room(live_analytics.room(user_id))
+    live_analytics.subscribe(request.sid, user_id)
+
+@socketio.on('disconnect', namespace='/analytics')
+def analytics_disconnect():
+    live_analytics.unsubscribe(request.sid)
+
+@app.route('/scrape-history/<user_id>', methods=['GET'])
+@require_auth
+def get_scrape_history(user_id):
+    try:
+        # Page through versions newest first; cursor is the previous page's next_cursor
+        cursor = request.args.get('cursor', type=int)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        fields = request.args.get('fields')
+        fields = fields.split(',') if fields else SUMMARY_FIELDS
+
+        return jsonify(scrape_history.page(user_id, cursor=cursor, limit=limit, fields=fields))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/scrape-history/<user_id>/<int:version>', methods=['GET'])
+@require_auth
+def get_scrape_version(user_id, version):
+    try:
+        entry = scrape_history.get(user_id, version)
+        if entry is None:
+            return jsonify({'error': 'Scrape not found'}), 404
+        return jsonify(entry)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.cli.command('migrate-scrape-history')
+def migrate_scrape_history():
+    """Move scrape results embedded in user documents into scrape_history"""
+    moved = scrape_history.migrate_embedded()
+    click.echo(f'Moved {moved} embedded scrapes')
+
+@app.cli.command('grant-admin')
+@click.argument('email')
+@click.option('--revoke', is_flag=True, help='Take the admin role away instead')
+def grant_admin(email, revoke):
+    """Give the user with EMAIL the admin role (needed to list, create and manage other users)"""
+    user = user_repository.find_by_email(email, fields=['email'])
+    if user is None:
+        raise click.ClickException(f'No user with email {email}')
+    user_repository.update(user['id'], {'role': None if revoke else ADMIN_ROLE})
+    click.echo(f"{email} {'is no longer' if revoke else 'is now'} an admin")
+
+@app.cli.command('migrate-firestore-users')
+@click.option('--dry-run', is_flag=True, help='Only report what would be copied')
+def migrate_firestore_users(dry_run):
+    """Copy users from the Firestore users collection into MongoDB (USER_STORE=mongo)"""
+    counts = migrate_users(FirestoreUserRepository(), MongoUserRepository(), dry_run=dry_run)
+    click.echo(', '.join(f'{count} {outcome}' for outcome, count in counts.items()))
+
+@app.cli.command('backfill-rollups')
+@click.option('--user-id', default=None, help='Only rebuild rollups for this user')
+def backfill_rollups(user_id):
+    """Rebuild analytics rollups from raw analytics events"""
+    written = analytics_service.rebuild_rollups(user_id)
+    click.echo(f'Applied {written} rollup updates')
+
+@app.cli.command('bulk-signup')
+@click.argument('upload', type=click.File('rb'))
+@click.option('--format', 'upload_format', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='Defaults to the file extension, then to the content')
+@click.option('--max-rows', default=100000, help='Rows accepted from the file')
+def bulk_signup_command(upload, upload_format, max_rows):
+    """Sign up every row of a CSV or NDJSON file, printing one JSON result per row"""
+    extension = os.path.splitext(upload.name)[1].lower()
+    upload_format = upload_format or {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}.get(extension)
+    content_type = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}.get(upload_format)
+
+    data = upload.read()
+    try:
+        rows = parse_upload(data, content_type, max_rows=max_rows, max_bytes=len(data) + 1)
+    except BulkSignupError as e:
+        raise click.ClickException(str(e))
+    for result in bulk_onboarding.run(rows):
+        click.echo(app.json.dumps(result))
+
 # This is important for Vercel
 app = app
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    # Like app.run before it, this uses the development server outside eventlet mode
+    socketio.run(app, host='0.0.0.0', port=port, allow_unsafe_werkzeug=True)
@@ -0,0 +1,87 @@
+"""
+Benchmark analytics bucketing on synthetic events for one user.
+
+Always compares the original per-bucket rescan loop with the single-pass
+local binning. With --mongo-uri, also loads the events into a scratch
+collection and checks that the $dateTrunc aggregation and the local fallback
+return identical buckets.
+
+Run from the repository root (MONGODB_URI is blanked so no connection is
+attempted on import):
+    MONGODB_URI= python -m backend.benchmarks.bench_analytics [--events N] [--mongo-uri URI]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from backend.database import storage
+from backend.services.analytics_service import AnalyticsService, bin_timestamps, bucket_plan, BUCKET_STEPS
+
+def synthetic_timestamps(count, now, days=30, seed=0):
+    rng = random.Random(seed)
+    span = days * 86400
+    return [now - timedelta(seconds=rng.random() * span) for _ in range(count)]
+
+def legacy_buckets(timestamps, start, unit, count):
+    """The original O(buckets x events) loop"""
+    step = BUCKET_STEPS[unit]
+    return [sum(1 for stamp in timestamps if start + index * step <= stamp < start + (index + 1) * step)
+            for index in range(count)]
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--legacy-events', type=int, default=100000,
+                        help='events used for the slow legacy loop')
+    parser.add_argument('--mongo-uri', help='MongoDB to compare server-side aggregation against')
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    timestamps = synthetic_timestamps(args.events, now)
+
+    print(f"{'range':<9}{'buckets':>8}{'local binning':>16}{'legacy loop':>14}{'legacy events':>15}  match")
+    for time_range in ('daily', 'weekly', 'monthly'):
+        start, unit, count, _ = bucket_plan(time_range, now)
+        local_time, local = timed(bin_timestamps, timestamps, start, unit, count)
+        subset = timestamps[:args.legacy_events]
+        legacy_time, legacy = timed(legacy_buckets, subset, start, unit, count)
+        match = list(bin_timestamps(subset, start, unit, count)) == legacy
+        print(f"{time_range:<9}{count:>8}{local_time:>15.3f}s{legacy_time:>13.3f}s{len(subset):>15,}  {match}")
+
+    if args.mongo_uri:
+        compare_with_mongo(args.mongo_uri, timestamps, now)
+
+def compare_with_mongo(uri, timestamps, now):
+    from pymongo import MongoClient
+
+    client = MongoClient(uri)
+    collection = client.reccy_ai_bench.analytics
+    collection.drop()
+    collection.create_index([('user_id', 1), ('timestamp', -1)])
+    for offset in range(0, len(timestamps), 50000):
+        collection.insert_many(
+            [{'user_id': 'bench', 'timestamp': stamp, 'recommendations': []}
+             for stamp in timestamps[offset:offset + 50000]],
+            ordered=False
+        )
+
+    storage.install(mongo_client=client, database='reccy_ai_bench')
+    service = AnalyticsService()
+
+    print(f"\n{'range':<9}{'$dateTrunc':>12}{'local fallback':>16}  identical")
+    for time_range in ('daily', 'weekly', 'monthly'):
+        start, unit, count, _ = bucket_plan(time_range, now)
+        server_time, server = timed(service._aggregate_buckets, 'bench', start, unit, count)
+        local_time, local = timed(service._bin_buckets, 'bench', start, unit, count)
+        print(f"{time_range:<9}{server_time:>11.3f}s{local_time:>15.3f}s  {list(server) == list(local)}")
+
+    client.drop_database('reccy_ai_bench')
+
+if __name__ == '__main__':
+    main()
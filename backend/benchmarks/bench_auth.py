@@ -0,0 +1,93 @@
+"""
+Measure the per-request cost of authentication.
+
+Compares the inline jwt.decode every route used to run with
+AuthService.verify on a cold cache (a new token per request), on a warm cache
+(the same token repeated, as a dashboard does) and for a token signed by a
+rotated-out key. Then times full Flask requests through the app's
+require_auth decorator against an identical unauthenticated route, so the
+difference is the auth overhead a request actually pays.
+
+Run from the repository root (MONGODB_URI is blanked so no connection is
+attempted on import):
+    MONGODB_URI= python -m backend.benchmarks.bench_auth [--requests N]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import jwt
+
+from backend.services.auth_service import AuthService
+
+def per_call(func, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - start) / len(args_list)
+
+def make_token(secret_key, user_id, kid=None):
+    payload = {'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)}
+    return jwt.encode(payload, secret_key, algorithm='HS256', headers={'kid': kid} if kid else None)
+
+def bench_verify(requests):
+    auth = AuthService(None, secret_key='current-key', previous_keys=['retired-key'])
+    user = {'id': 'user-1', 'website_url': 'https://example.com'}
+    fresh_tokens = [auth.generate_token(dict(user, id=f'user-{index}')) for index in range(requests)]
+    token = fresh_tokens[0]
+    retired = make_token('retired-key', 'user-1')
+
+    results = {
+        'inline jwt.decode': per_call(lambda t: jwt.decode(t, 'current-key', algorithms=['HS256']),
+                                      [(t,) for t in fresh_tokens]),
+        'verify, cold cache': per_call(auth.verify, [(t,) for t in fresh_tokens]),
+        'verify, warm cache': per_call(auth.verify, [(token,)] * requests),
+        'verify, Bearer prefix': per_call(auth.verify, [('Bearer ' + token,)] * requests)
+    }
+    auth.token_cache.clear()
+    results['verify, retired key'] = per_call(
+        lambda t: (auth.token_cache.clear(), auth.verify(t)), [(retired,)] * requests
+    )
+    return results
+
+def bench_requests(requests):
+    """Full test-client requests through require_auth vs the same view without it"""
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    import app as backend_app
+
+    flask_app = backend_app.app
+
+    def view(user_id):
+        return {'user_id': user_id}
+
+    flask_app.add_url_rule('/bench/open/<user_id>', 'bench_open', view)
+    flask_app.add_url_rule('/bench/auth/<user_id>', 'bench_auth', backend_app.require_auth(view))
+    client = flask_app.test_client()
+    headers = {'Authorization': backend_app.auth_service.generate_token({'id': 'user-1', 'website_url': ''})}
+
+    for _ in range(100):  # warm up routing and the token cache
+        client.get('/bench/auth/user-1', headers=headers)
+    assert client.get('/bench/auth/user-1', headers=headers).status_code == 200
+    assert client.get('/bench/auth/user-2', headers=headers).status_code == 403
+
+    return {
+        'request, no auth': per_call(lambda: client.get('/bench/open/user-1', headers=headers), [()] * requests),
+        'request, require_auth': per_call(lambda: client.get('/bench/auth/user-1', headers=headers), [()] * requests)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    results = bench_verify(args.requests)
+    results.update(bench_requests(max(1, args.requests // 10)))
+    for name, seconds in results.items():
+        print(f"{name:<24}{seconds * 1e6:>10.2f} us")
+    overhead = results['request, require_auth'] - results['request, no auth']
+    print(f"{'auth overhead/request':<24}{overhead * 1e6:>10.2f} us")
+
+if __name__ == '__main__':
+    main()
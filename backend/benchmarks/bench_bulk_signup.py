@@ -0,0 +1,93 @@
+"""
+Onboard --sites sites one /signup at a time versus through BulkOnboarding.
+
+Every site is served by a local server that takes --delay seconds per page,
+and MongoDB is mongomock (storage.install), so only the signup path is
+measured. The sites share one host, so the per-host connection limit is
+lifted to behave like sites on separate hosts.
+
+The serial run does, for each row, what /signup and its analyze_signup job
+do together: look up the email, create the user, scrape, classify and
+record the scrape. The bulk run streams the same rows through
+BulkOnboarding.run. Reported per run: rows per second and time to the first
+result, then the process peak RSS.
+
+Needs the development requirements (pip install -r requirements-dev.txt).
+Run from the repository root:
+    python -m backend.benchmarks.bench_bulk_signup [--sites N] [--delay S] [--concurrency N] [--batch-size N]
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+
+from backend.benchmarks.load_scrape import slow_site
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+def upload(site, prefix, count):
+    return '\n'.join(json.dumps({
+        'email': f'{prefix}{index}@example.com',
+        'password': 'secret',
+        'website_url': f'{site}/{prefix}/{index}'
+    }) for index in range(count)).encode('utf-8')
+
+def serial(backend_app, rows):
+    """The /signup path, one row after another"""
+    first = None
+    started = time.perf_counter()
+    for _, raw in rows:
+        row = json.loads(raw)
+        if backend_app.user_repository.find_by_email(row['email'], fields=['email']):
+            continue
+        user = backend_app.auth_service.create_user(row['email'], row['password'], row['website_url'])
+        backend_app.analyze_signup_site({'user_id': user['id'], 'website_url': row['website_url']})
+        backend_app.auth_service.generate_token(user)
+        first = first or time.perf_counter() - started
+    return time.perf_counter() - started, first
+
+def bulk(backend_app, rows):
+    first = None
+    started = time.perf_counter()
+    for result in backend_app.bulk_onboarding.run(rows):
+        if result['status'] == 'error':
+            raise RuntimeError(result)
+        first = first or time.perf_counter() - started
+    return time.perf_counter() - started, first
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sites', type=int, default=200)
+    parser.add_argument('--delay', type=float, default=0.2, help='seconds each site takes to answer')
+    parser.add_argument('--concurrency', type=int, default=16, help='BULK_SIGNUP_CONCURRENCY')
+    parser.add_argument('--batch-size', type=int, default=100, help='BULK_SIGNUP_BATCH_SIZE')
+    args = parser.parse_args()
+
+    import mongomock
+    from backend.config import Config
+    from backend.database import storage
+    from backend.services.bulk_onboarding import parse_upload
+
+    storage.install(mongomock.MongoClient(), database='reccy_ai_bench')
+    Config.BULK_SIGNUP_CONCURRENCY = args.concurrency
+    Config.BULK_SIGNUP_BATCH_SIZE = args.batch_size
+    # The sites all live on 127.0.0.1; real ones are on different hosts
+    Config.CRAWL_PER_HOST_LIMIT = 1000
+    sys.path.insert(0, os.path.join(ROOT, 'backend'))
+    import app as backend_app
+
+    server = slow_site(args.delay)
+    site = f'http://127.0.0.1:{server.server_address[1]}'
+    print(f"{args.sites} sites, {args.delay}s per page; bulk: {args.concurrency} at once, batches of {args.batch_size}")
+    print(f"{'mode':<8}{'rows/s':>10}{'total':>10}{'first row':>12}")
+    for mode, run in (('serial', serial), ('bulk', bulk)):
+        rows = parse_upload(upload(site, mode, args.sites), 'application/x-ndjson')
+        elapsed, first = run(backend_app, rows)
+        print(f"{mode:<8}{args.sites / elapsed:>10.1f}{elapsed:>9.1f}s{first:>11.2f}s")
+    server.shutdown()
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+if __name__ == '__main__':
+    main()
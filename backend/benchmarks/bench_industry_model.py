@@ -0,0 +1,54 @@
+"""
+Throughput of industry classification on synthetic (word, count) documents,
+comparing the hashed TF-IDF model with the keyword classifier.
+
+Run from the repository root (MONGODB_URI is blanked so no connection is
+attempted):
+    MONGODB_URI= python -m backend.benchmarks.bench_industry_model [--docs N]
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from backend.benchmarks.fixtures import VOCABULARY
+from backend.services.industry_classifier import KeywordClassifier
+from backend.services.industry_model import IndustryModel, INDUSTRY_KEYWORDS, DEFAULT_INDUSTRY
+
+def synthetic_documents(count, seed=0):
+    """Top-50 style (word, count) lists, each biased towards one industry"""
+    rng = random.Random(seed)
+    keyword_lists = list(INDUSTRY_KEYWORDS.values())
+    documents = []
+    for _ in range(count):
+        keywords = rng.choice(keyword_lists)
+        words = rng.sample(keywords, 8) + rng.sample(VOCABULARY, 42)
+        documents.append(sorted(((word, rng.randint(1, 60)) for word in words), key=lambda pair: -pair[1]))
+    return documents
+
+def throughput(classifier, documents):
+    start = time.perf_counter()
+    classifier.classify_many(documents)
+    return len(documents) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--docs', type=int, default=20000)
+    args = parser.parse_args()
+
+    documents = synthetic_documents(args.docs)
+
+    with tempfile.TemporaryDirectory() as directory:
+        IndustryModel.train_default().save(directory)
+        start = time.perf_counter()
+        model = IndustryModel.load(directory)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        keywords = KeywordClassifier(INDUSTRY_KEYWORDS, default=DEFAULT_INDUSTRY)
+
+        print(f"model load (mmap): {load_ms:.2f} ms")
+        print(f"tfidf model:        {throughput(model, documents):>10,.0f} docs/s")
+        print(f"keyword classifier: {throughput(keywords, documents):>10,.0f} docs/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Sustained ingestion rate of visitor interaction batches on one worker.
+
+By default the InteractionService is driven in-process (parsing, validation,
+rate limiting and the buffered writer) and flushed batches are discarded, or
+written to a scratch collection with --mongo-uri. With --url, batches are
+POSTed to a running server's /track-interaction from --clients threads,
+reporting HTTP throughput, 429s and latency percentiles instead.
+
+Run from the repository root (MONGODB_URI is blanked so no connection is
+attempted on import):
+    MONGODB_URI= python -m backend.benchmarks.bench_interactions [--seconds N] [--batch N]
+    MONGODB_URI= python -m backend.benchmarks.bench_interactions --url http://localhost:5000 --user-id ID
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+
+from backend.services.interaction_service import InteractionService
+from backend.services.rate_limiter import TokenBucketLimiter
+from backend.services.user_repository import InMemoryUserRepository
+
+EVENT_TYPES = ['pageview', 'click', 'scroll', 'form_submit', 'add_to_cart']
+
+def synthetic_batch(size, seed=0):
+    """An NDJSON body of size visitor events"""
+    rng = random.Random(seed)
+    now_ms = int(time.time() * 1000)
+    lines = []
+    for _ in range(size):
+        lines.append(json.dumps({
+            'type': rng.choice(EVENT_TYPES),
+            'timestamp': now_ms - rng.randint(0, 60000),
+            'session_id': f'session-{rng.randint(1, 5000)}',
+            'url': f'https://shop.example.com/products/{rng.randint(1, 500)}',
+            'properties': {'scroll_depth': rng.randint(0, 100)}
+        }))
+    return '\n'.join(lines).encode('utf-8')
+
+class DiscardCollection:
+    """Accepts insert_many calls and only counts the documents"""
+
+    def __init__(self):
+        self.inserted = 0
+
+    def insert_many(self, documents, ordered=True):
+        self.inserted += len(documents)
+
+def run_in_process(args):
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+        collection = client.reccy_ai_bench.interactions
+        collection.drop()
+    else:
+        client, collection = None, DiscardCollection()
+
+    limiter = TokenBucketLimiter(rate=args.rate_limit, burst=max(args.rate_limit, args.batch))
+    users = InMemoryUserRepository()
+    service = InteractionService(users, collection=collection, limiter=limiter)
+    body = synthetic_batch(args.batch)
+    user_id = users.create({'email': 'bench@example.com'})['id']
+
+    accepted = limited = 0
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    while time.perf_counter() < deadline:
+        try:
+            accepted += service.ingest(user_id, body)['accepted']
+        except Exception:
+            limited += 1
+    ingest_elapsed = time.perf_counter() - start
+    service.flush()
+    total_elapsed = time.perf_counter() - start
+
+    stored = collection.inserted if client is None else collection.count_documents({})
+    print(f"batch size:           {args.batch}")
+    print(f"accepted events:      {accepted:,} ({accepted / ingest_elapsed:,.0f} events/s)")
+    print(f"rate limited batches: {limited:,}")
+    print(f"stored events:        {stored:,} ({stored / total_elapsed:,.0f} events/s including final flush)")
+
+    if client is not None:
+        client.drop_database('reccy_ai_bench')
+
+def run_http(args):
+    import requests
+
+    body = synthetic_batch(args.batch)
+    url = f"{args.url.rstrip('/')}/track-interaction?user_id={args.user_id}"
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def client():
+        session = requests.Session()
+        headers = {'Content-Type': 'application/x-ndjson'}
+        while time.perf_counter() < deadline:
+            sent = time.perf_counter()
+            response = session.post(url, data=body, headers=headers)
+            elapsed = time.perf_counter() - sent
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    accepted_events = statuses.get(202, 0) * args.batch
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"requests:        {len(latencies):,} {dict(sorted(statuses.items()))}")
+    print(f"accepted events: {accepted_events:,} ({accepted_events / elapsed:,.0f} events/s)")
+    print(f"latency p50/p99: {quantiles[49] * 1000:.1f} / {quantiles[98] * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--batch', type=int, default=200, help='events per request')
+    parser.add_argument('--rate-limit', type=float, default=1e9,
+                        help='per-tenant events/s for the in-process limiter (default: effectively off)')
+    parser.add_argument('--mongo-uri', help='write flushed events to a scratch MongoDB collection')
+    parser.add_argument('--url', help='load test a running server instead of the in-process service')
+    parser.add_argument('--user-id', help="tenant id sent with --url (an existing user's id)")
+    parser.add_argument('--clients', type=int, default=8, help='concurrent HTTP clients with --url')
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.user_id:
+            parser.error('--url needs the --user-id of an existing user')
+        run_http(args)
+    else:
+        run_in_process(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Simulate thousands of live dashboards on one process.
+
+Connects --dashboards Socket.IO test clients to the app's /analytics
+namespace, spread over --users users. It then tracks --rate events per second
+for --duration seconds through AnalyticsService.track_recommendation, as the
+scrape jobs do. Afterwards it checks that every dashboard received exactly
+its user's event count and reports:
+
+- the cost of tracking an event;
+- the time to build and emit each push;
+- frames sent, versus one frame per event per dashboard without coalescing;
+- peak memory.
+
+Raw events are discarded instead of written, so only the push path is measured.
+
+Run from the repository root (MONGODB_URI is blanked so no connection is
+attempted on import):
+    MONGODB_URI= python -m backend.benchmarks.bench_live_analytics [--dashboards N] [--users N] [--rate N]
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from collections import Counter
+
+from backend.benchmarks.bench_interactions import DiscardCollection
+from backend.services.event_writer import BufferedEventWriter
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dashboards', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--rate', type=int, default=5000, help='events tracked per second')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--interval', type=float, default=0.5, help='ANALYTICS_PUSH_INTERVAL')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    import app as backend_app
+
+    analytics_service = backend_app.analytics_service
+    analytics_service.writer = BufferedEventWriter('analytics', collection=DiscardCollection())
+    live = backend_app.live_analytics
+    live.interval = args.interval
+
+    flush_times = []
+    flush = live.flush
+
+    def timed_flush():
+        start = time.perf_counter()
+        frames = flush()
+        if frames:
+            flush_times.append(time.perf_counter() - start)
+        return frames
+    live.flush = timed_flush
+
+    started = time.perf_counter()
+    tokens = {}
+    dashboards = []
+    for index in range(args.dashboards):
+        user_id = f'user-{index % args.users}'
+        if user_id not in tokens:
+            tokens[user_id] = backend_app.auth_service.generate_token({'id': user_id, 'website_url': ''})
+        client = backend_app.socketio.test_client(backend_app.app, namespace='/analytics',
+                                                  auth={'token': tokens[user_id]})
+        assert client.is_connected('/analytics')
+        dashboards.append((user_id, client))
+    print(f"connected {args.dashboards:,} dashboards for {len(tokens):,} users in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(0)
+    users = list(tokens)
+    tracked = Counter()
+    track_times = []
+    deadline = time.perf_counter() + args.duration
+    next_event = time.perf_counter()
+    while next_event < deadline:
+        now = time.perf_counter()
+        if now < next_event:
+            time.sleep(next_event - now)
+        user_id = rng.choice(users)
+        start = time.perf_counter()
+        analytics_service.track_recommendation(user_id, ['a', 'b', 'c'], 'Retail')
+        track_times.append(time.perf_counter() - start)
+        tracked[user_id] += 1
+        next_event += 1 / args.rate
+    time.sleep(args.interval * 3)
+
+    frames = 0
+    mismatched = 0
+    for user_id, client in dashboards:
+        received = client.get_received('/analytics')
+        frames += len(received)
+        count = sum(delta['count'] for packet in received for delta in packet['args'][0]['deltas']
+                    if delta['granularity'] == 'hour')
+        mismatched += count != tracked[user_id]
+
+    events = sum(tracked.values())
+    per_dashboard = sum(tracked[user_id] for user_id, _ in dashboards)
+    print(f"tracked {events:,} events at {events / args.duration:,.0f}/s; "
+          f"track_recommendation {statistics.mean(track_times) * 1e6:.1f}us mean, "
+          f"{sorted(track_times)[int(len(track_times) * 0.99)] * 1e6:.1f}us p99")
+    print(f"pushes: {len(flush_times)} every {args.interval}s, "
+          f"{statistics.mean(flush_times) * 1000:.1f}ms mean, {max(flush_times) * 1000:.1f}ms max to build and emit")
+    print(f"frames received: {frames:,} (one per event would be {per_dashboard:,}, "
+          f"{per_dashboard / max(frames, 1):.1f}x more)")
+    print(f"dashboards with wrong totals: {mismatched}")
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,376 @@
+"""
+Offline benchmark of the scrape -> recommend -> track pipeline.
+
+Nothing leaves the machine. The HTML fixtures are synthetic pages that
+fixtures.py generates from a fixed seed, not recordings of real sites; they
+are served by a local HTTP server that answers If-None-Match with 304, and
+every other path is a small generated page, so crawls find links to follow. MongoDB is
+replaced by mongomock through storage.install() and users are kept by the
+in-memory repository in place of Firestore (--user-store mongo keeps them in
+mongomock instead).
+
+Each stage runs --repeat times per fixture after one warm-up call and
+reports throughput and p50/p95/p99 latency per call (track calls are batches
+of events, and their throughput counts events):
+
+- fetch: download a page through the crawl engine;
+- parse: tokenize a fetched page;
+- scrape_cold / scrape_revalidated: ScraperService.scrape_page for a new URL,
+  then again for a URL it has cached (a 304 round trip);
+- crawl: crawl_site over --crawl-pages generated pages;
+- recommend_cold / recommend_cached: RecommendationService on the scraped
+  content, with and without its result cache;
+- history: ScrapeHistory.record;
+- track: AnalyticsService.track_recommendation, which only buffers events;
+- track_flush: the same followed by the flush that inserts them and updates
+  the rollups;
+- end_to_end: POST /scrape through the Flask test client until the job
+  succeeds, with --clients users at once.
+
+Memory is reported per stage as the peak traced allocation of one extra call
+(tracemalloc is off while timing), plus the process peak RSS.
+
+Storage stages include mongomock's own cost, which is not MongoDB's: compare
+them between runs of this suite, not with production.
+
+Results are written as JSON (default backend/benchmarks/results/<commit>.json).
+--baseline compares them with an earlier run and exits with status 1 when a
+stage's fastest call, throughput or memory regresses by more than --tolerance
+(and by more than --min-ms or --min-mb, below which runs are only noise).
+
+Needs the development requirements (pip install -r requirements-dev.txt).
+Run from the repository root:
+    python -m backend.benchmarks.bench_pipeline [--repeat N] [--clients N] [--baseline FILE]
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.benchmarks.fixtures import build_fixture, ensure_fixtures
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+GENERATED_PAGE_SIZE = 16 * 1024
+
+def fixture_server():
+    """Serve the fixture pages with ETags; any other path is a generated page"""
+    pages = {f'/{path.name}': path.read_bytes() for path in ensure_fixtures()}
+    generated = {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?', 1)[0]
+            if path in ('/robots.txt', '/sitemap.xml'):
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = pages.get(path)
+            if body is None:
+                with lock:
+                    body = generated.get(path)
+                    if body is None:
+                        seed = int(hashlib.sha1(path.encode()).hexdigest()[:8], 16)
+                        body = generated[path] = build_fixture(GENERATED_PAGE_SIZE, seed).encode('utf-8')
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            # The engine hangs up once it has read SCRAPE_MAX_BYTES of a page
+            if not isinstance(sys.exc_info()[1], ConnectionError):
+                super().handle_error(request, client_address)
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, sorted(pages, key=lambda path: len(pages[path])), pages
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(latencies, elapsed, operations=None, size=None):
+    operations = operations or len(latencies)
+    result = {
+        'operations': operations,
+        'seconds': round(elapsed, 6),
+        'throughput': round(operations / elapsed, 3) if elapsed else None,
+        'min_ms': round(min(latencies) * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3)
+    }
+    if size:
+        result['mb_per_second'] = round(size * operations / elapsed / 1e6, 3)
+    return result
+
+def peak_memory(func):
+    """Peak bytes allocated while func() runs"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+class Suite:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.stages = {}
+
+    def stage(self, name, func, calls=None, size=None, warmup=True):
+        """
+        Time func(index) once per call index; func may return a count of
+        operations it performed (for batched stages). Returns the stage result.
+        """
+        calls = calls or self.repeat
+        if warmup:
+            func(-1)
+        latencies = []
+        operations = 0
+        started = time.perf_counter()
+        for index in range(calls):
+            start = time.perf_counter()
+            done = func(index)
+            latencies.append(time.perf_counter() - start)
+            operations += done if isinstance(done, int) else 1
+        elapsed = time.perf_counter() - started
+        result = summarize(latencies, elapsed, operations, size)
+        result['peak_alloc_mb'] = round(peak_memory(lambda: func(calls)) / 1e6, 3)
+        self.stages[name] = result
+        print(f"{name:<42}{result['throughput']:>10.1f}/s{result['p50_ms']:>10.2f}ms"
+              f"{result['p99_ms']:>10.2f}ms{result['peak_alloc_mb']:>10.2f}MB")
+        return result
+
+def end_to_end(backend_app, site, clients, jobs_per_client, run='timed'):
+    """POST /scrape and poll /jobs/<id> from clients threads; returns (latencies, elapsed)"""
+    def client(index):
+        http = backend_app.app.test_client()
+        user_id = f'bench-user-{index}'
+        headers = {'Authorization': backend_app.auth_service.generate_token({'id': user_id, 'website_url': ''})}
+        latencies = []
+        for job in range(jobs_per_client):
+            url = f'{site}/medium_blog.html?run={run}&client={index}&job={job}'
+            start = time.perf_counter()
+            response = http.post('/scrape', json={'url': url}, headers=headers)
+            job_id = response.get_json()['job_id']
+            while True:
+                status = http.get(f'/jobs/{job_id}', headers=headers).get_json()['status']
+                if status in ('succeeded', 'failed'):
+                    break
+                time.sleep(0.002)
+            if status != 'succeeded':
+                raise RuntimeError(f'scrape job {job_id} failed')
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        latencies = [latency for result in pool.map(client, range(clients)) for latency in result]
+    return latencies, time.perf_counter() - started
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def change(after, before):
+    return after / before - 1 if before else 0.0
+
+def compare(results, baseline, tolerance, min_ms, min_mb):
+    """
+    Print changes against a baseline run; returns the regressed stages.
+    Latency is compared on the fastest call, which other load on the machine
+    disturbs least. Sub-millisecond stages jitter by more than any useful
+    tolerance, so latency and throughput only regress when it also grew by at
+    least min_ms, and memory when it grew by at least min_mb.
+    """
+    print(f"\ncompared with {baseline['meta']['commit']} (tolerance {tolerance:.0%}):")
+    settings = ('repeat', 'clients', 'jobs', 'crawl_pages', 'user_store')
+    if any(results['meta']['args'].get(key) != baseline['meta']['args'].get(key) for key in settings):
+        print("  warning: the baseline ran with different settings, so stages are not directly comparable")
+    regressions = []
+    for name, stage in results['stages'].items():
+        before = baseline['stages'].get(name)
+        if before is None:
+            print(f"  {name:<42} new")
+            continue
+        fastest = change(stage['min_ms'], before['min_ms'])
+        rate = change(stage['throughput'], before['throughput'])
+        memory = change(stage['peak_alloc_mb'], before['peak_alloc_mb'])
+        slower = stage['min_ms'] - before['min_ms'] >= min_ms
+        worse = []
+        if slower and fastest > tolerance:
+            worse.append('latency')
+        if slower and rate < -tolerance:
+            worse.append('throughput')
+        if memory > tolerance and stage['peak_alloc_mb'] - before['peak_alloc_mb'] >= min_mb:
+            worse.append('memory')
+        if worse:
+            regressions.append(name)
+        print(f"  {name:<42} min {fastest:+7.1%}  rate {rate:+7.1%}  mem {memory:+7.1%}"
+              f"{'  REGRESSED: ' + ', '.join(worse) if worse else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='timed calls per stage and fixture')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent users in the end-to-end stage')
+    parser.add_argument('--jobs', type=int, default=5, help='scrapes per end-to-end client')
+    parser.add_argument('--crawl-pages', type=int, default=20)
+    parser.add_argument('--user-store', choices=['memory', 'mongo'], default='memory')
+    parser.add_argument('--output', help='results file (default results/<commit>.json)')
+    parser.add_argument('--baseline', help='earlier results file to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression')
+    parser.add_argument('--min-ms', type=float, default=1.0, help='ignore latency increases smaller than this')
+    parser.add_argument('--min-mb', type=float, default=0.1, help='ignore memory increases smaller than this')
+    args = parser.parse_args()
+
+    import mongomock
+    from backend.config import Config
+    from backend.database import storage
+
+    # In-memory stores and a private spill directory; set before the app builds its services
+    storage.install(mongomock.MongoClient(), database='reccy_ai_bench')
+    Config.USER_STORE = args.user_store
+    Config.EVENT_SPILL_DIR = tempfile.mkdtemp(prefix='reccy_ai_bench_')
+    Config.PROFILE_SLOW_REQUEST_MS = 0
+
+    sys.path.insert(0, os.path.join(ROOT, 'backend'))
+    import app as backend_app
+
+    server, paths, pages = fixture_server()
+    site = f'http://127.0.0.1:{server.server_address[1]}'
+    scraper = backend_app.scraper_service
+    engine = scraper.engine
+    recommender = backend_app.recommendation_service
+    analytics = backend_app.analytics_service
+    history = backend_app.scrape_history
+
+    suite = Suite(args.repeat)
+    print(f"{'stage':<42}{'throughput':>12}{'p50':>12}{'p99':>12}{'peak':>12}")
+
+    fetched = {}
+    contents = {}
+    for path in paths:
+        name = path.strip('/').split('.')[0]
+        size = min(len(pages[path]), Config.SCRAPE_MAX_BYTES)  # bytes the engine reads
+
+        def fetch(index, path=path):
+            fetched[path] = engine.run(engine.fetch(f'{site}{path}?fetch={index}'), timeout=Config.CRAWL_TOTAL_TIMEOUT)
+        suite.stage(f'fetch[{name}]', fetch, size=size)
+
+        suite.stage(f'parse[{name}]', lambda index, path=path: scraper._extract_words(fetched[path]), size=size)
+
+        def scrape_cold(index, path=path):
+            result = scraper.scrape_page(f'{site}{path}?cold={index}')
+            if result.get('error'):
+                raise RuntimeError(result['error'])
+            contents[path] = result['content']
+        suite.stage(f'scrape_cold[{name}]', scrape_cold, size=size)
+
+        suite.stage(f'scrape_revalidated[{name}]',
+                    lambda index, path=path: scraper.scrape_page(f'{site}{path}?cold=0'))
+
+        def recommend_cold(index, path=path):
+            recommender.cache.clear()
+            return recommender.get_recommendations(contents[path])
+        suite.stage(f'recommend_cold[{name}]', recommend_cold)
+
+    documents = [contents[path] for path in paths]
+    suite.stage('recommend_cached', lambda index: recommender.get_recommendations(documents[index % len(documents)]),
+                calls=args.repeat * 100)
+
+    suite.stage('crawl', lambda index: scraper.crawl_site(f'{site}/small_landing.html?crawl={index}',
+                                                          max_depth=3, max_pages=args.crawl_pages, use_sitemap=False))
+
+    recommendations = recommender.get_recommendations(documents[0])
+    suite.stage('history', lambda index: history.record(f'bench-history-{index}', f'{site}/small_landing.html',
+                                                        documents[0], recommendations),
+                calls=args.repeat * 20)
+
+    def track(index, batch=1000):
+        for event in range(batch):
+            analytics.track_recommendation(f'bench-user-{event % 50}', recommendations['recommendations'],
+                                           recommendations['industry'])
+        return batch
+    suite.stage('track', track)
+    analytics.flush()
+
+    def track_flush(index, batch=100):
+        track(index, batch)
+        analytics.flush()
+        return batch
+    suite.stage('track_flush', track_flush)
+
+    latencies, elapsed = end_to_end(backend_app, site, args.clients, args.jobs)
+    result = summarize(latencies, elapsed)
+    result['clients'] = args.clients
+    result['peak_alloc_mb'] = round(peak_memory(lambda: end_to_end(backend_app, site, 1, 1, run='traced')) / 1e6, 3)
+    suite.stages['end_to_end'] = result
+    print(f"{'end_to_end':<42}{result['throughput']:>10.1f}/s{result['p50_ms']:>10.2f}ms"
+          f"{result['p99_ms']:>10.2f}ms{result['peak_alloc_mb']:>10.2f}MB")
+
+    server.shutdown()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"peak RSS: {peak_rss:.0f} MB")
+
+    commit = git_commit()
+    results = {
+        'meta': {
+            'commit': commit,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args)
+        },
+        'peak_rss_mb': round(peak_rss, 1),
+        'stages': suite.stages
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_ms, args.min_mb)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
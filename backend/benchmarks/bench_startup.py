@@ -0,0 +1,71 @@
+"""
+Measure worker cold-start cost of constructing ScraperService, before and
+after bundling the NLTK resources. Every sample is a fresh interpreter.
+
+Run from the repository root (MONGODB_URI is blanked so no connection is
+attempted):
+    MONGODB_URI= python -m backend.benchmarks.bench_startup [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# The ScraperService constructor before stop words were bundled
+LEGACY = """
+import time
+start = time.perf_counter()
+import requests
+from bs4 import BeautifulSoup
+import nltk
+from nltk.tokenize import word_tokenize
+from nltk.corpus import stopwords
+nltk.download('punkt', quiet=True)
+nltk.download('stopwords', quiet=True)
+stop_words = set(stopwords.words('english'))
+print(time.perf_counter() - start)
+"""
+
+CURRENT = """
+import time
+start = time.perf_counter()
+from backend.services.scraper_service import ScraperService
+ScraperService()
+print(time.perf_counter() - start)
+"""
+
+def sample(code, runs, timeout):
+    env = dict(os.environ, MONGODB_URI='')
+    times = []
+    for _ in range(runs):
+        try:
+            result = subprocess.run(
+                [sys.executable, '-c', code], env=env, capture_output=True,
+                text=True, timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            return None, f'timed out after {timeout}s'
+        if result.returncode != 0:
+            lines = [line.strip() for line in result.stderr.splitlines() if line.strip(' *')]
+            reason = [line for line in lines if 'not found' in line or 'Error' in line]
+            return None, (reason or lines)[-1]
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return times, None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    for name, code in (('legacy (nltk download)', LEGACY), ('bundled', CURRENT)):
+        times, error = sample(code, args.runs, args.timeout)
+        if error:
+            print(f"{name:<24} failed: {error}")
+            continue
+        print(f"{name:<24} median {statistics.median(times) * 1000:8.1f} ms"
+              f"   min {min(times) * 1000:8.1f} ms   ({args.runs} runs)")
+
+if __name__ == '__main__':
+    main()
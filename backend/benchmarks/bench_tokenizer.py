@@ -0,0 +1,67 @@
+"""
+Compare the streaming paragraph tokenizer against the original
+BeautifulSoup + word_tokenize implementation on the HTML fixtures. That both
+produce the same words is checked by backend/tests/test_text_pipeline.py.
+
+Run from the repository root (MONGODB_URI is blanked so no connection is
+attempted):
+    MONGODB_URI= python -m backend.benchmarks.bench_tokenizer
+"""
+import time
+import tracemalloc
+from collections import Counter
+
+from backend.benchmarks.fixtures import ensure_fixtures
+from backend.services.stopwords import ENGLISH_STOP_WORDS
+from backend.services.text_pipeline import ParagraphTokenizer
+
+CHUNK_SIZE = 64 * 1024
+
+def legacy_top_words(html, stop_words):
+    """The original ScraperService.scrape_text parsing path"""
+    from bs4 import BeautifulSoup
+    from nltk.tokenize import word_tokenize
+
+    soup = BeautifulSoup(html.decode('utf-8', errors='replace'), 'html.parser')
+    text = ' '.join([p.get_text() for p in soup.find_all('p')])
+    tokens = word_tokenize(text.lower())
+    tokens = [t for t in tokens if t.isalnum() and t not in stop_words]
+    return Counter(tokens).most_common(50)
+
+def streaming_top_words(html, stop_words):
+    tokenizer = ParagraphTokenizer(stop_words)
+    for start in range(0, len(html), CHUNK_SIZE):
+        tokenizer.feed_bytes(html[start:start + CHUNK_SIZE])
+    tokenizer.close()
+    return tokenizer.most_common(50)
+
+def measure(func, html, stop_words, repeat=3):
+    """Return (best wall time in seconds, peak traced memory in bytes, result)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(html, stop_words)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    func(html, stop_words)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+def main():
+    stop_words = ENGLISH_STOP_WORDS
+
+    print(f"{'fixture':<22}{'size':>10}{'legacy s':>11}{'stream s':>11}{'speedup':>9}"
+          f"{'legacy MB':>11}{'stream MB':>11}")
+    for path in ensure_fixtures():
+        html = path.read_bytes()
+        legacy_time, legacy_peak, _ = measure(legacy_top_words, html, stop_words)
+        stream_time, stream_peak, _ = measure(streaming_top_words, html, stop_words)
+
+        print(f"{path.name:<22}{len(html) // 1024:>8}KB{legacy_time:>11.3f}{stream_time:>11.3f}"
+              f"{legacy_time / stream_time:>8.1f}x{legacy_peak / 2**20:>11.1f}{stream_peak / 2**20:>11.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Run one user workload against every UserRepository backend.
+
+The same sequence (bulk create, single gets, batched gets, paging through all
+users, single updates, a batched update and deletes) runs against the
+in-memory store and mongomock, each bare and behind the read-through cache.
+--mongo-uri adds a real MongoDB (a scratch database that is dropped
+afterwards) and --firestore the configured Firestore project (a scratch
+collection whose documents are deleted afterwards). Every run checks the
+results, so the backends are also compared for behaviour, not only speed.
+
+Run from the repository root (MONGODB_URI is blanked so no connection is
+attempted on import):
+    MONGODB_URI= python -m backend.benchmarks.bench_user_repository [--users N] [--mongo-uri URI] [--firestore]
+"""
+import argparse
+import random
+import time
+
+from backend.services.cache import TTLCache, TieredCache
+from backend.services.user_repository import (
+    CachedUserRepository, FirestoreUserRepository, InMemoryUserRepository, MongoUserRepository
+)
+
+def synthetic_users(count):
+    return [{
+        'email': f'user{index}@example.com',
+        'password': 'secret',
+        'website_url': f'https://site{index}.example.com',
+        'industry': None
+    } for index in range(count)]
+
+def run_workload(repository, users, lookups, seed=0):
+    """Time each stage; returns {stage: (seconds, operations)}"""
+    rng = random.Random(seed)
+    timings = {}
+
+    def stage(name, operations, func):
+        start = time.perf_counter()
+        result = func()
+        timings[name] = (time.perf_counter() - start, operations)
+        return result
+
+    created = stage('create_many', len(users), lambda: repository.create_many(users))
+    ids = [user['id'] for user in created]
+    sample = [rng.choice(ids) for _ in range(lookups)]
+
+    got = stage('get', lookups, lambda: [repository.get(user_id, ['email']) for user_id in sample])
+    assert all(user is not None for user in got)
+    stage('get (repeat)', lookups, lambda: [repository.get(user_id, ['email']) for user_id in sample])
+
+    batches = [sample[offset:offset + 100] for offset in range(0, lookups, 100)]
+    many = stage('get_many x100', lookups, lambda: [repository.get_many(batch, ['email']) for batch in batches])
+    assert all(user is not None for batch in many for user in batch)
+
+    paged = stage('page all', len(ids), lambda: list(repository.iter(fields=['email'], page_size=500)))
+    assert sorted(user['id'] for user in paged) == sorted(ids)
+
+    updated = stage('update', lookups, lambda: [repository.update(user_id, {'industry': 'Retail'}) for user_id in sample])
+    assert all(updated)
+    assert repository.get(sample[0])['industry'] == 'Retail'
+    batch = {user_id: {'industry': 'Technology'} for user_id in ids[:1000]}
+    found = stage('update_many', len(batch), lambda: repository.update_many(batch))
+    assert all(found.values())
+    assert repository.get(ids[0])['industry'] == 'Technology'
+
+    doomed = ids[:min(100, len(ids))]
+    deleted = stage('delete', len(doomed), lambda: [repository.delete(user_id) for user_id in doomed])
+    assert all(deleted)
+    assert repository.get(doomed[0]) is None
+    assert not repository.update(doomed[0], {'industry': 'Retail'})
+    return timings, ids
+
+def cached(backend):
+    # A fresh local tier per run so earlier runs do not warm it
+    return CachedUserRepository(backend, TieredCache(TTLCache(100000, 60)))
+
+def report(name, timings):
+    print(name)
+    for stage, (seconds, operations) in timings.items():
+        rate = operations / seconds if seconds else float('inf')
+        print(f"  {stage:<15}{operations:>8,} ops{seconds:>10.3f}s{rate:>14,.0f} ops/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--lookups', type=int, default=1000)
+    parser.add_argument('--mongo-uri', help='MongoDB to run the workload against as well')
+    parser.add_argument('--firestore', action='store_true', help='also run against the configured Firestore project')
+    args = parser.parse_args()
+
+    users = synthetic_users(args.users)
+    backends = [
+        ('memory', InMemoryUserRepository),
+        ('memory + cache', lambda: cached(InMemoryUserRepository()))
+    ]
+
+    try:
+        import mongomock
+        backends += [
+            ('mongomock', lambda: MongoUserRepository(mongomock.MongoClient().bench.users)),
+            ('mongomock + cache', lambda: cached(MongoUserRepository(mongomock.MongoClient().bench.users)))
+        ]
+    except ImportError:
+        print('mongomock is not installed; skipping it')
+
+    cleanups = []
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+        database = client['reccy_ai_bench']
+        backends += [
+            ('mongodb', lambda: MongoUserRepository(database['users'])),
+            ('mongodb + cache', lambda: cached(MongoUserRepository(database['users_cached'])))
+        ]
+        cleanups.append(lambda: client.drop_database('reccy_ai_bench'))
+
+    if args.firestore:
+        firestore = FirestoreUserRepository('bench_users')
+        backends += [
+            ('firestore', lambda: firestore),
+            ('firestore + cache', lambda: cached(firestore))
+        ]
+
+    try:
+        for name, factory in backends:
+            repository = factory()
+            timings, ids = run_workload(repository, users, args.lookups)
+            report(name, timings)
+            if isinstance(repository, FirestoreUserRepository) or \
+                    isinstance(getattr(repository, 'backend', None), FirestoreUserRepository):
+                for user_id in ids:
+                    repository.delete(user_id)
+    finally:
+        for cleanup in cleanups:
+            cleanup()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import random
+from pathlib import Path
+
+FIXTURE_DIR = Path(__file__).parent / 'fixtures'
+
+# Fixture name -> approximate size in bytes
+FIXTURE_SIZES = {
+    'small_landing.html': 64 * 1024,
+    'medium_blog.html': 512 * 1024,
+    'large_catalog.html': 2 * 1024 * 1024,
+    'huge_archive.html': 8 * 1024 * 1024
+}
+
+VOCABULARY = (
+    "software platform cloud analytics product store cart checkout price shipping "
+    "customer review brand campaign marketing content social media patient clinic "
+    "health doctor course student learning university bank loan finance invest "
+    "travel hotel flight booking movie music stream game property rent home car "
+    "dealer vehicle recipe restaurant food menu delivery the and of to in for with "
+    "on is are was it this that you your our we they don't it's e-mail U.S. 3.5"
+).split()
+
+def _paragraph(rng):
+    words = []
+    for _ in range(rng.randint(20, 120)):
+        word = rng.choice(VOCABULARY)
+        roll = rng.random()
+        if roll < 0.05:
+            word = f"<a href=\"/p/{rng.randint(1, 500)}\">{word}</a>"
+        elif roll < 0.08:
+            word = f"<strong>{word}</strong>"
+        elif roll < 0.15:
+            word += rng.choice(['.', ',', ';', '!', '?', ':'])
+        words.append(word)
+    return '<p>' + ' '.join(words).capitalize() + '</p>\n'
+
+def build_fixture(size, seed=0):
+    """Build a deterministic HTML page of roughly size bytes"""
+    rng = random.Random(seed)
+    parts = [
+        '<!DOCTYPE html><html><head><title>Fixture</title>',
+        '<style>p { color: #333; }</style></head><body>',
+        '<nav>' + ''.join(f'<a href="/section/{i}">Section {i}</a>' for i in range(30)) + '</nav>'
+    ]
+    length = sum(len(part) for part in parts)
+    while length < size:
+        if rng.random() < 0.1:
+            block = '<div class="card"><h2>Card title</h2><script>var x = "cart price";</script></div>\n'
+        else:
+            block = _paragraph(rng)
+        parts.append(block)
+        length += len(block)
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+def ensure_fixtures():
+    """Write the fixture pages to disk (once) and return their paths"""
+    FIXTURE_DIR.mkdir(exist_ok=True)
+    paths = []
+    for seed, (name, size) in enumerate(FIXTURE_SIZES.items()):
+        path = FIXTURE_DIR / name
+        if not path.exists():
+            path.write_text(build_fixture(size, seed), encoding='utf-8')
+        paths.append(path)
+    return paths
@@ -0,0 +1,159 @@
+"""
+Load test /scrape against a slow upstream site, sync vs eventlet workers.
+
+Starts a local site that takes --delay seconds per page, then for each
+SERVER_MODE boots gunicorn with backend/gunicorn.conf.py (one worker, no
+MongoDB, so jobs and caches stay in that worker's memory). --clients
+concurrent users each POST /scrape for a new page and poll /jobs/<id> until
+the scrape finishes, for --duration seconds. Reported per mode:
+
+- /scrape requests per second with p50/p99 latency (what the API answers);
+- scrapes completed per second with p50/p99 time from request to result.
+
+Run from the repository root:
+    python -m backend.benchmarks.load_scrape [--clients N] [--delay S] [--duration S] [--modes sync,eventlet]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+SECRET_KEY = 'load-test-secret'
+PAGE = (b'<html><body><p>Shop our online store for shoes, clothing and accessories. '
+        b'Free shipping on every order and easy returns at checkout.</p></body></html>')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def slow_site(delay):
+    """Serve PAGE at every path after delay seconds; returns the server"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer.daemon_threads = True
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(('127.0.0.1', free_port()), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def start_api(mode, port, spill_dir):
+    env = dict(
+        os.environ,
+        SERVER_MODE=mode,
+        WEB_CONCURRENCY='1',
+        PYTHONPATH=ROOT,
+        MONGODB_URI='',
+        JWT_SECRET_KEY=SECRET_KEY,
+        EVENT_SPILL_DIR=spill_dir,
+        CRAWL_PER_HOST_LIMIT='1000'
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'backend/gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'backend.app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/health', timeout=1).ok:
+                return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+def client(index, api, site, stop_at, results):
+    session = requests.Session()
+    token = jwt.encode({'user_id': f'load-user-{index}', 'exp': datetime.utcnow() + timedelta(hours=1)},
+                       SECRET_KEY, algorithm='HS256')
+    headers = {'Authorization': token}
+    page = 0
+    while time.monotonic() < stop_at:
+        page += 1
+        started = time.monotonic()
+        try:
+            response = session.post(f'{api}/scrape', json={'url': f'{site}/{index}/{page}'},
+                                    headers=headers, timeout=120)
+            results['requests'].append(time.monotonic() - started)
+            job_id = response.json()['job_id']
+            while True:
+                job = session.get(f'{api}/jobs/{job_id}', headers=headers, timeout=120).json()
+                if job['status'] in ('succeeded', 'failed'):
+                    break
+                time.sleep(0.1)
+        except (requests.RequestException, KeyError, ValueError):
+            results['errors'] += 1
+            continue
+        if job['status'] == 'succeeded' and time.monotonic() <= stop_at:
+            results['scrapes'].append(time.monotonic() - started)
+        elif job['status'] == 'failed':
+            results['errors'] += 1
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run_mode(mode, site, clients, duration):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as spill_dir:
+        process = start_api(mode, port, spill_dir)
+        try:
+            results = {'requests': [], 'scrapes': [], 'errors': 0}
+            stop_at = time.monotonic() + duration
+            threads = [threading.Thread(target=client, args=(index, f'http://127.0.0.1:{port}', site, stop_at, results))
+                       for index in range(clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            process.terminate()
+            process.wait(30)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=2.0, help='seconds the upstream site takes per page')
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--modes', default='sync,eventlet')
+    args = parser.parse_args()
+
+    site = slow_site(args.delay)
+    site_url = f'http://127.0.0.1:{site.server_address[1]}'
+    print(f'{args.clients} clients, upstream delay {args.delay}s, {args.duration}s per mode')
+    print(f"{'mode':<10}{'/scrape rps':>12}{'p50':>9}{'p99':>9}{'scrapes/s':>11}{'p50':>9}{'p99':>9}{'errors':>8}")
+    for mode in args.modes.split(','):
+        results = run_mode(mode, site_url, args.clients, args.duration)
+        requests_made, scrapes = results['requests'], results['scrapes']
+        print(f"{mode:<10}{len(requests_made) / args.duration:>12.1f}"
+              f"{percentile(requests_made, 0.5) * 1000:>7.0f}ms{percentile(requests_made, 0.99) * 1000:>7.0f}ms"
+              f"{len(scrapes) / args.duration:>11.1f}"
+              f"{percentile(scrapes, 0.5):>8.2f}s{percentile(scrapes, 0.99):>8.2f}s{results['errors']:>8}")
+    site.shutdown()
+
+if __name__ == '__main__':
+    main()
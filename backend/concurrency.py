@@ -0,0 +1,46 @@
+"""
+Support for serving with cooperative (eventlet) workers.
+
+Under `gunicorn -k eventlet` (SERVER_MODE=eventlet in gunicorn.conf.py) the
+socket, threading and time modules are monkey patched, so MongoDB calls and
+the job worker threads yield instead of holding the worker. Two kinds of I/O
+need help to do the same:
+
+- asyncio code (the crawl engine) runs on the hub's own event loop, which
+  requires eventlet's asyncio hub (EVENTLET_HUB=asyncio);
+- C extensions that block outside Python sockets (gRPC, used by Firestore)
+  are offloaded to eventlet's native thread pool.
+
+In a normal sync worker every helper here falls back to a plain call.
+"""
+import asyncio
+import sys
+
+def cooperative():
+    """True when eventlet has monkey patched this process"""
+    # Never import eventlet just to find out that it is not in use
+    if 'eventlet' not in sys.modules:
+        return False
+    from eventlet import patcher
+    return patcher.is_monkey_patched('socket')
+
+def asyncio_hub():
+    """True when the running eventlet hub is driven by an asyncio event loop"""
+    from eventlet.hubs import get_hub
+    from eventlet.hubs.asyncio import Hub
+    return isinstance(get_hub(), Hub)
+
+def run_coroutine(coro, timeout=None):
+    """Run a coroutine on the hub's event loop; only the calling green thread waits"""
+    from eventlet.asyncio import spawn_for_awaitable
+    if not asyncio_hub():
+        coro.close()
+        raise RuntimeError('asyncio code under eventlet needs EVENTLET_HUB=asyncio')
+    return spawn_for_awaitable(asyncio.wait_for(coro, timeout)).wait()
+
+def offload(func, *args, **kwargs):
+    """Call func in a native thread when cooperative, so blocking C code does not stall the hub"""
+    if not cooperative():
+        return func(*args, **kwargs)
+    from eventlet import tpool
+    return tpool.execute(func, *args, **kwargs)
@@ -1,26 +1,130 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class Config:
     # MongoDB configuration
-    MONGODB_URI = os.getenv('MONGODB_URI')
+    MONGODB_URI = os.getenv('MONGODB_URI')  # mongomock:// uses an in-memory stand-in
+    MONGODB_DATABASE = os.getenv('MONGODB_DATABASE', 'reccy_ai')
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))  # per worker process
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 60000))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000))  # wait for a free pooled connection
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 30000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_RETRY_WRITES = os.getenv('MONGO_RETRY_WRITES', 'true').lower() == 'true'
+    MONGO_RETRY_READS = os.getenv('MONGO_RETRY_READS', 'true').lower() == 'true'
+    MONGO_CONNECT_RETRIES = int(os.getenv('MONGO_CONNECT_RETRIES', 3))
+    MONGO_RECONNECT_INTERVAL = float(os.getenv('MONGO_RECONNECT_INTERVAL', 30))  # seconds before retrying an unreachable server
+
+    # Firestore configuration
+    FIREBASE_CREDENTIALS = os.getenv(
+        'FIREBASE_CREDENTIALS',
+        os.path.join(os.path.dirname(__file__), 'reccyai2-firebase-adminsdk-fbsvc-f62d1a3e04.json')
+    )
+    FIRESTORE_TIMEOUT = float(os.getenv('FIRESTORE_TIMEOUT', 10))  # seconds per call
+    FIRESTORE_RETRY_DEADLINE = float(os.getenv('FIRESTORE_RETRY_DEADLINE', 30))  # seconds across retries
     
     # JWT configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key')  # Change this to a secure secret key
+    # Retired keys still accepted for verification while their tokens expire (comma-separated)
+    JWT_PREVIOUS_SECRET_KEYS = [key for key in os.getenv('JWT_PREVIOUS_SECRET_KEYS', '').split(',') if key]
     JWT_ALGORITHM = "HS256"
     JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour
+    JWT_TOKEN_CACHE_SIZE = int(os.getenv('JWT_TOKEN_CACHE_SIZE', 10000))  # verified tokens kept per worker
     
     # Firebase configuration (for real-time updates)
     FIREBASE_CONFIG = os.getenv('FIREBASE_CONFIG', '{}')
     FIREBASE_API_KEY = os.getenv('FIREBASE_API_KEY')
     
     # ML Model configurations
-    MODEL_PATH = 'models/'
+    # Model artifacts live next to the package, whatever the working directory
+    MODEL_PATH = os.getenv('MODEL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
     SPACY_MODEL = 'en_core_web_sm'
+    INDUSTRY_CLASSIFIER = os.getenv('INDUSTRY_CLASSIFIER', 'tfidf')  # 'tfidf' or 'keywords'
+    INDUSTRY_MODEL_FEATURES = 2 ** 16
+    INDUSTRY_MIN_SCORE = float(os.getenv('INDUSTRY_MIN_SCORE', 0.05))
+    RECOMMENDATION_CACHE_SIZE = int(os.getenv('RECOMMENDATION_CACHE_SIZE', 10000))
+    RECOMMENDATION_CACHE_TTL = int(os.getenv('RECOMMENDATION_CACHE_TTL', 24 * 3600))
     
     # API configurations
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000,https://your-production-frontend.com').split(',')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+
+    # Crawler configurations
+    CRAWL_MAX_CONNECTIONS = int(os.getenv('CRAWL_MAX_CONNECTIONS', 100))
+    CRAWL_PER_HOST_LIMIT = int(os.getenv('CRAWL_PER_HOST_LIMIT', 4))
+    CRAWL_CONNECT_TIMEOUT = float(os.getenv('CRAWL_CONNECT_TIMEOUT', 5))
+    CRAWL_READ_TIMEOUT = float(os.getenv('CRAWL_READ_TIMEOUT', 10))
+    CRAWL_TOTAL_TIMEOUT = float(os.getenv('CRAWL_TOTAL_TIMEOUT', 20))
+    CRAWL_BATCH_TIMEOUT = float(os.getenv('CRAWL_BATCH_TIMEOUT', 300))
+    CRAWL_MAX_DEPTH = int(os.getenv('CRAWL_MAX_DEPTH', 2))
+    CRAWL_MAX_PAGES = int(os.getenv('CRAWL_MAX_PAGES', 20))
+    CRAWL_CHUNK_SIZE = int(os.getenv('CRAWL_CHUNK_SIZE', 64 * 1024))
+    SCRAPE_MAX_BYTES = int(os.getenv('SCRAPE_MAX_BYTES', 2 * 1024 * 1024))  # 2MB of HTML per page
+    SCRAPE_CACHE_MEMORY_SIZE = int(os.getenv('SCRAPE_CACHE_MEMORY_SIZE', 1000))  # pages cached per worker without MongoDB
+    CRAWL_USER_AGENT = os.getenv('CRAWL_USER_AGENT', 'ReccyAI-Crawler/1.0 (+https://reccyai2.vercel.app)')
+
+    # Background job configurations
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    JOB_RETRY_BACKOFF = float(os.getenv('JOB_RETRY_BACKOFF', 2))  # seconds, doubled per attempt
+    JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 600))  # a running job is recovered once its worker stops renewing this lease
+    JOB_RECOVERY_INTERVAL = float(os.getenv('JOB_RECOVERY_INTERVAL', 60))  # seconds between sweeps for expired leases and orphaned queued jobs
+
+    # Buffered event writer configurations
+    EVENT_BATCH_SIZE = int(os.getenv('EVENT_BATCH_SIZE', 500))
+    EVENT_FLUSH_INTERVAL = float(os.getenv('EVENT_FLUSH_INTERVAL', 1.0))  # seconds
+    EVENT_QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', 10000))
+    EVENT_PUT_TIMEOUT = float(os.getenv('EVENT_PUT_TIMEOUT', 0.05))  # seconds to wait on a full buffer before spilling
+    EVENT_SPILL_DIR = os.getenv('EVENT_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'reccy_ai_spill'))
+    EVENT_SPILL_MAX_BYTES = int(os.getenv('EVENT_SPILL_MAX_BYTES', 64 * 1024 * 1024))  # per worker; events beyond it are dropped
+
+    # Visitor interaction ingestion configurations
+    INTERACTION_RATE_LIMIT = float(os.getenv('INTERACTION_RATE_LIMIT', 1000))  # events per second per tenant and worker
+    INTERACTION_BURST = int(os.getenv('INTERACTION_BURST', 5000))
+    INTERACTION_MAX_BATCH = int(os.getenv('INTERACTION_MAX_BATCH', 1000))  # events per request
+    INTERACTION_MAX_BYTES = int(os.getenv('INTERACTION_MAX_BYTES', 1024 * 1024))
+    INTERACTION_MAX_PROPERTIES = int(os.getenv('INTERACTION_MAX_PROPERTIES', 32))
+
+    # Bulk signup (POST /signup/bulk and `flask bulk-signup`)
+    BULK_SIGNUP_MAX_ROWS = int(os.getenv('BULK_SIGNUP_MAX_ROWS', 1000))  # rows per upload
+    BULK_SIGNUP_MAX_BYTES = int(os.getenv('BULK_SIGNUP_MAX_BYTES', 1024 * 1024))
+    BULK_SIGNUP_CONCURRENCY = int(os.getenv('BULK_SIGNUP_CONCURRENCY', 16))  # sites scraped at once
+    BULK_SIGNUP_BATCH_SIZE = int(os.getenv('BULK_SIGNUP_BATCH_SIZE', 100))  # rows classified and written together
+    BULK_SIGNUP_FLUSH_INTERVAL = float(os.getenv('BULK_SIGNUP_FLUSH_INTERVAL', 1.0))  # seconds a finished row may wait for its batch
+    BULK_SIGNUP_RATE_LIMIT = float(os.getenv('BULK_SIGNUP_RATE_LIMIT', 1000 / 3600))  # rows per second per user and worker
+    BULK_SIGNUP_BURST = int(os.getenv('BULK_SIGNUP_BURST', 1000))
+
+    # Live dashboard updates over Socket.IO
+    ANALYTICS_PUSH_INTERVAL = float(os.getenv('ANALYTICS_PUSH_INTERVAL', 1.0))  # seconds; bursts coalesce into one frame
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE')  # e.g. redis://, to share rooms between workers
+
+    # Instrumentation (GET /metrics)
+    PROFILE_SLOW_REQUEST_MS = int(os.getenv('PROFILE_SLOW_REQUEST_MS', 0))  # profile requests slower than this; 0 disables
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'reccy_ai_profiles'))
+
+    # Data retention (enforced by TTL indexes, see backend/indexes.py)
+    ANALYTICS_RETENTION_DAYS = int(os.getenv('ANALYTICS_RETENTION_DAYS', 90))  # raw events; rollups are kept
+    HOURLY_ROLLUP_RETENTION_DAYS = int(os.getenv('HOURLY_ROLLUP_RETENTION_DAYS', 7))
+    INTERACTION_RETENTION_DAYS = int(os.getenv('INTERACTION_RETENTION_DAYS', 90))
+    SCRAPE_CACHE_RETENTION_DAYS = int(os.getenv('SCRAPE_CACHE_RETENTION_DAYS', 30))
+    SCRAPE_HISTORY_RETENTION_DAYS = int(os.getenv('SCRAPE_HISTORY_RETENTION_DAYS', 180))
+    JOB_RETENTION_DAYS = int(os.getenv('JOB_RETENTION_DAYS', 7))
+
+    # /api/users pagination
+    USERS_PAGE_SIZE = int(os.getenv('USERS_PAGE_SIZE', 100))
+    USERS_MAX_PAGE_SIZE = int(os.getenv('USERS_MAX_PAGE_SIZE', 1000))
+
+    # User storage: 'mongo', 'firestore' or 'memory', behind one read-through cache
+    USER_STORE = os.getenv('USER_STORE', 'mongo')
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 30))  # seconds; bounds staleness across workers
+    USER_CACHE_NEGATIVE_TTL = int(os.getenv('USER_CACHE_NEGATIVE_TTL', 10))  # seconds to remember a missing id
+    USER_CACHE_SHARED_PATH = os.getenv('USER_CACHE_SHARED_PATH', '')  # SQLite file shared by workers; empty disables
+    USER_CACHE_SHARED_TTL = int(os.getenv('USER_CACHE_SHARED_TTL', 300))
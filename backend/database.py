@@ -1,5 +1,24 @@
-from pymongo import MongoClient
+"""
+Storage client manager for MongoDB and Firestore.
+
+Clients are created lazily, on first use, in the process that uses them: a
+worker forked by gunicorn never reuses the parent's sockets, monitor threads
+or gRPC channels. Services ask for collections through get_collection() at
+call time instead of holding a connection from import time.
+
+Pool sizes, timeouts and retries come from Config. Connection pool events
+are counted so pool saturation can be reported (see storage_stats()).
+Tests and benchmarks can point MONGODB_URI at mongomock:// or call install()
+with any client, e.g. mongomock.MongoClient(), instead of a live cluster.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from pymongo import MongoClient, monitoring
 from backend.config import Config
+from backend.indexes import ensure_indexes
+from backend.metrics import REGISTRY
 import logging
 import urllib.parse
 
@@ -7,67 +26,349 @@ import urllib.parse
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize variables
-db = None
-users = None
-interactions = None
-recommendations = None
-analytics = None
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Counts connection pool events to report how close the pool is to saturation"""
 
-def init_db():
-    global db, users, interactions, recommendations, analytics
-    
-    try:
-        if not Config.MONGODB_URI:
-            logger.error("MONGODB_URI is not set in environment variables")
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.open = 0
+            self.in_use = 0
+            self.peak_in_use = 0
+            self.checkouts = 0
+            self.checkout_timeouts = 0
+            self.checkout_failures = 0
+            self.pools_cleared = 0
+
+    def snapshot(self, max_pool_size):
+        with self._lock:
+            return {
+                'open': self.open,
+                'in_use': self.in_use,
+                'peak_in_use': self.peak_in_use,
+                'max_pool_size': max_pool_size,
+                'saturation': self.in_use / max_pool_size if max_pool_size else 0.0,
+                'checkouts': self.checkouts,
+                'checkout_timeouts': self.checkout_timeouts,
+                'checkout_failures': self.checkout_failures,
+                'pools_cleared': self.pools_cleared
+            }
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open = max(0, self.open - 1)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                self.checkout_timeouts += 1
+            else:
+                self.checkout_failures += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    # Remaining pool events are not needed for the metrics
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command by name (find, insert, update, aggregate, ...)"""
+
+    def __init__(self):
+        self.duration = REGISTRY.histogram(
+            'mongo_command_duration_seconds', 'MongoDB command latency', ('command', 'outcome')
+        )
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.duration.observe(event.duration_micros / 1e6, event.command_name, 'ok')
+
+    def failed(self, event):
+        self.duration.observe(event.duration_micros / 1e6, event.command_name, 'error')
+
+def encode_uri(uri):
+    """Percent-encode the credentials of a MongoDB URI"""
+    if '@' not in uri:
+        return uri
+    parts = uri.split('@')
+    credentials = parts[0].split('://')[1]
+    host = parts[1]
+    username, password = credentials.split(':')
+    encoded_username = urllib.parse.quote_plus(username)
+    encoded_password = urllib.parse.quote_plus(password)
+    return f"mongodb+srv://{encoded_username}:{encoded_password}@{host}"
+
+class StorageManager:
+    """
+    Per-process MongoDB and Firestore clients.
+
+    Every accessor first checks the process id; after a fork the child drops
+    the inherited clients and builds its own on first use. When MongoDB cannot
+    be reached the manager reports it as unavailable (services fall back to
+    their offline behaviour) and tries again after MONGO_RECONNECT_INTERVAL,
+    in a background thread, so callers never wait on a reconnect. The index
+    plan is applied once per client, on its first successful connection.
+    """
+
+    def __init__(self):
+        self.pool_metrics = PoolMetrics()
+        self.command_metrics = CommandMetrics()
+        self._lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._generation = 0
+        self._mongo_override = None
+        self._firestore_override = None
+        self._database_name = None
+        self._reset(None)
+
+    def _reset(self, pid):
+        self._pid = pid
+        self._client = None
+        self._db = None
+        self._collections = {}
+        self._mongo_failed_at = None
+        self._reconnecting = False
+        self._indexes_applied = False
+        self._generation += 1  # connections started before a reset are discarded
+        self._firestore = None
+        self._firestore_failed = False
+
+    def _check_pid(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            # Inherited clients belong to the parent; never touch their sockets here
+            self._reset(pid)
+            self.pool_metrics.reset()
+
+    def install(self, mongo_client=None, firestore_client=None, database=None):
+        """Use the given clients (e.g. mongomock or a test Firestore) instead of connecting"""
+        with self._lock:
+            self._mongo_override = mongo_client
+            self._firestore_override = firestore_client
+            self._database_name = database
+            self._reset(None)
+
+    def get_db(self):
+        """The MongoDB database for this process, or None while MongoDB is unavailable"""
+        if self._pid == os.getpid() and self._db is not None:
+            return self._db
+        with self._lock:
+            self._check_pid()
+            if self._db is not None:
+                return self._db
+            if self._mongo_failed_at is not None:
+                if time.monotonic() - self._mongo_failed_at >= Config.MONGO_RECONNECT_INTERVAL:
+                    self._start_reconnect()
+                return None
+
+        # First connection in this process (init_db makes it before the first
+        # request); concurrent first callers wait for it, other storage doesn't
+        with self._connect_lock:
+            with self._lock:
+                self._check_pid()
+                if self._db is not None or self._mongo_failed_at is not None:
+                    return self._db
+                generation = self._generation
+            self._finish_connect(generation, self._connect_mongo())
+            return self._db
+
+    def _start_reconnect(self):
+        """Retry the connection in the background; called with _lock held"""
+        if self._reconnecting:
             return
-            
-        # Parse and encode the connection string properly
+        self._reconnecting = True
+        generation = self._generation
+        threading.Thread(target=lambda: self._finish_connect(generation, self._connect_mongo()),
+                         name='mongo-reconnect', daemon=True).start()
+
+    def _finish_connect(self, generation, client):
+        with self._lock:
+            if generation != self._generation:
+                # install() or close() ran meanwhile; this client is stale
+                if client is not None and client is not self._mongo_override:
+                    client.close()
+                return
+            self._reconnecting = False
+            if client is None:
+                self._mongo_failed_at = time.monotonic()
+                return
+            self._client = client
+            self._db = client[self._database_name or Config.MONGODB_DATABASE]
+            self._collections = {}
+            self._mongo_failed_at = None
+            apply_indexes = not self._indexes_applied
+            self._indexes_applied = True
+            db = self._db
+
+        if apply_indexes:
+            # Bring indexes in line with the declared plan
+            try:
+                for action in ensure_indexes(db):
+                    logger.info(f"Index migration: {action}")
+            except Exception as e:
+                logger.warning(f"Error migrating indexes: {str(e)}")
+
+    def get_collection(self, name):
+        """A collection of the current process's database, or None while MongoDB is unavailable"""
+        db = self.get_db()
+        if db is None:
+            return None
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = db[name]
+        return collection
+
+    def _connect_mongo(self):
+        """A client that answered a ping, or None; blocks for the retries, so never call it with _lock held"""
+        client = self._mongo_override
+        if client is None:
+            client = self._create_mongo_client()
+            if client is None:
+                return None
+
+        for attempt in range(Config.MONGO_CONNECT_RETRIES):
+            try:
+                client.admin.command('ping')
+                break
+            except Exception as e:
+                logger.error(f"Error connecting to MongoDB (attempt {attempt + 1}): {str(e)}")
+                if attempt + 1 == Config.MONGO_CONNECT_RETRIES:
+                    if client is not self._mongo_override:
+                        client.close()
+                    return None
+                time.sleep(0.5 * 2 ** attempt)
+        logger.info(f"Connected to MongoDB in worker {os.getpid()}")
+        return client
+
+    def _create_mongo_client(self):
         uri = Config.MONGODB_URI
-        if '@' in uri:
-            # If the URI contains credentials, ensure they're properly encoded
-            parts = uri.split('@')
-            credentials = parts[0].split('://')[1]
-            host = parts[1]
-            username, password = credentials.split(':')
-            encoded_username = urllib.parse.quote_plus(username)
-            encoded_password = urllib.parse.quote_plus(password)
-            uri = f"mongodb+srv://{encoded_username}:{encoded_password}@{host}"
-        
-        # Initialize MongoDB client with retryWrites and w=majority
-        client = MongoClient(uri, retryWrites=True, w='majority')
-        
-        # Test the connection
-        client.admin.command('ping')
-        logger.info("Successfully connected to MongoDB")
-
-        # Get database instance
-        db = client.reccy_ai
-
-        # Initialize collections
-        users = db.users
-        interactions = db.interactions
-        recommendations = db.recommendations
-        analytics = db.analytics
-
-        # Create indexes
+        if not uri:
+            logger.error("MONGODB_URI is not set in environment variables")
+            return None
+        if uri.startswith('mongomock://'):
+            import mongomock
+            return mongomock.MongoClient()
+        return MongoClient(
+            encode_uri(uri),
+            maxPoolSize=Config.MONGO_MAX_POOL_SIZE,
+            minPoolSize=Config.MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=Config.MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=Config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            connectTimeoutMS=Config.MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=Config.MONGO_SOCKET_TIMEOUT_MS,
+            serverSelectionTimeoutMS=Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            retryWrites=Config.MONGO_RETRY_WRITES,
+            retryReads=Config.MONGO_RETRY_READS,
+            w='majority',
+            event_listeners=[self.pool_metrics, self.command_metrics]
+        )
+
+    def get_firestore(self):
+        """The Firestore client for this process, or None if Firebase is not configured"""
+        if self._pid == os.getpid() and self._firestore is not None:
+            return self._firestore
+        with self._lock:
+            self._check_pid()
+            if self._firestore is None and not self._firestore_failed:
+                self._firestore = self._firestore_override or self._create_firestore_client()
+                self._firestore_failed = self._firestore is None
+            return self._firestore
+
+    def _create_firestore_client(self):
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
+        cred_path = Path(Config.FIREBASE_CREDENTIALS)
+        if not cred_path.exists():
+            logger.error(f"Firebase credentials not found at {cred_path}")
+            return None
         try:
-            users.create_index('email', unique=True)
-            interactions.create_index([('user_id', 1), ('timestamp', -1)])
-            recommendations.create_index([('user_id', 1), ('created_at', -1)])
-            analytics.create_index([('user_id', 1), ('date', -1)])
-            logger.info("Successfully created MongoDB indexes")
+            # A named app per process, so a forked worker never shares the parent's gRPC channel
+            app = firebase_admin.initialize_app(credentials.Certificate(str(cred_path)), name=f'worker-{os.getpid()}')
+            return firestore.client(app)
         except Exception as e:
-            logger.warning(f"Error creating indexes: {str(e)}")
-
-    except Exception as e:
-        logger.error(f"Error connecting to MongoDB: {str(e)}")
-        # Set default values in case of connection failure
-        db = None
-        users = None
-        interactions = None
-        recommendations = None
-        analytics = None
-
-# Initialize the database connection
-init_db()
+            logger.error(f"Error initializing Firestore: {str(e)}")
+            return None
+
+    def stats(self):
+        """Availability and pool usage of this process's clients"""
+        return {
+            'pid': os.getpid(),
+            'mongo': {
+                'available': self._pid == os.getpid() and self._db is not None,
+                'pool': self.pool_metrics.snapshot(Config.MONGO_MAX_POOL_SIZE)
+            },
+            'firestore': {
+                'available': self._pid == os.getpid() and self._firestore is not None
+            }
+        }
+
+    def close(self):
+        """Close this process's clients; the next access reconnects"""
+        with self._lock:
+            if self._pid == os.getpid() and self._client is not None and self._client is not self._mongo_override:
+                self._client.close()
+            self._reset(None)
+
+storage = StorageManager()
+
+def _pool_samples():
+    pool = storage.stats()['mongo']['pool']
+    return [((field,), pool[field]) for field in ('open', 'in_use', 'peak_in_use', 'max_pool_size', 'saturation')]
+
+def _pool_event_samples():
+    pool = storage.stats()['mongo']['pool']
+    return [((field,), pool[field]) for field in ('checkouts', 'checkout_timeouts', 'checkout_failures', 'pools_cleared')]
+
+REGISTRY.gauge('mongo_pool', 'MongoDB connection pool usage of this worker', _pool_samples, ('field',))
+REGISTRY.gauge('mongo_pool_events', 'MongoDB connection pool events since this worker connected',
+               _pool_event_samples, ('event',))
+
+def get_db():
+    return storage.get_db()
+
+def get_collection(name):
+    return storage.get_collection(name)
+
+def get_firestore():
+    return storage.get_firestore()
+
+def storage_stats():
+    return storage.stats()
+
+def init_db():
+    """Connect eagerly (e.g. from a post-fork hook); returns the database or None"""
+    return storage.get_db()
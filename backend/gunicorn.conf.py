@@ -0,0 +1,47 @@
+"""
+Gunicorn settings for the API.
+
+SERVER_MODE picks the worker type:
+
+- sync (default): one request at a time per worker; every outbound call
+  (MongoDB, Firestore, scraped sites) holds the worker until it returns.
+- eventlet: cooperative workers serving up to WORKER_CONNECTIONS requests
+  each. Sockets are monkey patched, the crawl engine runs on the hub's
+  asyncio loop (EVENTLET_HUB=asyncio) and Firestore's gRPC calls go to a
+  native thread pool, so a request waiting on I/O yields to the others.
+  Job workers are green threads too, so many more of them can run.
+
+The worker count comes from WEB_CONCURRENCY and the port from PORT, as
+gunicorn already reads them.
+"""
+import os
+
+SERVER_MODE = os.getenv('SERVER_MODE', 'sync')
+
+if SERVER_MODE == 'eventlet':
+    worker_class = 'eventlet'
+    worker_connections = int(os.getenv('WORKER_CONNECTIONS', 1000))
+    # Inherited by the workers, which read them after eventlet is set up
+    os.environ.setdefault('EVENTLET_HUB', 'asyncio')
+    os.environ.setdefault('JOB_WORKERS', '64')
+elif SERVER_MODE == 'sync':
+    worker_class = 'sync'
+else:
+    raise ValueError(f"Unknown SERVER_MODE {SERVER_MODE!r}; expected 'sync' or 'eventlet'")
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# The app must be imported in each worker, after eventlet has patched it
+preload_app = False
+
+# app.py imports its siblings as top-level modules (config, services.*) and
+# the services import the backend package, so both directories go on the path
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+pythonpath = ','.join([os.path.dirname(BACKEND_DIR), BACKEND_DIR])
+
+def post_worker_init(worker):
+    """Connect to MongoDB before the first request instead of during it"""
+    from backend.database import init_db
+    init_db()
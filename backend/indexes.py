@@ -0,0 +1,239 @@
+"""
+Declarative index plan for the MongoDB collections.
+
+INDEXES lists the indexes every collection should have (including TTL
+indexes that expire raw events), QUERY_SHAPES lists the hot queries each
+service issues with representative values, and OBSOLETE_INDEXES lists
+indexes that earlier versions created and that are safe to drop.
+
+ensure_indexes() migrates a database to the plan idempotently and runs at
+startup from init_db. check_query_coverage() explains every query shape and
+reports the ones that would scan a whole collection. To check a database
+from CI (connecting applies the plan first):
+    python -m backend.indexes
+which exits non-zero when a hot query is not covered by an index. The test
+suite runs the same check against mongomock (backend/tests/test_indexes.py),
+where explain() is approximated by matching index prefixes.
+"""
+import argparse
+import sys
+from datetime import datetime
+from pymongo.errors import OperationFailure
+from backend.config import Config
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+INDEX_NOT_FOUND = 27
+INDEX_OPTIONS_CONFLICT = 85
+INDEX_KEY_SPECS_CONFLICT = 86
+
+# collection -> indexes; each index is its key list plus create_index options
+INDEXES = {
+    'users': [
+        {'keys': [('email', 1)], 'unique': True}
+    ],
+    'interactions': [
+        {'keys': [('user_id', 1), ('timestamp', -1)]},
+        {'keys': [('received_at', 1)], 'expireAfterSeconds': Config.INTERACTION_RETENTION_DAYS * DAY}
+    ],
+    'recommendations': [
+        {'keys': [('user_id', 1), ('created_at', -1)]}
+    ],
+    'analytics': [
+        {'keys': [('user_id', 1), ('timestamp', -1)]},
+        {'keys': [('timestamp', 1)], 'expireAfterSeconds': Config.ANALYTICS_RETENTION_DAYS * DAY}
+    ],
+    'analytics_rollups': [
+        {'keys': [('user_id', 1), ('granularity', 1), ('bucket', 1)], 'unique': True},
+        # Hourly rollups only back the daily view; daily rollups are kept
+        {'keys': [('bucket', 1)], 'expireAfterSeconds': Config.HOURLY_ROLLUP_RETENTION_DAYS * DAY,
+         'partialFilterExpression': {'granularity': 'hour'}}
+    ],
+    'scrape_cache': [
+        {'keys': [('url', 1)], 'unique': True},
+        {'keys': [('fetched_at', 1)], 'expireAfterSeconds': Config.SCRAPE_CACHE_RETENTION_DAYS * DAY}
+    ],
+    'scrape_history': [
+        {'keys': [('user_id', 1), ('version', -1)], 'unique': True},
+        {'keys': [('scraped_at', 1)], 'expireAfterSeconds': Config.SCRAPE_HISTORY_RETENTION_DAYS * DAY}
+    ],
+    'jobs': [
+        {'keys': [('dedup_key', 1)], 'unique': True, 'partialFilterExpression': {'active': True}},
+        {'keys': [('status', 1), ('lease_expires_at', 1)]},
+        {'keys': [('finished_at', 1)], 'expireAfterSeconds': Config.JOB_RETENTION_DAYS * DAY}
+    ]
+}
+
+# Indexes created by earlier releases that no query uses any more
+OBSOLETE_INDEXES = {
+    'analytics': ['user_id_1_date_-1'],
+    'jobs': ['status_1_updated_at_1']
+}
+
+# Hot queries per collection, with representative values for explain()
+QUERY_SHAPES = [
+    {'name': 'user by email', 'collection': 'users', 'filter': {'email': 'owner@example.com'}},
+    {'name': 'user by id', 'collection': 'users', 'filter': {'_id': '000000000000000000000000'}},
+    {'name': 'raw analytics range', 'collection': 'analytics',
+     'filter': {'user_id': 'user', 'timestamp': {'$gte': datetime(2024, 1, 1)}}},
+    {'name': 'rollup range', 'collection': 'analytics_rollups',
+     'filter': {'user_id': 'user', 'granularity': 'day', 'bucket': {'$gte': datetime(2024, 1, 1)}}},
+    {'name': 'interactions range', 'collection': 'interactions',
+     'filter': {'user_id': 'user', 'timestamp': {'$gte': datetime(2024, 1, 1)}}, 'sort': [('timestamp', -1)]},
+    {'name': 'recent recommendations', 'collection': 'recommendations',
+     'filter': {'user_id': 'user'}, 'sort': [('created_at', -1)]},
+    {'name': 'scrape cache by url', 'collection': 'scrape_cache', 'filter': {'url': 'https://example.com/'}},
+    {'name': 'scrape history page', 'collection': 'scrape_history',
+     'filter': {'user_id': 'user', 'version': {'$lt': 10}}, 'sort': [('version', -1)],
+     'projection': {'version': 1, 'url': 1, 'industry': 1, 'scraped_at': 1, '_id': 0}},
+    {'name': 'active job by dedup key', 'collection': 'jobs', 'filter': {'dedup_key': 'scrape:user', 'active': True}},
+    {'name': 'queued jobs', 'collection': 'jobs', 'filter': {'status': 'queued'}},
+    {'name': 'expired job leases', 'collection': 'jobs', 'filter': {'$or': [
+        {'status': 'running', 'lease_expires_at': {'$lt': datetime(2024, 1, 1)}},
+        {'status': 'running', 'lease_expires_at': {'$exists': False}, 'updated_at': {'$lt': datetime(2024, 1, 1)}}
+    ]}}
+]
+
+def index_name(keys):
+    """The name MongoDB gives an index on keys by default"""
+    return '_'.join(f'{field}_{direction}' for field, direction in keys)
+
+def _options(spec):
+    return {option: value for option, value in spec.items() if option != 'keys'}
+
+def _matches(existing, spec):
+    """Whether an index from index_information() is the index spec asks for"""
+    if list(existing['key']) != [tuple(key) for key in spec['keys']]:
+        return False
+    return all(existing.get(option) == value for option, value in _options(spec).items()) and \
+        all(option in spec for option in ('unique', 'expireAfterSeconds', 'partialFilterExpression')
+            if option in existing)
+
+def ensure_indexes(db, plan=None, obsolete=None):
+    """
+    Bring db's indexes in line with the plan. Missing indexes are created,
+    a changed TTL is updated in place with collMod, any other changed index is
+    rebuilt, and obsolete indexes are dropped. Safe to run from several
+    workers at once. Returns a list of the actions taken.
+    """
+    plan = INDEXES if plan is None else plan
+    obsolete = OBSOLETE_INDEXES if obsolete is None else obsolete
+    actions = []
+
+    for collection_name, specs in plan.items():
+        collection = db[collection_name]
+        existing = collection.index_information()
+        for spec in specs:
+            name = spec.get('name') or index_name(spec['keys'])
+            current = existing.get(name)
+            if current is not None and _matches(current, spec):
+                continue
+
+            if current is not None and _only_ttl_differs(current, spec):
+                db.command('collMod', collection_name, index={
+                    'keyPattern': dict(spec['keys']),
+                    'expireAfterSeconds': spec['expireAfterSeconds']
+                })
+                actions.append(f'{collection_name}.{name}: ttl set to {spec["expireAfterSeconds"]}s')
+                continue
+
+            if current is not None:
+                _drop(collection, name)
+                actions.append(f'{collection_name}.{name}: dropped to rebuild')
+            try:
+                collection.create_index(spec['keys'], name=name, **_options(spec))
+            except OperationFailure as e:
+                if e.code not in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT):
+                    raise
+                # Another worker created it first with the old options; the next start settles it
+                logger.warning(f"Index {collection_name}.{name} conflicts with an existing one: {str(e)}")
+                continue
+            actions.append(f'{collection_name}.{name}: created')
+
+    for collection_name, names in obsolete.items():
+        existing = db[collection_name].index_information()
+        for name in names:
+            if name in existing:
+                _drop(db[collection_name], name)
+                actions.append(f'{collection_name}.{name}: dropped (obsolete)')
+
+    return actions
+
+def _only_ttl_differs(existing, spec):
+    if 'expireAfterSeconds' not in spec or 'expireAfterSeconds' not in existing:
+        return False
+    return _matches(dict(existing, expireAfterSeconds=spec['expireAfterSeconds']), spec)
+
+def _drop(collection, name):
+    try:
+        collection.drop_index(name)
+    except OperationFailure as e:
+        if e.code != INDEX_NOT_FOUND:
+            raise
+
+def _plan_stages(plan):
+    """Every stage name in an explain() plan tree"""
+    stages = [plan.get('stage')]
+    for child in ('inputStage', 'queryPlan'):
+        if child in plan:
+            stages.extend(_plan_stages(plan[child]))
+    for branch in plan.get('inputStages', []):
+        stages.extend(_plan_stages(branch))
+    return stages
+
+def _prefix_plan(collection, shape):
+    """
+    Stages a planner that only uses an index whose first field the filter
+    constrains would pick; stands in for explain() on clients without it
+    (mongomock), so the check can run in tests.
+    """
+    # Every collection has the _id index, whether or not the client lists it
+    leading = {'_id'} | {info['key'][0][0] for info in collection.index_information().values()}
+    branches = shape['filter'].get('$or', [shape['filter']])
+    stages = ['IXSCAN' if leading & set(branch) else 'COLLSCAN' for branch in branches]
+    return ['OR'] + stages if '$or' in shape['filter'] else stages
+
+def check_query_coverage(db, shapes=None):
+    """
+    Explain every query shape and return [(shape name, stages)] for those
+    whose winning plan scans the whole collection.
+    """
+    uncovered = []
+    for shape in QUERY_SHAPES if shapes is None else shapes:
+        collection = db[shape['collection']]
+        cursor = collection.find(shape['filter'], shape.get('projection'))
+        if shape.get('sort'):
+            cursor = cursor.sort(shape['sort'])
+        if hasattr(cursor, 'explain'):
+            explain = cursor.explain()
+            planner = explain.get('queryPlanner', explain)
+            stages = _plan_stages(planner.get('winningPlan', {}))
+        else:
+            stages = _prefix_plan(collection, shape)
+        if 'COLLSCAN' in stages:
+            uncovered.append((shape['name'], stages))
+    return uncovered
+
+def main():
+    argparse.ArgumentParser(description='Check that every hot query is covered by an index').parse_args()
+
+    # Connecting applies the index plan
+    from backend.database import get_db
+    db = get_db()
+    if db is None:
+        logger.error('MongoDB is not available (is MONGODB_URI set?)')
+        return 2
+
+    uncovered = check_query_coverage(db)
+    for name, stages in uncovered:
+        print(f'NOT COVERED: {name} ({" > ".join(stage for stage in stages if stage)})', file=sys.stderr)
+    print(f'{len(QUERY_SHAPES) - len(uncovered)}/{len(QUERY_SHAPES)} query shapes use an index')
+    return 1 if uncovered else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
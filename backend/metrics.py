@@ -0,0 +1,306 @@
+"""
+In-process metrics for the API, exposed in the Prometheus text format.
+
+Histograms record request latency per route (see init_app) and the duration
+of named spans around scraping, recommendations, analytics, storage calls and
+jobs. Gauges are read from callbacks when /metrics is scraped. Metrics are
+kept per worker process, so each gunicorn worker reports its own series
+(label them by instance or pid when scraping several).
+
+SamplingProfiler is opt-in (PROFILE_SLOW_REQUEST_MS): it samples the stack
+of every in-flight request and, for requests slower than the threshold,
+writes the sampled stacks in folded format (flamegraph.pl / speedscope) to
+PROFILE_DIR and logs the hottest ones.
+"""
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from functools import wraps
+from backend.config import Config
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Histogram:
+    """Cumulative latency histogram with one series per combination of label values"""
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(values, list(counts), total) for values, (counts, total) in self._series.items()]
+        for values, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f'{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, values)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labels, values)} {cumulative}')
+        return lines
+
+class Counter:
+    """Monotonic counter with one series per combination of label values"""
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self._lock:
+            series = sorted(self._series.items())
+        lines.extend(f'{self.name}{_labels(self.labels, values)} {value}' for values, value in series)
+        return lines
+
+class Gauge:
+    """Values read from callback() at scrape time, as [(label values, value)]"""
+
+    def __init__(self, name, description, callback, labels=()):
+        self.name = name
+        self.description = description
+        self.callback = callback
+        self.labels = tuple(labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} gauge']
+        try:
+            samples = self.callback()
+        except Exception as e:
+            logger.warning(f"Error reading gauge {self.name}: {str(e)}")
+            return lines
+        lines.extend(f'{self.name}{_labels(self.labels, values)} {float(value)}' for values, value in samples)
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering (e.g. a module imported under two names) keeps the first metric
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def counter(self, name, description, labels=()):
+        return self._register(Counter(name, description, labels))
+
+    def gauge(self, name, description, callback, labels=()):
+        with self._lock:
+            # Gauges read live objects, so the latest callback wins
+            self._metrics[name] = Gauge(name, description, callback, labels)
+            return self._metrics[name]
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route', ('method', 'route', 'status')
+)
+SPAN_DURATION = REGISTRY.histogram(
+    'span_duration_seconds', 'Duration of instrumented operations', ('span',)
+)
+SPAN_ERRORS = REGISTRY.counter(
+    'span_errors_total', 'Instrumented operations that raised', ('span',)
+)
+
+@contextmanager
+def span(name):
+    """Time a block as the named span"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        SPAN_ERRORS.inc(1, name)
+        raise
+    finally:
+        SPAN_DURATION.observe(time.perf_counter() - start, name)
+
+def timed(name):
+    """Decorator timing every call of a function as the named span"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class SamplingProfiler:
+    """
+    Samples the stacks of threads serving requests every interval seconds.
+    start() registers the calling thread; stop() returns or dumps what was
+    sampled. Stacks are read with sys._current_frames(), so green threads
+    (eventlet workers) cannot be sampled.
+    """
+
+    def __init__(self, threshold, interval, directory, top=5):
+        self.threshold = threshold
+        self.interval = interval
+        self.directory = directory
+        self.top = top
+        self._active = {}  # thread id -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+
+    def start(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._active[thread_id] = StackCounter()
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._sample, name='sampling-profiler', daemon=True).start()
+        self._wake.set()
+        return thread_id
+
+    def stop(self, token, duration=None, label=''):
+        """Stop sampling a request; dumps its stacks if it took longer than threshold"""
+        with self._lock:
+            stacks = self._active.pop(token, None)
+        if stacks and duration is not None and duration >= self.threshold:
+            self._dump(label, duration, stacks)
+        return stacks
+
+    def _sample(self):
+        while True:
+            if not self._active:
+                self._wake.clear()
+                self._wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame):
+        """Root-first 'file:function:line;...' stack, the folded format flame graphs read"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _dump(self, label, duration, stacks):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            name = ''.join(c if c.isalnum() else '_' for c in label).strip('_') or 'request'
+            path = os.path.join(self.directory, f'{int(time.time() * 1000)}-{os.getpid()}-{name}.folded')
+            with open(path, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+        except OSError as e:
+            logger.warning(f"Error writing profile: {str(e)}")
+            path = None
+
+        # Log the innermost frames only, merging stacks that share them
+        tails = StackCounter()
+        for stack, count in stacks.items():
+            tails[' <- '.join(reversed(stack.rsplit(';', 3)[-3:]))] += count
+        total = sum(tails.values())
+        hottest = '\n'.join(f'  {count / total:5.1%} {tail}' for tail, count in tails.most_common(self.top))
+        logger.warning(f"Slow request {label} took {duration * 1000:.0f}ms ({total} samples, profile {path}):\n{hottest}")
+
+def create_profiler():
+    """The profiler configured by PROFILE_SLOW_REQUEST_MS, or None when profiling is off"""
+    if Config.PROFILE_SLOW_REQUEST_MS <= 0:
+        return None
+    from backend.concurrency import cooperative
+    if cooperative():
+        logger.warning("Slow request profiling is not available with eventlet workers")
+        return None
+    return SamplingProfiler(
+        Config.PROFILE_SLOW_REQUEST_MS / 1000,
+        Config.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+        Config.PROFILE_DIR
+    )
+
+def init_app(app, profiler=None):
+    """Record every request's latency by route (and profile slow ones when a profiler is given)"""
+    from flask import g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        if profiler is not None:
+            g.profile = profiler.start()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        # The URL rule (e.g. /jobs/<job_id>) keeps the number of series bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_DURATION.observe(duration, request.method, route, str(response.status_code))
+        if profiler is not None and 'profile' in g:
+            profiler.stop(g.pop('profile'), duration, f'{request.method} {route}')
+        return response
+
+    @app.teardown_request
+    def stop_profile(exc):
+        if profiler is not None and 'profile' in g:
+            profiler.stop(g.pop('profile'))
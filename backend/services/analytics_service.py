@@ -1,38 +1,137 @@
+from array import array
+from collections import defaultdict
 from datetime import datetime, timedelta
-from backend.database import db
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+from backend.config import Config
+from backend.database import get_collection
+from backend.metrics import timed
+from backend.services.event_writer import BufferedEventWriter
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# time range -> (lookback, bucket unit, bucket label format)
+TIME_RANGES = {
+    'daily': (timedelta(days=1), 'hour', '%Y-%m-%d %H:00'),
+    'weekly': (timedelta(days=7), 'day', '%Y-%m-%d'),
+    'monthly': (timedelta(days=30), 'day', '%Y-%m-%d')
+}
+
+BUCKET_STEPS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1)
+}
+
+def truncate(moment, unit):
+    """Round a datetime down to the start of its hour or day (like $dateTrunc)"""
+    if unit == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def bucket_plan(time_range, now):
+    """Return (first bucket start, bucket unit, number of buckets, label format)"""
+    lookback, unit, format_string = TIME_RANGES.get(time_range, TIME_RANGES['monthly'])
+    start = truncate(now - lookback, unit)
+    count = (truncate(now, unit) - start) // BUCKET_STEPS[unit] + 1
+    return start, unit, count, format_string
+
+def bin_timestamps(timestamps, start, unit, count):
+    """
+    Count timestamps per bucket in a single pass.
+    timestamps may be any iterable of datetimes; returns an array of length
+    count, where bucket i covers [start + i * step, start + (i + 1) * step).
+    """
+    step = BUCKET_STEPS[unit]
+    counts = array('q', bytes(8 * count))
+    for stamp in timestamps:
+        index = (stamp - start) // step
+        if 0 <= index < count:
+            counts[index] += 1
+    return counts
+
+def rollup_key(industry):
+    """Industry name usable as a field name under 'industries'"""
+    return (industry or 'Unknown').replace('.', '_').replace('$', '_')
+
+def rollup_increments(events):
+    """
+    Merge events into {(user_id, granularity, bucket): {'count': events,
+    'industries': {industry: recommendations}}}
+    """
+    totals = defaultdict(lambda: {'count': 0, 'industries': defaultdict(int)})
+    for event in events:
+        industry = rollup_key(event.get('industry'))
+        recommendations = len(event.get('recommendations') or [])
+        for unit in BUCKET_STEPS:
+            increments = totals[(event['user_id'], unit, truncate(event['timestamp'], unit))]
+            increments['count'] += 1
+            increments['industries'][industry] += recommendations
+    return totals
+
+def batch_rollup_updates(events):
+    """One $inc upsert per (user, granularity, bucket) covering a whole batch of events"""
+    updates = []
+    for (user_id, unit, bucket), increments in rollup_increments(events).items():
+        inc = {'count': increments['count']}
+        for industry, recommendations in increments['industries'].items():
+            inc[f'industries.{industry}'] = recommendations
+        updates.append(UpdateOne({'user_id': user_id, 'granularity': unit, 'bucket': bucket}, {'$inc': inc}, upsert=True))
+    return updates
+
 class AnalyticsService:
-    def __init__(self):
-        if db is None:
-            logger.warning("MongoDB connection not available. Analytics service will operate in offline mode.")
-            self.analytics = None
-            self.recommendations = None
-        else:
-            self.analytics = db.analytics
-            self.recommendations = db.recommendations
-
-    def track_recommendation(self, user_id, recommendations):
-        """Track when recommendations are generated for a user"""
-        if self.analytics is None:
-            logger.warning("Analytics tracking skipped - MongoDB not available")
-            return
+    def __init__(self, listeners=None):
+        self.writer = BufferedEventWriter('analytics', after_insert=self._apply_rollups)
+        # Called with every tracked event, e.g. to push live dashboard updates
+        self.listeners = list(listeners or [])
+
+    # Collections are looked up per call so each worker uses its own client
+    @property
+    def analytics(self):
+        return get_collection('analytics')
+
+    @property
+    def recommendations(self):
+        return get_collection('recommendations')
 
+    @property
+    def rollups(self):
+        return get_collection('analytics_rollups')
+
+    @timed('analytics.track_recommendation')
+    def track_recommendation(self, user_id, recommendations, industry=None):
+        """
+        Track when recommendations are generated for a user.
+        The event is buffered and written in the background together with its
+        rollup increments, so the request never waits on MongoDB (events are
+        spilled to disk and replayed later while it is unavailable).
+        """
         analytics_data = {
             'user_id': user_id,
+            'industry': industry,
             'recommendations': recommendations,
             'timestamp': datetime.utcnow(),
             'status': 'generated'  # Can be 'generated', 'viewed', 'implemented'
         }
         try:
-            self.analytics.insert_one(analytics_data)
+            self.writer.write(analytics_data)
+            for listener in self.listeners:
+                listener(analytics_data)
         except Exception as e:
             logger.error(f"Error tracking analytics: {str(e)}")
 
+    @timed('analytics.apply_rollups')
+    def _apply_rollups(self, events):
+        """Keep the hourly and daily rollups in step with a flushed batch of raw events"""
+        self.rollups.bulk_write(batch_rollup_updates(events), ordered=False)
+
+    def flush(self):
+        """Write any buffered events now"""
+        self.writer.flush()
+
+    @timed('analytics.recommendation_performance')
     def get_recommendation_performance(self, user_id, time_range='daily'):
         """Get recommendation performance analytics for a user"""
         if self.analytics is None:
@@ -43,45 +142,24 @@ class AnalyticsService:
             }
 
         now = datetime.utcnow()
-        
-        # Set time range
-        if time_range == 'daily':
-            start_date = now - timedelta(days=1)
-            interval = timedelta(hours=1)
-            format_string = '%Y-%m-%d %H:00'
-        elif time_range == 'weekly':
-            start_date = now - timedelta(days=7)
-            interval = timedelta(days=1)
-            format_string = '%Y-%m-%d'
-        else:  # monthly
-            start_date = now - timedelta(days=30)
-            interval = timedelta(days=1)
-            format_string = '%Y-%m-%d'
+        start_date, unit, bucket_count, format_string = bucket_plan(time_range, now)
 
         try:
-            # Get analytics data
-            analytics_data = list(self.analytics.find({
-                'user_id': user_id,
-                'timestamp': {'$gte': start_date}
-            }).sort('timestamp', 1))
+            try:
+                counts = self._rollup_buckets(user_id, start_date, unit, bucket_count)
+            except Exception as e:
+                logger.warning(f"Rollups unavailable, counting raw events: {str(e)}")
+                counts = self._raw_buckets(user_id, start_date, unit, bucket_count)
 
             # Process data for graph
-            data_points = []
-            current_date = start_date
-
-            while current_date <= now:
-                end_date = current_date + interval
-                
-                # Count recommendations in this interval
-                count = sum(1 for data in analytics_data 
-                           if current_date <= data['timestamp'] < end_date)
-                
-                data_points.append({
-                    'date': current_date.strftime(format_string),
-                    'recommendations': count
-                })
-                
-                current_date = end_date
+            step = BUCKET_STEPS[unit]
+            data_points = [
+                {
+                    'date': (start_date + index * step).strftime(format_string),
+                    'recommendations': int(count)
+                }
+                for index, count in enumerate(counts)
+            ]
 
             return {
                 'time_range': time_range,
@@ -94,6 +172,55 @@ class AnalyticsService:
                 'data': []
             }
 
+    def _rollup_buckets(self, user_id, start_date, unit, bucket_count):
+        """Read bucket counts from the pre-aggregated rollups"""
+        counts = array('q', bytes(8 * bucket_count))
+        step = BUCKET_STEPS[unit]
+        rollups = self.rollups.find(
+            {'user_id': user_id, 'granularity': unit, 'bucket': {'$gte': start_date}},
+            {'bucket': 1, 'count': 1, '_id': 0}
+        )
+        for rollup in rollups:
+            index = (rollup['bucket'] - start_date) // step
+            if 0 <= index < bucket_count:
+                counts[index] += rollup['count']
+        return counts
+
+    def _raw_buckets(self, user_id, start_date, unit, bucket_count):
+        """Count raw events per bucket, server-side when the server supports it"""
+        try:
+            return self._aggregate_buckets(user_id, start_date, unit, bucket_count)
+        except OperationFailure as e:
+            # Servers without $dateTrunc (MongoDB < 5.0): bin the timestamps locally
+            logger.warning(f"Aggregation bucketing unavailable, binning locally: {str(e)}")
+            return self._bin_buckets(user_id, start_date, unit, bucket_count)
+
+    def _aggregate_buckets(self, user_id, start_date, unit, bucket_count):
+        """Count events per bucket server-side with $group on $dateTrunc"""
+        pipeline = [
+            {'$match': {'user_id': user_id, 'timestamp': {'$gte': start_date}}},
+            {'$group': {
+                '_id': {'$dateTrunc': {'date': '$timestamp', 'unit': unit}},
+                'count': {'$sum': 1}
+            }}
+        ]
+        counts = array('q', bytes(8 * bucket_count))
+        step = BUCKET_STEPS[unit]
+        for bucket in self.analytics.aggregate(pipeline):
+            index = (bucket['_id'].replace(tzinfo=None) - start_date) // step
+            if 0 <= index < bucket_count:
+                counts[index] += bucket['count']
+        return counts
+
+    def _bin_buckets(self, user_id, start_date, unit, bucket_count):
+        """Count events per bucket locally, streaming only the timestamps"""
+        cursor = self.analytics.find(
+            {'user_id': user_id, 'timestamp': {'$gte': start_date}},
+            {'timestamp': 1, '_id': 0}
+        ).batch_size(10000)
+        return bin_timestamps((event['timestamp'] for event in cursor), start_date, unit, bucket_count)
+
+    @timed('analytics.industry_distribution')
     def get_industry_distribution(self, user_id):
         """Get distribution of recommendations across industries"""
         if self.analytics is None:
@@ -104,16 +231,17 @@ class AnalyticsService:
             }
 
         try:
-            analytics_data = list(self.analytics.find({
-                'user_id': user_id,
-                'timestamp': {'$gte': datetime.utcnow() - timedelta(days=30)}
-            }))
+            start_date = truncate(datetime.utcnow() - timedelta(days=30), 'day')
+            rollups = self.rollups.find(
+                {'user_id': user_id, 'granularity': 'day', 'bucket': {'$gte': start_date}},
+                {'industries': 1, '_id': 0}
+            )
 
             industry_counts = {}
-            for data in analytics_data:
-                for rec in data['recommendations']:
-                    industry = rec.get('industry', 'Unknown')
-                    industry_counts[industry] = industry_counts.get(industry, 0) + 1
+            for rollup in rollups:
+                for industry, count in rollup.get('industries', {}).items():
+                    if count:
+                        industry_counts[industry] = industry_counts.get(industry, 0) + count
 
             return {
                 'industries': list(industry_counts.keys()),
@@ -125,3 +253,75 @@ class AnalyticsService:
                 'industries': [],
                 'counts': []
             }
+
+    @timed('analytics.rebuild_rollups')
+    def rebuild_rollups(self, user_id=None, batch_size=1000):
+        """
+        Rebuild the hourly and daily rollups from raw analytics events, for
+        one user or everyone. Events tracked while the rebuild runs may be
+        counted twice or missed, so run it while tracking is quiet.
+        Raw events expire (ANALYTICS_RETENTION_DAYS), so rollups older than
+        the first full day of raw events are left untouched.
+        Returns the number of rollup updates applied.
+        """
+        if self.analytics is None:
+            logger.warning("Rollup rebuild skipped - MongoDB not available")
+            return 0
+
+        match = {} if user_id is None else {'user_id': user_id}
+        rollup_match = dict(match)
+        oldest = self.analytics.find_one(match, {'timestamp': 1, '_id': 0}, sort=[('timestamp', 1)])
+        expiry = datetime.utcnow() - timedelta(days=Config.ANALYTICS_RETENTION_DAYS)
+        if oldest is not None and oldest['timestamp'] <= expiry + BUCKET_STEPS['day']:
+            # The oldest day may already be partly expired, so start at the next one
+            start = truncate(oldest['timestamp'], 'day') + BUCKET_STEPS['day']
+            match['timestamp'] = {'$gte': start}
+            rollup_match['bucket'] = {'$gte': start}
+
+        # Compute every rollup before touching the existing ones
+        updates = []
+        for unit in BUCKET_STEPS:
+            for (rollup_user, bucket, industry), (events, recommendations) in self._rollup_groups(match, unit).items():
+                updates.append(UpdateOne(
+                    {'user_id': rollup_user, 'granularity': unit, 'bucket': bucket},
+                    {'$inc': {'count': events, f'industries.{rollup_key(industry)}': recommendations}},
+                    upsert=True
+                ))
+
+        self.rollups.delete_many(rollup_match)
+        for offset in range(0, len(updates), batch_size):
+            self.rollups.bulk_write(updates[offset:offset + batch_size], ordered=False)
+        return len(updates)
+
+    def _rollup_groups(self, match, unit):
+        """Group raw events by (user, bucket, industry) into (events, recommendations) totals"""
+        groups = {}
+        pipeline = [
+            {'$match': match},
+            {'$group': {
+                '_id': {
+                    'user_id': '$user_id',
+                    'bucket': {'$dateTrunc': {'date': '$timestamp', 'unit': unit}},
+                    'industry': '$industry'
+                },
+                'events': {'$sum': 1},
+                'recommendations': {'$sum': {'$size': {'$ifNull': ['$recommendations', []]}}}
+            }}
+        ]
+        try:
+            for group in self.analytics.aggregate(pipeline, allowDiskUse=True):
+                key = group['_id']
+                groups[(key['user_id'], key['bucket'].replace(tzinfo=None), key.get('industry'))] = (
+                    group['events'], group['recommendations']
+                )
+            return groups
+        except OperationFailure as e:
+            logger.warning(f"Aggregation bucketing unavailable, grouping locally: {str(e)}")
+
+        # Single local pass over the raw events
+        events = self.analytics.find(match, {'user_id': 1, 'timestamp': 1, 'industry': 1, 'recommendations': 1, '_id': 0})
+        for event in events.batch_size(10000):
+            key = (event['user_id'], truncate(event['timestamp'], unit), event.get('industry'))
+            count, recommendations = groups.get(key, (0, 0))
+            groups[key] = (count + 1, recommendations + len(event.get('recommendations') or []))
+        return groups
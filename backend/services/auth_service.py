@@ -1,48 +1,109 @@
+import hashlib
+import time
 import jwt
 from datetime import datetime, timedelta
 from backend.config import Config
+from backend.services.cache import TTLCache
+
+class AuthError(Exception):
+    """Missing or rejected credentials; answered with 401"""
+
+def key_id(secret_key):
+    """Identifier of a signing key, carried in the token's kid header"""
+    return hashlib.sha256(secret_key.encode()).hexdigest()[:16]
 
 class AuthService:
-    def __init__(self, db):
-        self.db = db
-        self.users = db.users
+    """
+    Issues and verifies the JWTs that authenticate dashboard requests.
+
+    Tokens are signed with JWT_SECRET_KEY and name that key in their kid
+    header. To rotate, move the old key into JWT_PREVIOUS_SECRET_KEYS: tokens
+    it signed keep verifying until they expire, while new tokens use the new
+    key. Verified tokens are cached by hash until their exp, so repeat
+    requests with the same token skip signature checking.
+    """
+
+    def __init__(self, users, secret_key=None, previous_keys=None, cache=None):
+        # A UserRepository, so accounts live wherever USER_STORE says
+        self.users = users
+        self.secret_key = secret_key or Config.JWT_SECRET_KEY
+        previous_keys = Config.JWT_PREVIOUS_SECRET_KEYS if previous_keys is None else previous_keys
+        self.keys = {key_id(key): key for key in [self.secret_key, *previous_keys]}
+        self.token_cache = cache or TTLCache(Config.JWT_TOKEN_CACHE_SIZE, Config.JWT_ACCESS_TOKEN_EXPIRES)
 
-    def create_user(self, website_url, industry, website_data):
-        """Create a new user account"""
-        user = {
+    def new_user(self, email, password, website_url):
+        """The document of a new user account, not stored yet"""
+        return {
+            'email': email,
+            'password': password,  # In production, this should be hashed
             'website_url': website_url,
-            'industry': industry,
-            'website_data': website_data,
-            'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow()
+            'industry': None,
+            'created_at': datetime.utcnow()
         }
-        result = self.users.insert_one(user)
-        user['_id'] = result.inserted_id
-        return user
+
+    def create_user(self, email, password, website_url):
+        """Create a new user account; industry is filled in by the signup analysis job"""
+        return self.users.create(self.new_user(email, password, website_url))
 
     def generate_token(self, user):
         """Generate JWT token for user"""
         payload = {
-            'user_id': str(user['_id']),
+            'user_id': user['id'],
             'website_url': user['website_url'],
-            'exp': datetime.utcnow() + timedelta(seconds=Config.JWT_EXPIRATION)
+            'exp': datetime.utcnow() + timedelta(seconds=Config.JWT_ACCESS_TOKEN_EXPIRES)
         }
-        return jwt.encode(payload, Config.JWT_SECRET, algorithm='HS256')
+        return jwt.encode(payload, self.secret_key, algorithm=Config.JWT_ALGORITHM,
+                          headers={'kid': key_id(self.secret_key)})
+
+    def verify(self, authorization):
+        """
+        Payload of the token in an Authorization header value, which may carry
+        a 'Bearer ' prefix. Raises AuthError if it is missing, invalid or
+        expired. The payload may be shared with other requests; do not modify it.
+        """
+        if not authorization:
+            raise AuthError('Authorization token is required')
+        token = authorization[7:] if authorization[:7].lower() == 'bearer ' else authorization
+        token = token.strip()
+
+        cache_key = hashlib.sha256(token.encode()).digest()
+        payload = self.token_cache.get(cache_key)
+        if payload is not None:
+            return payload
+
+        payload = self._decode(token)
+        remaining = payload['exp'] - time.time()
+        if remaining > 0:
+            self.token_cache.set(cache_key, payload, remaining)
+        return payload
+
+    def _decode(self, token):
+        try:
+            kid = jwt.get_unverified_header(token).get('kid')
+        except jwt.InvalidTokenError:
+            raise AuthError('Invalid token')
+
+        # Tokens issued before kid headers existed are tried against every key
+        candidates = [self.keys[kid]] if kid in self.keys else list(self.keys.values())
+        for secret_key in candidates:
+            try:
+                return jwt.decode(token, secret_key, algorithms=[Config.JWT_ALGORITHM],
+                                  options={'require': ['exp', 'user_id']})
+            except jwt.ExpiredSignatureError:
+                raise AuthError('Token has expired')
+            except jwt.InvalidSignatureError:
+                continue
+            except jwt.InvalidTokenError:
+                raise AuthError('Invalid token')
+        raise AuthError('Invalid token')
 
     def verify_token(self, token, user_id):
         """Verify JWT token"""
-        if not token or not token.startswith('Bearer '):
-            return False
-        
         try:
-            token = token.split(' ')[1]
-            payload = jwt.decode(token, Config.JWT_SECRET, algorithms=['HS256'])
-            return payload['user_id'] == user_id
-        except jwt.ExpiredSignatureError:
-            return False
-        except jwt.InvalidTokenError:
+            return self.verify(token)['user_id'] == user_id
+        except AuthError:
             return False
 
     def get_user(self, user_id):
         """Get user by ID"""
-        return self.users.find_one({'_id': user_id})
+        return self.users.get(user_id)
@@ -0,0 +1,324 @@
+import csv
+import io
+import json
+import time
+import uuid
+from datetime import datetime
+from backend.config import Config
+from backend.metrics import span
+from backend.services.crawl_frontier import normalize_url
+from backend.services.rate_limiter import TokenBucketLimiter
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Columns every row needs and their maximum lengths
+REQUIRED_FIELDS = {
+    'email': 254,
+    'password': 1024,
+    'website_url': 2048
+}
+
+class BulkSignupError(Exception):
+    """An upload rejected as a whole; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+def parse_upload(body, content_type=None, max_rows=None, max_bytes=None):
+    """
+    Split an upload into [(line number, raw row)] without validating rows.
+    CSV needs a header row naming the REQUIRED_FIELDS columns; NDJSON has one
+    JSON object per line (a JSON array is also accepted). The format comes
+    from content_type, or from the first character when it names neither.
+    """
+    max_rows = max_rows or Config.BULK_SIGNUP_MAX_ROWS
+    if len(body) > (max_bytes or Config.BULK_SIGNUP_MAX_BYTES):
+        raise BulkSignupError('Upload is too large', status=413)
+    try:
+        text = body.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise BulkSignupError('Upload must be UTF-8 text')
+
+    content_type = (content_type or '').lower()
+    stripped = text.lstrip()
+    if not stripped:
+        raise BulkSignupError('Upload has no rows')
+    if 'csv' in content_type or ('json' not in content_type and stripped[:1] not in ('{', '[')):
+        rows = _csv_rows(text)
+    elif stripped[:1] == '[':
+        try:
+            rows = list(enumerate(json.loads(stripped), start=1))
+        except (ValueError, TypeError, RecursionError):
+            raise BulkSignupError('Malformed JSON array')
+    else:
+        rows = [(number, line) for number, line in enumerate(text.split('\n'), start=1) if line.strip()]
+
+    if not rows:
+        raise BulkSignupError('Upload has no rows')
+    if len(rows) > max_rows:
+        raise BulkSignupError(f'At most {max_rows} rows per upload', status=413)
+    return rows
+
+def _csv_rows(text):
+    reader = csv.DictReader(io.StringIO(text))
+    try:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+        missing = [field for field in REQUIRED_FIELDS if field not in reader.fieldnames]
+        if missing:
+            raise BulkSignupError(f"CSV header must name {', '.join(REQUIRED_FIELDS)}; missing {', '.join(missing)}")
+        # Extra cells land under None as a list; a row of empty cells is skipped
+        return [(reader.line_num, row) for row in reader
+                if any(isinstance(value, str) and value.strip() for value in row.values())]
+    except csv.Error as e:
+        raise BulkSignupError(f'Malformed CSV: {str(e)}')
+
+def validate_row(raw):
+    """Check one row (a dict, or an NDJSON line) and return its email, password and website_url"""
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    if not isinstance(raw, dict):
+        raise ValueError('row must be a JSON object')
+
+    row = {}
+    for field, max_length in REQUIRED_FIELDS.items():
+        value = raw.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f'{field} is required')
+        if field != 'password':
+            value = value.strip()
+        if len(value) > max_length:
+            raise ValueError(f'{field} must be at most {max_length} characters')
+        row[field] = value
+
+    if '@' not in row['email']:
+        raise ValueError('email is not a valid address')
+    if normalize_url(row['website_url']) is None:
+        raise ValueError('website_url must be an http(s) URL')
+    return row
+
+class BulkOnboarding:
+    """
+    Signs up many sites from one upload (see parse_upload).
+
+    Invalid rows, emails repeated within the upload and emails that already
+    have an account (looked up in one batched read) are reported first. The
+    remaining sites are scraped in chunks of BULK_SIGNUP_CONCURRENCY, each
+    chunk fetched concurrently by one scrape_pages call. Finished scrapes are
+    gathered into batches of up to BULK_SIGNUP_BATCH_SIZE rows, or whatever
+    finished within BULK_SIGNUP_FLUSH_INTERVAL seconds. Each
+    batch is classified with one classifier call, its users are written with
+    one create_many, their first scrapes with one scrape history insert and
+    the recommendations with one scrape cache write.
+    run() yields each row's result as soon as its batch is written, so results
+    stream out while later chunks are still being scraped. Results carry the
+    new account ids only; each user signs in with their own password.
+
+    A site that cannot be scraped still gets its account, and the usual
+    analyze_signup job is queued to retry the analysis, as /signup does. The
+    job records the uploader as created_by, so they can follow its status_url.
+
+    Uploads from the API are charged per row against the uploading user's
+    token bucket (see admit()).
+    """
+
+    def __init__(self, auth_service, scraper_service, recommendation_service, scrape_history, job_service,
+                 concurrency=None, batch_size=None, flush_interval=None, limiter=None):
+        self.auth = auth_service
+        self.users = auth_service.users
+        self.scraper = scraper_service
+        self.recommender = recommendation_service
+        self.history = scrape_history
+        self.jobs = job_service
+        self.concurrency = concurrency or Config.BULK_SIGNUP_CONCURRENCY
+        self.batch_size = batch_size or Config.BULK_SIGNUP_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.BULK_SIGNUP_FLUSH_INTERVAL
+        self.limiter = limiter or TokenBucketLimiter(Config.BULK_SIGNUP_RATE_LIMIT, Config.BULK_SIGNUP_BURST)
+
+    def admit(self, user_id, rows):
+        """Charge an upload's rows to user_id; raises BulkSignupError (429) over the rate limit"""
+        allowed, retry_after = self.limiter.consume(user_id, len(rows))
+        if not allowed:
+            raise BulkSignupError('Rate limit exceeded', status=429, retry_after=retry_after)
+
+    def run(self, rows, import_id=None, created_by=None):
+        """
+        Sign up every (line number, raw row) of an upload. Yields one result
+        per row, in the order rows finish, then a summary with 'status': 'done'.
+        Users created by this run carry its import_id and, if given, the
+        created_by id of the user who uploaded it.
+        """
+        import_id = import_id or uuid.uuid4().hex
+        counts = {'created': 0, 'error': 0}
+
+        for result in self._run(rows, import_id, created_by):
+            counts[result['status']] += 1
+            yield result
+
+        yield {'status': 'done', 'import_id': import_id, 'rows': len(rows),
+               'created': counts['created'], 'failed': counts['error']}
+
+    def _run(self, rows, import_id, created_by):
+        accepted = []
+        seen = set()
+        for line, raw in rows:
+            try:
+                row = validate_row(raw)
+            except ValueError as e:  # json.JSONDecodeError is a ValueError too
+                yield self._error(line, str(e))
+                continue
+            except RecursionError:
+                yield self._error(line, 'row is nested too deeply')
+                continue
+            if row['email'] in seen:
+                yield self._error(line, 'Email appears more than once in the upload', row['email'])
+                continue
+            seen.add(row['email'])
+            accepted.append((line, row))
+
+        existing = self.users.find_by_emails([row['email'] for _, row in accepted], fields=['email']) if accepted else {}
+        pending = []
+        for line, row in accepted:
+            if row['email'] in existing:
+                yield self._error(line, 'Email already exists', row['email'])
+            else:
+                pending.append((line, row))
+        if not pending:
+            return
+
+        # Sites are scraped a chunk at a time through the crawl engine's event
+        # loop; a client that hangs up stops the import after the current chunk
+        finished = []
+        oldest = None
+        for start in range(0, len(pending), self.concurrency):
+            chunk = pending[start:start + self.concurrency]
+            for (line, row), scrape in zip(chunk, self._scrape(row['website_url'] for _, row in chunk)):
+                finished.append((line, row, scrape))
+            if oldest is None:
+                oldest = time.monotonic()
+
+            last = start + self.concurrency >= len(pending)
+            while finished and (len(finished) >= self.batch_size or last
+                                or time.monotonic() - oldest >= self.flush_interval):
+                batch, finished = finished[:self.batch_size], finished[self.batch_size:]
+                oldest = time.monotonic() if finished else None
+                yield from self._write(batch, import_id, created_by)
+
+    def _scrape(self, urls):
+        urls = list(urls)
+        try:
+            return self.scraper.scrape_pages(urls)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            return [{'content': [], 'recommendations': None, 'cached': False, 'error': error} for _ in urls]
+
+    def _write(self, batch, import_id, created_by):
+        """Classify and store one batch of scraped rows; returns their results"""
+        with span('bulk_signup.batch'):
+            scraped_at = datetime.utcnow()
+
+            # Recommendations cached with unchanged pages are reused; the rest are classified together
+            recommendations = {index: scrape['recommendations'] for index, (_, _, scrape) in enumerate(batch)
+                               if not scrape.get('error')}
+            uncached = [index for index, cached in recommendations.items() if cached is None]
+            fresh = self.recommender.get_recommendations_many([batch[index][2]['content'] for index in uncached])
+            for index, result in zip(uncached, fresh):
+                recommendations[index] = result
+            self.scraper.save_recommendations_many(
+                {batch[index][1]['website_url']: recommendations[index] for index in uncached}
+            )
+
+            users = []
+            for index, (_, row, _) in enumerate(batch):
+                user = self.auth.new_user(row['email'], row['password'], row['website_url'])
+                user['import_id'] = import_id
+                if created_by is not None:
+                    user['created_by'] = created_by
+                if index in recommendations:
+                    user['industry'] = recommendations[index]['industry']
+                    user['last_scrape'] = self.history.initial_reference(
+                        row['website_url'], recommendations[index], scraped_at
+                    )
+                users.append(user)
+            created = self._create(users, import_id)
+
+            try:
+                self.history.record_initial([
+                    (created[index]['id'], batch[index][1]['website_url'], batch[index][2]['content'],
+                     recommendations[index], scraped_at)
+                    for index in recommendations if isinstance(created[index], dict)
+                ])
+            except Exception as e:
+                logger.error(f"Error storing scrape history for bulk signup {import_id}: {str(e)}")
+
+            results = []
+            for index, (line, row, scrape) in enumerate(batch):
+                user = created[index]
+                if not isinstance(user, dict):
+                    results.append(self._error(line, user, row['email']))
+                    continue
+                result = {
+                    'line': line,
+                    'status': 'created',
+                    'email': row['email'],
+                    'user_id': user['id']
+                }
+                if index in recommendations:
+                    result.update(industry=recommendations[index]['industry'],
+                                  recommendations=recommendations[index], scrape_version=1)
+                else:
+                    result.update(self._queue_analysis(user, scrape['error']))
+                results.append(result)
+        return results
+
+    def _create(self, users, import_id):
+        """
+        create_many; if the batch write fails (e.g. an email signed up since it
+        was checked), users this import did write are kept and the rest are
+        created one at a time. Returns a user or an error message per user.
+        """
+        try:
+            return self.users.create_many(users)
+        except Exception as e:
+            logger.warning(f"Bulk signup batch write failed, retrying row by row: {str(e)}")
+
+        written = self.users.find_by_emails([user['email'] for user in users], fields=['email', 'import_id'])
+        created = []
+        for user in users:
+            found = written.get(user['email'])
+            if found is not None:
+                if found.get('import_id') == import_id:
+                    created.append(dict(user, id=found['id']))
+                else:
+                    created.append('Email already exists')
+                continue
+            try:
+                created.append(self.users.create(user))
+            except Exception as e:
+                created.append(f'Could not create account: {str(e)}')
+        return created
+
+    def _queue_analysis(self, user, error):
+        try:
+            job = self.jobs.enqueue(
+                'analyze_signup',
+                {'user_id': user['id'], 'website_url': user['website_url']},
+                user_id=user['id'],
+                dedup_key=f"analyze_signup:{user['id']}",
+                created_by=user.get('created_by')
+            )
+        except Exception as e:
+            logger.error(f"Error queueing analysis for {user['id']}: {str(e)}")
+            return {'industry': None, 'analysis_error': error}
+        return {'industry': None, 'analysis_error': error, 'job_id': job['job_id'], 'status_url': f"/jobs/{job['job_id']}"}
+
+    @staticmethod
+    def _error(line, message, email=None):
+        result = {'line': line, 'status': 'error', 'error': message}
+        if email is not None:
+            result['email'] = email
+        return result
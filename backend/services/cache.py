@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from bson import json_util
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Distinguishes "not cached" from a cached None
+_MISS = object()
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache with per-entry expiry.
+
+    Entries expire ttl seconds after they are stored (or after the ttl
+    passed to set for that entry), and the least recently used entry is evicted
+    once max_size is reached. Hit, miss and eviction counters are kept for
+    monitoring.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+class SqliteCache:
+    """
+    Cache tier shared by every worker on a host, stored in a local SQLite file.
+
+    Values are stored as MongoDB extended JSON (bson.json_util), so dicts,
+    lists, datetimes and ObjectIds round-trip and reading an entry never runs
+    code. Values of other types are not cached, and entries that do not
+    decode read as misses. The directory is created private to the current
+    user. Connections are opened per thread and per process.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)'
+        )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key, default=None):
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        if row is None:
+            return default
+        try:
+            return json_util.loads(row[0])
+        except (ValueError, TypeError):
+            # e.g. an entry written by an older release in another format
+            return default
+
+    def set(self, key, value, ttl=None):
+        try:
+            encoded = json_util.dumps(value)
+        except TypeError as e:
+            logger.warning(f"Not caching {key} in the shared cache: {str(e)}")
+            return
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, encoded, expires_at)
+        )
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def purge_expired(self):
+        self._connection().execute('DELETE FROM cache WHERE expires_at <= ?', (time.time(),))
+
+class TieredCache:
+    """
+    An in-process TTLCache in front of an optional shared tier (SqliteCache).
+
+    Reads fall through to the shared tier and refill the local one; writes
+    and deletes go to both. Another worker's local copy can stay stale for up
+    to the local ttl after a delete, so keep that ttl short. Errors in the
+    shared tier are logged and treated as misses.
+    """
+
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key, default=None):
+        value = self.local.get(key, _MISS)
+        if value is not _MISS:
+            return value
+        if self.shared is None:
+            return default
+        try:
+            value = self.shared.get(key, _MISS)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache read failed: {str(e)}")
+            return default
+        if value is _MISS:
+            return default
+        self.local.set(key, value)
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.local.set(key, value, ttl if ttl is None else min(ttl, self.local.ttl))
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, ttl)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared cache write failed: {str(e)}")
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared cache delete failed: {str(e)}")
+
+    def stats(self):
+        return dict(self.local.stats(), shared=self.shared is not None)
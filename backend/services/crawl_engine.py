@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import logging
+from backend.config import Config
+from backend.concurrency import cooperative, run_coroutine
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class CrawlEngine:
+    """
+    Asyncio based HTTP fetcher shared by every request in a worker.
+
+    The engine owns a private event loop running in a daemon thread so that
+    synchronous Flask handlers can submit fetches without creating a new loop
+    (and a new connection pool) per call. All fetches go through a single
+    aiohttp session whose connector enforces the global and per-host
+    connection limits. Under eventlet workers the coroutines run on the hub's
+    asyncio loop instead, so a waiting request yields to the others.
+    """
+
+    def __init__(self, max_connections=None, per_host_limit=None,
+                 connect_timeout=None, read_timeout=None, total_timeout=None):
+        self.max_connections = max_connections or Config.CRAWL_MAX_CONNECTIONS
+        self.per_host_limit = per_host_limit or Config.CRAWL_PER_HOST_LIMIT
+        self.connect_timeout = connect_timeout or Config.CRAWL_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or Config.CRAWL_READ_TIMEOUT
+        self.total_timeout = total_timeout or Config.CRAWL_TOTAL_TIMEOUT
+
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        """Start the event loop thread on first use (after any fork)"""
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                ready.set()
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name='crawl-engine', daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            return loop
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            # Imported on first fetch so worker boot doesn't pay for aiohttp
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.per_host_limit,
+                ttl_dns_cache=300
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=self.total_timeout,
+                sock_connect=self.connect_timeout,
+                sock_read=self.read_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                headers={'User-Agent': Config.CRAWL_USER_AGENT}
+            )
+        return self._session
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the engine loop and block until it completes"""
+        if cooperative():
+            return run_coroutine(coro, timeout)
+        loop = self._start()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        return future.result(timeout)
+
+    async def fetch(self, url, headers=None, max_bytes=None):
+        """
+        Fetch a single URL, reading the body in chunks.
+        Returns a dict with the final url, status, response headers, charset
+        and the list of body chunks. At most max_bytes of body are read;
+        'truncated' tells whether the body was cut short.
+        """
+        max_bytes = max_bytes or Config.SCRAPE_MAX_BYTES
+        session = await self._get_session()
+        async with session.get(url, headers=headers, allow_redirects=True) as response:
+            chunks = []
+            size = 0
+            truncated = False
+            async for chunk in response.content.iter_chunked(Config.CRAWL_CHUNK_SIZE):
+                if size + len(chunk) > max_bytes:
+                    chunks.append(chunk[:max_bytes - size])
+                    truncated = True
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+
+            return {
+                'url': str(response.url),
+                'status': response.status,
+                'headers': dict(response.headers),
+                'encoding': response.charset or 'utf-8',
+                'chunks': chunks,
+                'truncated': truncated
+            }
+
+    @staticmethod
+    def page_text(page):
+        """Decode a fetched page's body chunks into a string"""
+        body = b''.join(page['chunks'])
+        try:
+            return body.decode(page['encoding'], errors='replace')
+        except LookupError:
+            return body.decode('utf-8', errors='replace')
+
+    async def fetch_many(self, urls, headers=None):
+        """
+        Fetch many URLs concurrently.
+        Failed fetches are returned as the raised exception in the same position.
+        """
+        return await asyncio.gather(
+            *(self.fetch(url, headers=headers) for url in urls),
+            return_exceptions=True
+        )
+
+    async def _close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def close(self):
+        """Close the connection pool and stop the event loop"""
+        with self._lock:
+            loop = self._loop
+            if loop is None:
+                if cooperative() and self._session is not None:
+                    run_coroutine(self._close())
+                return
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join()
+            loop.close()
+            self._loop = None
+            self._thread = None
@@ -0,0 +1,88 @@
+import heapq
+import posixpath
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that never change page content
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def normalize_url(url):
+    """
+    Normalize a URL so equivalent spellings map to the same key.
+    Returns None for URLs that are not http(s).
+    """
+    try:
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS or not parts.hostname:
+            return None
+        port = parts.port
+    except ValueError:
+        return None
+
+    host = parts.hostname.lower()
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+
+    # Resolve dot segments and drop trailing slashes (except the root)
+    path = posixpath.normpath(parts.path) if parts.path else '/'
+    if path.startswith('//'):
+        path = '/' + path.lstrip('/')
+
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ))
+
+    return urlunsplit((scheme, host, path, query, ''))
+
+def site_key(url):
+    """Host used for same-site checks, ignoring a leading www."""
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+class CrawlFrontier:
+    """
+    Bounded priority frontier for a single-site crawl.
+
+    URLs are normalized before they are queued and every normalized URL is
+    only ever queued once. Shallower pages and shorter paths are crawled first
+    so a small page budget is spent on the most representative pages.
+    """
+
+    def __init__(self, root_url, max_depth, max_size=None):
+        self.site = site_key(root_url)
+        self.max_depth = max_depth
+        self.max_size = max_size
+        self.seen = set()
+        self._heap = []
+        self._counter = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _priority(self, url, depth):
+        path = urlsplit(url).path
+        return (depth, path.count('/'), len(url))
+
+    def push(self, url, depth):
+        """Queue a URL if it is new, on the same site and within the depth limit"""
+        if depth > self.max_depth:
+            return False
+        if self.max_size is not None and len(self._heap) >= self.max_size:
+            return False
+
+        url = normalize_url(url)
+        if url is None or url in self.seen or site_key(url) != self.site:
+            return False
+
+        self.seen.add(url)
+        self._counter += 1
+        heapq.heappush(self._heap, (self._priority(url, depth), self._counter, url, depth))
+        return True
+
+    def pop(self):
+        """Return the next (url, depth) pair to crawl"""
+        _, _, url, depth = heapq.heappop(self._heap)
+        return url, depth
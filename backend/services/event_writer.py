@@ -0,0 +1,273 @@
+import atexit
+import glob
+import os
+import queue
+import threading
+import time
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError, PyMongoError
+from backend.config import Config
+from backend.database import get_collection
+from backend.metrics import span
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+class BufferedEventWriter:
+    """
+    Write-behind buffer for high volume event documents.
+
+    write() only enqueues; a background thread flushes batches with
+    insert_many(ordered=False) when batch_size events are waiting or
+    flush_interval seconds have passed. The queue is bounded: when it is full
+    write() waits briefly and then spills the event to a local NDJSON file
+    rather than blocking the request. Batches that cannot reach MongoDB are
+    spilled the same way and replayed after the next successful flush. Each
+    worker's spill file is capped at spill_max_bytes; events beyond it are
+    dropped and counted in dropped. Spilled lines that no longer decode are
+    moved aside to a .corrupt file instead of being replayed.
+
+    Every event gets an _id before it is queued, so a replayed batch that was
+    partly written already only inserts the missing events. after_insert, if
+    given, is called with the events that were actually inserted.
+
+    Events go to the collection called name in the current worker's database
+    unless a collection object is passed in.
+    """
+
+    def __init__(self, name, collection=None, after_insert=None, batch_size=None,
+                 flush_interval=None, max_queue=None, spill_dir=None, spill_max_bytes=None):
+        self.name = name
+        self.collection = collection
+        self.after_insert = after_insert
+        self.batch_size = batch_size or Config.EVENT_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.EVENT_FLUSH_INTERVAL
+        self.spill_dir = spill_dir or Config.EVENT_SPILL_DIR
+        self.spill_max_bytes = spill_max_bytes or Config.EVENT_SPILL_MAX_BYTES
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=max_queue or Config.EVENT_QUEUE_SIZE)
+        self._pending = 0  # queued or being written
+        self._idle = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._flushing = threading.Event()
+        self._write_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    def write(self, event):
+        """Queue an event for writing; never blocks longer than EVENT_PUT_TIMEOUT"""
+        self._ensure_started()
+        event.setdefault('_id', ObjectId())
+        with self._idle:
+            self._pending += 1
+        try:
+            self._queue.put(event, timeout=Config.EVENT_PUT_TIMEOUT)
+        except queue.Full:
+            self._done(1)
+            logger.warning(f"{self.name} event buffer full, spilling event to disk")
+            self._spill([event])
+
+    def flush(self, timeout=30):
+        """Write everything currently queued and wait for batches already being written"""
+        self._flushing.set()
+        try:
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch:
+                    break
+                self._write_batch(batch)
+            with self._idle:
+                self._idle.wait_for(lambda: self._pending <= 0, timeout)
+        finally:
+            self._flushing.clear()
+
+    def close(self):
+        """Stop the flush thread and write whatever is still buffered"""
+        self._stopping.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _ensure_started(self):
+        """Start the flush thread once per process (safe across gunicorn forks)"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            # The thread is only started once per process, so it must outlive any one bad batch
+            try:
+                self._collect_and_write()
+            except Exception:
+                logger.exception(f"Error in {self.name} writer thread")
+
+    def _collect_and_write(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set() or self._flushing.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, 0.05)))
+            except queue.Empty:
+                continue
+        if batch:
+            self._write_batch(batch)
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch):
+        try:
+            with self._write_lock:
+                inserted = self._insert(batch)
+                if inserted is None:
+                    self._spill(batch)
+                    return
+                self._after_insert(inserted)
+                self._replay_spills()
+        finally:
+            self._done(len(batch))
+
+    def _done(self, count):
+        with self._idle:
+            self._pending -= count
+            if self._pending <= 0:
+                self._idle.notify_all()
+
+    def _insert(self, events):
+        """Insert events; returns those actually inserted, or None if MongoDB is unreachable"""
+        collection = self.collection if self.collection is not None else get_collection(self.name)
+        if collection is None:
+            logger.warning(f"MongoDB not available, spilling {len(events)} {self.name} events to disk")
+            return None
+        try:
+            with span(f'{self.name}.insert'):
+                collection.insert_many(events, ordered=False)
+            return events
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != DUPLICATE_KEY for error in errors):
+                logger.error(f"Error writing {self.name} events: {errors[:3]}")
+            failed = {error['index'] for error in errors}
+            return [event for index, event in enumerate(events) if index not in failed]
+        except PyMongoError as e:
+            logger.error(f"Error writing {self.name} events, spilling {len(events)} to disk: {str(e)}")
+            return None
+
+    def _after_insert(self, events):
+        if self.after_insert is None or not events:
+            return
+        try:
+            self.after_insert(events)
+        except Exception as e:
+            logger.error(f"Error in {self.name} post-insert hook: {str(e)}")
+
+    def _spill_path(self):
+        return os.path.join(self.spill_dir, f'{self.name}-{os.getpid()}.ndjson')
+
+    def _spill(self, events):
+        written = 0
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with self._spill_lock, open(self._spill_path(), 'a', encoding='utf-8') as spill:
+                size = spill.tell()
+                for event in events:
+                    line = json_util.dumps(event) + '\n'
+                    size += len(line.encode('utf-8'))
+                    if size > self.spill_max_bytes:
+                        break
+                    spill.write(line)
+                    written += 1
+        except OSError as e:
+            logger.error(f"Could not spill {len(events) - written} {self.name} events: {str(e)}")
+            self.dropped += len(events) - written
+            return
+        if written < len(events):
+            self.dropped += len(events) - written
+            logger.error(f"{self.name} spill file is full ({self.spill_max_bytes} bytes), "
+                         f"dropped {len(events) - written} events")
+
+    def _replay_spills(self):
+        """Write back events spilled by any worker; each file is claimed by renaming it"""
+        for path in glob.glob(os.path.join(self.spill_dir, f'{self.name}-*.ndjson')):
+            claimed = f'{path}.replaying-{os.getpid()}'
+            try:
+                with self._spill_lock:
+                    os.rename(path, claimed)
+            except OSError:
+                continue
+
+            try:
+                events = self._read_spill(claimed)
+                for offset in range(0, len(events), self.batch_size):
+                    batch = events[offset:offset + self.batch_size]
+                    inserted = self._insert(batch)
+                    if inserted is None:
+                        # Still unreachable: put the rest back and stop replaying
+                        self._spill(events[offset:])
+                        os.remove(claimed)
+                        return
+                    self._after_insert(inserted)
+                os.remove(claimed)
+            except Exception as e:
+                # Events already inserted are skipped by _id when the file is replayed again
+                logger.error(f"Error replaying {self.name} spill file {path}: {str(e)}")
+                self._release(claimed, path)
+                return
+            logger.info(f"Replayed {len(events)} spilled {self.name} events")
+
+    def _read_spill(self, path):
+        """Decode a spill file; lines that do not decode are moved to a .corrupt file next to it"""
+        events, corrupt = [], []
+        with open(path, encoding='utf-8', errors='replace') as spill:
+            for line in spill:
+                if not line.strip():
+                    continue
+                try:
+                    events.append(json_util.loads(line))
+                except ValueError:
+                    corrupt.append(line if line.endswith('\n') else line + '\n')
+        if corrupt:
+            quarantine = os.path.join(self.spill_dir, f'{self.name}-{os.getpid()}.corrupt')
+            logger.error(f"Skipping {len(corrupt)} undecodable lines in {self.name} spill file, "
+                         f"moved to {quarantine}")
+            try:
+                with open(quarantine, 'a', encoding='utf-8') as out:
+                    out.writelines(corrupt)
+            except OSError as e:
+                logger.error(f"Could not quarantine {len(corrupt)} {self.name} spill lines: {str(e)}")
+        return events
+
+    def _release(self, claimed, path):
+        """Give back a claimed spill file so a later flush replays it"""
+        if os.path.exists(path):
+            # Its worker has spilled again since; keep both under the replayed name pattern
+            root, ext = os.path.splitext(path)
+            path = f'{root}-{ObjectId()}{ext}'
+        try:
+            os.rename(claimed, path)
+        except OSError as e:
+            logger.error(f"Could not release {self.name} spill file {claimed}: {str(e)}")
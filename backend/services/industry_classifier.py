@@ -0,0 +1,81 @@
+import re
+import numpy as np
+
+WORD = re.compile(r'[a-z0-9]+')
+
+def tokenize(content):
+    """
+    Lowercased word tokens of a document given either as text or as the
+    (word, count) list returned by ScraperService.
+    """
+    if isinstance(content, str):
+        return WORD.findall(content.lower())
+    return [token for word, count in content for token in WORD.findall(str(word).lower())]
+
+class KeywordClassifier:
+    """
+    Keyword based industry classifier compiled once into a token index.
+
+    Every keyword (single words and multi-word phrases) is indexed by its
+    first token, so a document is scored for all industries in one pass over
+    its tokens and keywords only match whole words ("app" does not match
+    "happy"). Each keyword counts once per document, and the industry scores
+    are the product of the keyword hit vector with a keyword x industry
+    membership matrix, which also makes batch scoring a single matrix product.
+    """
+
+    def __init__(self, industry_keywords, default):
+        self.industries = list(industry_keywords)
+        self.default = default
+
+        self._index = {}
+        keyword_industries = []
+        for industry_index, keywords in enumerate(industry_keywords.values()):
+            for keyword in keywords:
+                tokens = tuple(WORD.findall(keyword.lower()))
+                if not tokens:
+                    continue
+                self._index.setdefault(tokens[0], []).append((tokens, len(keyword_industries)))
+                keyword_industries.append(industry_index)
+
+        self.membership = np.zeros((len(keyword_industries), len(self.industries)), dtype=np.int32)
+        self.membership[np.arange(len(keyword_industries)), keyword_industries] = 1
+
+    def keyword_hits(self, content, out=None):
+        """Mark which keywords occur in a document; returns a 0/1 vector over keywords"""
+        hits = out if out is not None else np.zeros(len(self.membership), dtype=np.int32)
+        tokens = tokenize(content)
+        index = self._index
+
+        for position, token in enumerate(tokens):
+            candidates = index.get(token)
+            if candidates is None:
+                continue
+            for phrase, keyword in candidates:
+                if len(phrase) == 1 or tuple(tokens[position:position + len(phrase)]) == phrase:
+                    hits[keyword] = 1
+        return hits
+
+    def scores(self, content):
+        """Score a document for every industry"""
+        return self.keyword_hits(content) @ self.membership
+
+    def score_matrix(self, documents):
+        """Score many documents at once; returns a (documents x industries) matrix"""
+        hits = np.zeros((len(documents), len(self.membership)), dtype=np.int32)
+        for row, content in enumerate(documents):
+            self.keyword_hits(content, out=hits[row])
+        return hits @ self.membership
+
+    def classify(self, content):
+        """Return the best scoring industry, or the default when nothing matches"""
+        return self._label(self.scores(content))
+
+    def classify_many(self, documents):
+        """Classify many documents; returns a list of industries in input order"""
+        return [self._label(row) for row in self.score_matrix(documents)]
+
+    def _label(self, scores):
+        if not scores.any():
+            return self.default
+        return self.industries[int(np.argmax(scores))]
@@ -0,0 +1,306 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from collections import Counter
+from pathlib import Path
+import numpy as np
+from backend.config import Config
+from backend.services.industry_classifier import tokenize
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Predefined industry categories
+INDUSTRY_CATEGORIES = [
+    "Technology", "E-commerce", "Finance", "Healthcare", "Education",
+    "Entertainment", "Real Estate", "Automotive", "Travel", "Food"
+]
+
+# Returned when no category scores above INDUSTRY_MIN_SCORE
+DEFAULT_INDUSTRY = 'General'
+
+# Seed vocabulary per category, used as the built-in training corpus
+INDUSTRY_KEYWORDS = {
+    'Technology': [
+        'software', 'tech', 'technology', 'digital', 'app', 'platform', 'cloud', 'saas', 'api',
+        'developer', 'data', 'ai', 'security', 'devops', 'integration', 'automation', 'startup'
+    ],
+    'E-commerce': [
+        'shop', 'store', 'product', 'products', 'cart', 'buy', 'price', 'checkout', 'shipping',
+        'sale', 'discount', 'order', 'returns', 'collection', 'brand', 'wishlist', 'deals'
+    ],
+    'Finance': [
+        'bank', 'banking', 'finance', 'financial', 'loan', 'loans', 'credit', 'invest', 'investment',
+        'insurance', 'mortgage', 'savings', 'payment', 'payments', 'trading', 'wealth', 'tax'
+    ],
+    'Healthcare': [
+        'health', 'healthcare', 'medical', 'patient', 'patients', 'clinic', 'doctor', 'doctors',
+        'hospital', 'care', 'treatment', 'therapy', 'wellness', 'pharmacy', 'dental', 'nurse'
+    ],
+    'Education': [
+        'education', 'course', 'courses', 'student', 'students', 'learning', 'learn', 'school',
+        'university', 'college', 'teacher', 'training', 'curriculum', 'degree', 'tutoring', 'classes'
+    ],
+    'Entertainment': [
+        'entertainment', 'movie', 'movies', 'music', 'stream', 'streaming', 'game', 'games', 'gaming',
+        'video', 'show', 'shows', 'podcast', 'concert', 'tickets', 'artist', 'film', 'media'
+    ],
+    'Real Estate': [
+        'property', 'properties', 'estate', 'realtor', 'home', 'homes', 'house', 'rent', 'rental',
+        'apartment', 'listing', 'listings', 'mortgage', 'agent', 'buyers', 'sellers', 'bedroom'
+    ],
+    'Automotive': [
+        'car', 'cars', 'vehicle', 'vehicles', 'auto', 'automotive', 'dealer', 'dealership', 'truck',
+        'suv', 'engine', 'parts', 'repair', 'lease', 'tires', 'service', 'electric'
+    ],
+    'Travel': [
+        'travel', 'trip', 'trips', 'hotel', 'hotels', 'flight', 'flights', 'booking', 'vacation',
+        'tour', 'tours', 'destination', 'destinations', 'resort', 'cruise', 'airline', 'adventure'
+    ],
+    'Food': [
+        'food', 'restaurant', 'restaurants', 'menu', 'recipe', 'recipes', 'delivery', 'dining',
+        'kitchen', 'chef', 'cafe', 'coffee', 'organic', 'meal', 'meals', 'catering', 'bakery'
+    ]
+}
+
+def feature_index(token, n_features):
+    """Stable hash of a token into the feature space (Python's hash() is salted per process)"""
+    return zlib.crc32(token.encode('utf-8')) % n_features
+
+def seed_fingerprint(n_features=None):
+    """Hash of the seed vocabulary and feature space the default model is trained from"""
+    seed = {'keywords': INDUSTRY_KEYWORDS, 'n_features': n_features or Config.INDUSTRY_MODEL_FEATURES}
+    return hashlib.sha256(json.dumps(seed, sort_keys=True).encode('utf-8')).hexdigest()
+
+def sublinear_tf(counts):
+    """1 + log(count) per term; terms with a count of zero or less (e.g. from a (word, 0) list) weigh nothing"""
+    counts = np.asarray(counts, dtype=np.float32)
+    tf = np.zeros_like(counts)
+    positive = counts > 0
+    tf[positive] = 1 + np.log(counts[positive])
+    return tf
+
+def term_counts(content):
+    """Term frequencies from text or a (word, count) list"""
+    if isinstance(content, str):
+        return Counter(tokenize(content))
+    counts = Counter()
+    for word, count in content:
+        for token in tokenize([(word, count)]):
+            counts[token] += count
+    return counts
+
+class IndustryModel:
+    """
+    Hashed TF-IDF nearest-centroid classifier over INDUSTRY_CATEGORIES.
+
+    Documents are hashed into a fixed feature space (no vocabulary to store),
+    weighted with sublinear TF and IDF, L2 normalized and scored against one
+    normalized centroid per category. The artifact is a directory of .npy
+    files that is memory-mapped on load, so every worker shares the same
+    pages instead of holding its own copy. The default model records the
+    seed_fingerprint it was trained from and is retrained when that changes.
+    """
+
+    def __init__(self, labels, idf, centroids, fingerprint=None):
+        self.labels = list(labels)
+        self.fingerprint = fingerprint
+        self.idf = idf
+        self.centroids = centroids  # n_features x n_labels
+        self.n_features = len(idf)
+        self._feature_cache = {}
+
+    @classmethod
+    def train(cls, documents, labels, n_features=None):
+        """Fit the model on documents (text or (word, count) lists) and their labels"""
+        n_features = n_features or Config.INDUSTRY_MODEL_FEATURES
+        classes = sorted(set(labels), key=lambda label: (
+            INDUSTRY_CATEGORIES.index(label) if label in INDUSTRY_CATEGORIES else len(INDUSTRY_CATEGORIES), label
+        ))
+
+        rows = [cls._hashed_tf(term_counts(document), n_features) for document in documents]
+
+        document_frequency = np.zeros(n_features, dtype=np.float32)
+        for indices, _ in rows:
+            document_frequency[indices] += 1
+        idf = (np.log((1 + len(rows)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        centroids = np.zeros((n_features, len(classes)), dtype=np.float32)
+        for (indices, values), label in zip(rows, labels):
+            weights = values * idf[indices]
+            norm = np.linalg.norm(weights)
+            if norm:
+                centroids[indices, classes.index(label)] += weights / norm
+
+        norms = np.linalg.norm(centroids, axis=0)
+        norms[norms == 0] = 1
+        return cls(classes, idf, centroids / norms)
+
+    @classmethod
+    def train_default(cls):
+        """Fit the model on the built-in seed vocabulary"""
+        documents = [' '.join(keywords) for keywords in INDUSTRY_KEYWORDS.values()]
+        model = cls.train(documents, list(INDUSTRY_KEYWORDS))
+        model.fingerprint = seed_fingerprint(model.n_features)
+        return model
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved model, memory-mapping the weight arrays"""
+        # Read every file from the same version even if save() swaps it meanwhile
+        path = Path(os.path.realpath(path))
+        labels = json.loads((path / 'labels.json').read_text())
+        idf = np.load(path / 'idf.npy', mmap_mode='r')
+        centroids = np.load(path / 'centroids.npy', mmap_mode='r')
+        try:
+            fingerprint = json.loads((path / 'meta.json').read_text()).get('fingerprint')
+        except (OSError, ValueError):
+            fingerprint = None
+        return cls(labels, idf, centroids, fingerprint)
+
+    @classmethod
+    def load_or_train(cls, path=None):
+        """
+        Load the model artifact, training and saving the default model if it
+        is missing or was trained from a different seed vocabulary
+        """
+        path = Path(path or Path(Config.MODEL_PATH) / 'industry_tfidf')
+        try:
+            model = cls.load(path)
+            if model.fingerprint == seed_fingerprint(model.n_features):
+                return model
+            logger.info(f"Industry model at {path} was trained from other keywords; retraining")
+        except (OSError, ValueError):
+            pass
+
+        model = cls.train_default()
+        try:
+            model.save(path)
+            return cls.load(path)
+        except OSError as e:
+            logger.warning(f"Could not save industry model to {path}: {str(e)}")
+            return model
+
+    def save(self, path):
+        """
+        Write the artifact atomically so concurrently booting workers never see
+        a partial or missing model: path is a symlink to a versioned directory,
+        swapped to the fully written new version with a single rename
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        version = Path(tempfile.mkdtemp(prefix=f'.{path.name}-', dir=path.parent))
+        link = path.parent / f'{version.name}.link'
+        try:
+            np.save(version / 'idf.npy', np.asarray(self.idf, dtype=np.float32))
+            np.save(version / 'centroids.npy', np.ascontiguousarray(self.centroids, dtype=np.float32))
+            (version / 'labels.json').write_text(json.dumps(self.labels))
+            (version / 'meta.json').write_text(json.dumps({'fingerprint': self.fingerprint}))
+            os.symlink(version.name, link)
+
+            if path.is_symlink():
+                previous = Path(os.path.realpath(path))
+                os.replace(link, path)
+            elif path.exists():
+                # A plain directory from an older release; a symlink cannot replace it in one rename
+                previous = path.parent / f'{version.name}.old'
+                os.rename(path, previous)
+                try:
+                    os.replace(link, path)
+                except OSError:
+                    os.rename(previous, path)
+                    raise
+            else:
+                previous = None
+                os.replace(link, path)
+        except BaseException:
+            shutil.rmtree(version, ignore_errors=True)
+            raise
+        finally:
+            if link.is_symlink():
+                link.unlink()
+
+        # Workers that loaded the old version keep their memory-mapped files open
+        if previous is not None and previous.parent == path.parent:
+            shutil.rmtree(previous, ignore_errors=True)
+
+    @staticmethod
+    def _hashed_tf(counts, n_features):
+        """Sparse sublinear TF vector as (indices, values)"""
+        hashed = {}
+        for token, count in counts.items():
+            index = feature_index(token, n_features)
+            hashed[index] = hashed.get(index, 0) + count
+        indices = np.fromiter(hashed.keys(), dtype=np.int64, count=len(hashed))
+        values = sublinear_tf(np.fromiter(hashed.values(), dtype=np.float32, count=len(hashed)))
+        return indices, values
+
+    def _features(self, content):
+        """
+        Hashed sparse term counts of a document as {feature index: count}.
+        The feature indices of every word seen are cached, so the common
+        (word, count) input skips tokenizing and hashing after warm-up.
+        """
+        if isinstance(content, str):
+            content = Counter(tokenize(content)).items()
+
+        cache = self._feature_cache
+        hashed = {}
+        for word, count in content:
+            indices = cache.get(word)
+            if indices is None:
+                indices = tuple(feature_index(token, self.n_features) for token in tokenize([(word, count)]))
+                if len(cache) < 100000:
+                    cache[word] = indices
+            for index in indices:
+                hashed[index] = hashed.get(index, 0) + count
+        return hashed
+
+    def scores(self, content):
+        """Cosine similarity of a document to every category centroid"""
+        return self.score_matrix([content])[0]
+
+    def score_matrix(self, documents):
+        """
+        Score many documents at once; returns a (documents x categories) matrix.
+        All documents are concatenated into one sparse batch so weighting,
+        normalization and the centroid product are single NumPy operations.
+        """
+        hashed = [self._features(document) for document in documents]
+        lengths = np.fromiter((len(features) for features in hashed), dtype=np.int64, count=len(hashed))
+        scores = np.zeros((len(hashed), len(self.labels)), dtype=np.float32)
+        if not lengths.sum():
+            return scores
+
+        indices = np.fromiter((index for features in hashed for index in features), dtype=np.int64, count=lengths.sum())
+        counts = np.fromiter((count for features in hashed for count in features.values()), dtype=np.float32, count=lengths.sum())
+        weights = sublinear_tf(counts) * self.idf[indices]
+
+        # Per-document segments of the concatenated batch (empty documents are skipped)
+        present = lengths > 0
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[present]
+        norms = np.sqrt(np.add.reduceat(weights * weights, starts))
+        norms[norms == 0] = 1
+        weights /= np.repeat(norms, lengths[present])
+
+        scores[present] = np.add.reduceat(weights[:, None] * self.centroids[indices], starts, axis=0)
+        return scores
+
+    def classify(self, content):
+        """Return the best matching category, or DEFAULT_INDUSTRY when nothing matches well"""
+        return self.classify_many([content])[0]
+
+    def classify_many(self, documents):
+        """Classify many documents; returns a list of categories in input order"""
+        return [self._label(row) for row in self.score_matrix(documents)]
+
+    def _label(self, scores):
+        best = int(np.argmax(scores))
+        if scores[best] < Config.INDUSTRY_MIN_SCORE:
+            return DEFAULT_INDUSTRY
+        return self.labels[best]
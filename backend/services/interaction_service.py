@@ -0,0 +1,184 @@
+import json
+from datetime import datetime, timedelta
+from backend.config import Config
+from backend.services.event_writer import BufferedEventWriter
+from backend.services.rate_limiter import TokenBucketLimiter
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Optional string fields of a visitor event and their maximum lengths
+STRING_FIELDS = {
+    'session_id': 128,
+    'visitor_id': 128,
+    'url': 2048,
+    'referrer': 2048,
+    'element': 256
+}
+
+MAX_ERRORS_REPORTED = 20
+
+# Epoch milliseconds accepted as event timestamps (1970 up to datetime's year 9999)
+MAX_TIMESTAMP_MS = (datetime.max - datetime(1970, 1, 1)).total_seconds() * 1000
+
+class InteractionError(Exception):
+    """A batch rejected as a whole; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+def parse_timestamp(value, received_at):
+    """Event time from epoch milliseconds or an ISO 8601 string, defaulting to received_at"""
+    if value is None:
+        return received_at
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Also rejects NaN and Infinity
+            if not 0 <= value < MAX_TIMESTAMP_MS:
+                raise ValueError('timestamp is out of range')
+            timestamp = datetime(1970, 1, 1) + timedelta(milliseconds=value)
+        elif isinstance(value, str):
+            timestamp = datetime.fromisoformat(value)
+            if timestamp.tzinfo is not None:
+                timestamp = (timestamp - timestamp.utcoffset()).replace(tzinfo=None)
+        else:
+            raise ValueError('timestamp must be epoch milliseconds or an ISO 8601 string')
+    except (OverflowError, OSError):
+        raise ValueError('timestamp is out of range')
+    if timestamp > received_at + timedelta(minutes=5):
+        raise ValueError('timestamp is in the future')
+    return timestamp
+
+def check_keys(value):
+    """Reject object keys MongoDB would read as operators or paths, at any depth"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key.startswith('$') or '.' in key:
+                raise ValueError(f"property names may not start with '$' or contain '.': {key[:64]!r}")
+            check_keys(item)
+    elif isinstance(value, list):
+        for item in value:
+            check_keys(item)
+
+def validate_event(raw, user_id, received_at):
+    """
+    Check one decoded event and return the document to store.
+    Only known fields are kept, so visitors cannot write arbitrary keys.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError('event must be a JSON object')
+
+    event_type = raw.get('type')
+    if not isinstance(event_type, str) or not 0 < len(event_type) <= 64:
+        raise ValueError('type must be a non-empty string of at most 64 characters')
+
+    event = {
+        'user_id': user_id,
+        'type': event_type,
+        'timestamp': parse_timestamp(raw.get('timestamp'), received_at),
+        'received_at': received_at
+    }
+    for field, max_length in STRING_FIELDS.items():
+        value = raw.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, str) or len(value) > max_length:
+            raise ValueError(f'{field} must be a string of at most {max_length} characters')
+        event[field] = value
+
+    properties = raw.get('properties')
+    if properties is not None:
+        if not isinstance(properties, dict) or len(properties) > Config.INTERACTION_MAX_PROPERTIES:
+            raise ValueError(f'properties must be an object with at most {Config.INTERACTION_MAX_PROPERTIES} keys')
+        check_keys(properties)
+        event['properties'] = properties
+    return event
+
+class InteractionService:
+    """
+    Ingests batches of visitor interaction events.
+
+    A batch is NDJSON (one event per line); a JSON array is also accepted.
+    Events belong to a tenant (the site owner's user_id), which must exist in
+    the user repository. Every line is validated first; the tenant's rate
+    limit is then charged per valid event, valid events are handed to a
+    buffered writer that inserts them into the interactions collection in
+    bulk, and invalid lines are reported back without failing the rest of the
+    batch.
+    """
+
+    def __init__(self, users, collection=None, limiter=None):
+        self.users = users
+        self.writer = BufferedEventWriter('interactions', collection=collection)
+        self.limiter = limiter or TokenBucketLimiter(Config.INTERACTION_RATE_LIMIT, Config.INTERACTION_BURST)
+
+    def ingest(self, user_id, body):
+        """Validate and queue a batch; returns counts of accepted and rejected events"""
+        if len(body) > Config.INTERACTION_MAX_BYTES:
+            raise InteractionError('Batch is too large', status=413)
+        if not self._is_tenant(user_id):
+            raise InteractionError('A valid user_id is required')
+
+        lines = self._split(body)
+        if len(lines) > Config.INTERACTION_MAX_BATCH:
+            raise InteractionError(f'At most {Config.INTERACTION_MAX_BATCH} events per batch', status=413)
+
+        received_at = datetime.utcnow()
+        events = []
+        errors = []
+        for line_number, raw in lines:
+            try:
+                # NDJSON lines are bytes; elements of a JSON array are already decoded
+                events.append(validate_event(json.loads(raw) if isinstance(raw, bytes) else raw,
+                                             user_id, received_at))
+                continue
+            except ValueError as e:  # json.JSONDecodeError is a ValueError too
+                error = str(e)
+            except RecursionError:
+                error = 'event is nested too deeply'
+            if len(errors) < MAX_ERRORS_REPORTED:
+                errors.append({'line': line_number, 'error': error})
+
+        # Only events that would be stored count against the limit
+        if events:
+            allowed, retry_after = self.limiter.consume(user_id, len(events))
+            if not allowed:
+                raise InteractionError('Rate limit exceeded', status=429, retry_after=retry_after)
+        for event in events:
+            self.writer.write(event)
+
+        return {
+            'accepted': len(events),
+            'rejected': len(lines) - len(events),
+            'errors': errors
+        }
+
+    def _is_tenant(self, user_id):
+        """Whether user_id is an account of the configured user store (cached by the repository)"""
+        if not isinstance(user_id, str) or not 0 < len(user_id) <= 128:
+            return False
+        try:
+            return self.users.get(user_id, fields=['id']) is not None
+        except ValueError:
+            # Not a valid key for the store, e.g. a Firestore id containing '/'
+            return False
+
+    @staticmethod
+    def _split(body):
+        """Return [(line number, raw event)] without decoding NDJSON lines yet"""
+        stripped = body.lstrip()
+        if stripped[:1] == b'[':
+            try:
+                events = json.loads(stripped)
+            except (ValueError, RecursionError):
+                raise InteractionError('Malformed JSON array')
+            return list(enumerate(events, start=1))
+        return [(number, line) for number, line in enumerate(body.split(b'\n'), start=1) if line.strip()]
+
+    def flush(self):
+        """Write any buffered events now"""
+        self.writer.flush()
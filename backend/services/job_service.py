@@ -0,0 +1,392 @@
+import heapq
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from backend.config import Config
+from backend.database import get_collection
+from backend.metrics import span
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job states; queued and running jobs are "active" and block duplicates
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+class LocalBroker:
+    """
+    In-process broker holding job ids until they are due.
+
+    Any object with the same publish/consume interface (e.g. a Redis or SQS
+    backed broker) can be passed to JobService instead.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._condition = threading.Condition()
+
+    def publish(self, job_id, delay=0):
+        with self._condition:
+            heapq.heappush(self._heap, (time.monotonic() + delay, job_id))
+            self._condition.notify()
+
+    def consume(self, timeout=1.0):
+        """Return the next due job id, or None if none became due within timeout"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._heap and self._heap[0][0] <= now:
+                    return heapq.heappop(self._heap)[1]
+                if now >= deadline:
+                    return None
+                wait = deadline - now
+                if self._heap:
+                    wait = min(wait, self._heap[0][0] - now)
+                self._condition.wait(wait)
+
+class JobStore:
+    """Persistent job table (MongoDB jobs collection, in memory while MongoDB is unavailable)"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        return get_collection('jobs')
+
+    def insert(self, job):
+        """Insert a job; returns the already active job with the same dedup key instead, if any"""
+        if self.collection is None:
+            with self._lock:
+                if job.get('dedup_key'):
+                    for existing in self._jobs.values():
+                        if existing.get('dedup_key') == job['dedup_key'] and existing.get('active'):
+                            return dict(existing)
+                self._jobs[job['_id']] = dict(job)
+                return None
+        while True:
+            try:
+                self.collection.insert_one(job)
+                return None
+            except DuplicateKeyError:
+                existing = self.collection.find_one({'dedup_key': job['dedup_key'], 'active': True})
+                if existing is not None:
+                    return existing
+                # The active job finished between the insert and the lookup; try again
+
+    def get(self, job_id):
+        if self.collection is None:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+        return self.collection.find_one({'_id': job_id})
+
+    def claim(self, job_id, owner, lease_seconds):
+        """
+        Atomically move a queued job to running under owner's lease; returns
+        the job or None if already taken
+        """
+        now = datetime.utcnow()
+        fields = {'status': RUNNING, 'owner': owner, 'lease_expires_at': now + timedelta(seconds=lease_seconds),
+                  'updated_at': now}
+        if self.collection is None:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] != QUEUED:
+                    return None
+                job.update(fields, attempts=job['attempts'] + 1)
+                return dict(job)
+        return self.collection.find_one_and_update(
+            {'_id': job_id, 'status': QUEUED},
+            {'$set': fields, '$inc': {'attempts': 1}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def heartbeat(self, job_ids, owner, lease_seconds):
+        """Extend owner's lease on its running jobs"""
+        lease_expires_at = datetime.utcnow() + timedelta(seconds=lease_seconds)
+        if self.collection is None:
+            with self._lock:
+                for job_id in job_ids:
+                    job = self._jobs.get(job_id)
+                    if job is not None and job['status'] == RUNNING and job.get('owner') == owner:
+                        job['lease_expires_at'] = lease_expires_at
+            return
+        self.collection.update_many(
+            {'_id': {'$in': list(job_ids)}, 'status': RUNNING, 'owner': owner},
+            {'$set': {'lease_expires_at': lease_expires_at}}
+        )
+
+    def update(self, job_id, fields, unset_active=False, owner=None):
+        """
+        Set fields on a job. With owner, only while that owner still holds the
+        job's lease; returns whether the job was updated.
+        """
+        fields = dict(fields, updated_at=datetime.utcnow())
+        if unset_active:
+            # Finished jobs expire through the TTL index on finished_at
+            fields['finished_at'] = fields['updated_at']
+        if self.collection is None:
+            with self._lock:
+                job = self._jobs[job_id]
+                if owner is not None and (job['status'] != RUNNING or job.get('owner') != owner):
+                    return False
+                job.update(fields)
+                if unset_active:
+                    job.pop('active', None)
+            return True
+        query = {'_id': job_id}
+        if owner is not None:
+            query.update(status=RUNNING, owner=owner)
+        update = {'$set': fields}
+        if unset_active:
+            update['$unset'] = {'active': ''}
+        return self.collection.update_one(query, update).matched_count == 1
+
+    def recoverable(self, now):
+        """
+        Queued jobs as [(job_id, run_after)], after moving running jobs whose
+        lease expired before now back to queued
+        """
+        # Jobs claimed before leases existed only have updated_at to go by
+        stale_before = now - timedelta(seconds=Config.JOB_LEASE_SECONDS)
+        expired = {'$or': [
+            {'status': RUNNING, 'lease_expires_at': {'$lt': now}},
+            {'status': RUNNING, 'lease_expires_at': {'$exists': False}, 'updated_at': {'$lt': stale_before}}
+        ]}
+        if self.collection is None:
+            with self._lock:
+                for job in self._jobs.values():
+                    if job['status'] == RUNNING and job.get('lease_expires_at', now) < now:
+                        job.update(status=QUEUED, run_after=now)
+                return [(job_id, job.get('run_after')) for job_id, job in self._jobs.items()
+                        if job['status'] == QUEUED]
+        self.collection.update_many(expired, {'$set': {'status': QUEUED, 'run_after': now}})
+        return [(job['_id'], job.get('run_after'))
+                for job in self.collection.find({'status': QUEUED}, {'_id': 1, 'run_after': 1})]
+
+class JobService:
+    """
+    Background job runner for slow work (scraping, classification) that
+    should not hold a request thread.
+
+    Jobs are persisted in a JobStore, dispatched through a broker and run by a
+    pool of worker threads started lazily in each process. Failed jobs are
+    retried with exponential backoff, and at most one active job exists per
+    dedup key.
+
+    A running job is leased to the process running it for JOB_LEASE_SECONDS
+    and the lease is renewed while the handler runs, so only jobs whose
+    process died are picked up by other processes, once they are due. Every
+    running process sweeps for such jobs each JOB_RECOVERY_INTERVAL seconds.
+    """
+
+    def __init__(self, store=None, broker=None, workers=None):
+        self.store = store or JobStore()
+        self.broker = broker or LocalBroker()
+        self.workers = workers or Config.JOB_WORKERS
+        self.handlers = {}
+        self.lease_seconds = Config.JOB_LEASE_SECONDS
+        self.recovery_interval = Config.JOB_RECOVERY_INTERVAL
+        self._threads = []
+        self._pid = None
+        self._owner = None
+        self._running = set()
+        self._published = set()  # published to the broker by this process, not consumed yet
+        self._lock = threading.Lock()
+
+    def register(self, kind, handler):
+        """Register the function that runs jobs of a kind; it receives the job payload"""
+        self.handlers[kind] = handler
+
+    def enqueue(self, kind, payload, user_id=None, dedup_key=None, max_attempts=None, created_by=None):
+        """
+        Queue a job. If an active job with the same dedup key exists, that job
+        is returned instead of creating a new one. created_by records another
+        user (e.g. the uploader of a bulk signup) who may read the job too.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        self._ensure_started()
+
+        now = datetime.utcnow()
+        job = {
+            '_id': uuid.uuid4().hex,
+            'kind': kind,
+            'user_id': user_id,
+            'created_by': created_by,
+            'payload': payload,
+            'status': QUEUED,
+            'attempts': 0,
+            'max_attempts': max_attempts or Config.JOB_MAX_ATTEMPTS,
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now,
+            'run_after': now
+        }
+        if dedup_key:
+            job['dedup_key'] = dedup_key
+            job['active'] = True
+
+        existing = self.store.insert(job)
+        if existing is not None:
+            return self._public(existing, deduplicated=True)
+
+        self._publish(job['_id'])
+        return self._public(job)
+
+    def get(self, job_id):
+        job = self.store.get(job_id)
+        return self._public(job) if job else None
+
+    def start(self):
+        """Start this process's workers and recovery sweeps without waiting for the first enqueue"""
+        self._ensure_started()
+
+    def stop(self):
+        """Let this process's workers and sweeps exit; queued jobs stay in the store for the next start"""
+        with self._lock:
+            self._pid = None
+            self._owner = None
+
+    def _public(self, job, deduplicated=False):
+        return {
+            'job_id': job['_id'],
+            'kind': job['kind'],
+            'user_id': job.get('user_id'),
+            'created_by': job.get('created_by'),
+            'status': job['status'],
+            'attempts': job['attempts'],
+            'result': job.get('result'),
+            'error': job.get('error'),
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at'],
+            'deduplicated': deduplicated
+        }
+
+    def _ensure_started(self):
+        """Start worker threads once per process (safe across gunicorn forks)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._owner = f'{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}'
+            self._running = set()
+            self._published = set()
+            self._threads = []
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        # Pick up jobs left behind by a previous process
+        self._recover()
+
+    def _publish(self, job_id, delay=0):
+        with self._lock:
+            self._published.add(job_id)
+        self.broker.publish(job_id, delay)
+
+    def _recover(self):
+        """Publish queued jobs nobody is holding, honouring their retry backoff"""
+        now = datetime.utcnow()
+        try:
+            recoverable = self.store.recoverable(now)
+        except Exception as e:
+            logger.error(f"Error recovering pending jobs: {str(e)}")
+            return
+        with self._lock:
+            published = set(self._published)
+        for job_id, run_after in recoverable:
+            if job_id in published:
+                continue
+            delay = (run_after - now).total_seconds() if run_after else 0
+            self._publish(job_id, max(0.0, delay))
+
+    def _heartbeat(self):
+        """
+        Renew the lease on this process's running jobs well before it expires,
+        and sweep for jobs whose lease expired in a process that died
+        """
+        owner = self._owner
+        next_renewal = time.monotonic() + self.lease_seconds / 3
+        next_recovery = time.monotonic() + self.recovery_interval
+        while True:
+            time.sleep(max(0.0, min(next_renewal, next_recovery) - time.monotonic()))
+            if self._owner != owner:
+                return
+            if time.monotonic() >= next_recovery:
+                next_recovery = time.monotonic() + self.recovery_interval
+                self._recover()
+            if time.monotonic() < next_renewal:
+                continue
+            next_renewal = time.monotonic() + self.lease_seconds / 3
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                self.store.heartbeat(running, owner, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Error renewing job leases: {str(e)}")
+
+    def _work(self):
+        owner = self._owner
+        while self._owner == owner:
+            job_id = self.broker.consume()
+            if job_id is None:
+                continue
+            with self._lock:
+                self._published.discard(job_id)
+            try:
+                self._run(job_id)
+            except Exception as e:
+                logger.error(f"Error running job {job_id}: {str(e)}")
+
+    def _run(self, job_id):
+        owner = self._owner
+        job = self.store.claim(job_id, owner, self.lease_seconds)
+        if job is None:
+            return
+
+        with self._lock:
+            self._running.add(job_id)
+        try:
+            with span(f"job.{job['kind']}"):
+                result = self.handlers[job['kind']](job['payload'])
+        except Exception as e:
+            if job['attempts'] < job['max_attempts']:
+                delay = Config.JOB_RETRY_BACKOFF * 2 ** (job['attempts'] - 1) * random.uniform(0.8, 1.2)
+                logger.warning(f"Job {job_id} failed (attempt {job['attempts']}), retrying in {delay:.1f}s: {str(e)}")
+                run_after = datetime.utcnow() + timedelta(seconds=delay)
+                if self.store.update(job_id, {'status': QUEUED, 'error': str(e), 'run_after': run_after}, owner=owner):
+                    self._publish(job_id, delay)
+            else:
+                logger.error(f"Job {job_id} failed after {job['attempts']} attempts: {str(e)}")
+                self._finish(job_id, owner, {'status': FAILED, 'error': str(e)})
+            return
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+        self._finish(job_id, owner, {'status': SUCCEEDED, 'result': result, 'error': None})
+
+    def _finish(self, job_id, owner, fields):
+        if not self.store.update(job_id, fields, unset_active=True, owner=owner):
+            # The lease lapsed and another process took the job over; its result stands
+            logger.warning(f"Job {job_id} lost its lease before finishing; result discarded")
@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from backend.config import Config
+from backend.services.analytics_service import rollup_increments
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class LiveAnalytics:
+    """
+    Pushes analytics rollup deltas to connected dashboards.
+
+    Each dashboard socket joins its user's room. Every tracked event is turned
+    into the same hourly and daily increments the rollups receive, and
+    increments are merged per user until the next push. Every
+    ANALYTICS_PUSH_INTERVAL seconds a background thread sends each user
+    with changes one frame listing the buckets that changed, so a burst of
+    events costs a dashboard one message instead of one per event.
+
+    emit(event, data, room) does the sending (e.g. SocketIO.emit). Unless
+    local_only is False (a message queue shares rooms between workers),
+    events are only kept for users with a dashboard connected to this
+    process.
+    """
+
+    EVENT = 'analytics_delta'
+
+    def __init__(self, emit, interval=None, local_only=True):
+        self.emit = emit
+        self.interval = interval or Config.ANALYTICS_PUSH_INTERVAL
+        self.local_only = local_only
+        self.sessions = {}  # socket id -> user_id
+        self.subscribers = defaultdict(int)  # user_id -> connected sockets
+        self.frames_sent = 0
+        self.events_recorded = 0
+        self._pending = {}  # user_id -> {(granularity, bucket): increments}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @staticmethod
+    def room(user_id):
+        return f'user:{user_id}'
+
+    def subscribe(self, sid, user_id):
+        """Register a connected dashboard socket"""
+        with self._lock:
+            self.sessions[sid] = user_id
+            self.subscribers[user_id] += 1
+        self._ensure_started()
+
+    def unsubscribe(self, sid):
+        with self._lock:
+            user_id = self.sessions.pop(sid, None)
+            if user_id is None:
+                return
+            self.subscribers[user_id] -= 1
+            if self.subscribers[user_id] <= 0:
+                del self.subscribers[user_id]
+                if self.local_only:
+                    self._pending.pop(user_id, None)
+
+    def record(self, event):
+        """Merge a tracked event into its user's pending delta"""
+        user_id = event['user_id']
+        if self.local_only and user_id not in self.subscribers:
+            return
+        increments = rollup_increments([event])
+        with self._lock:
+            pending = self._pending.setdefault(user_id, {})
+            for (_, unit, bucket), delta in increments.items():
+                merged = pending.get((unit, bucket))
+                if merged is None:
+                    pending[(unit, bucket)] = {'count': delta['count'], 'industries': dict(delta['industries'])}
+                    continue
+                merged['count'] += delta['count']
+                for industry, recommendations in delta['industries'].items():
+                    merged['industries'][industry] = merged['industries'].get(industry, 0) + recommendations
+            self.events_recorded += 1
+        if not self.local_only:
+            self._ensure_started()
+
+    def flush(self):
+        """Send every pending delta now, one frame per user; returns the number of frames"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for user_id, buckets in pending.items():
+            frame = {
+                'user_id': user_id,
+                'deltas': [
+                    {
+                        'granularity': unit,
+                        'bucket': bucket.isoformat(),
+                        'count': delta['count'],
+                        'industries': delta['industries']
+                    }
+                    for (unit, bucket), delta in sorted(buckets.items())
+                ]
+            }
+            try:
+                self.emit(self.EVENT, frame, self.room(user_id))
+            except Exception as e:
+                logger.error(f"Error pushing analytics to {user_id}: {str(e)}")
+                continue
+            self.frames_sent += 1
+        return len(pending)
+
+    def stats(self):
+        return {
+            'dashboards': len(self.sessions),
+            'users': len(self.subscribers),
+            'events_recorded': self.events_recorded,
+            'frames_sent': self.frames_sent
+        }
+
+    def _ensure_started(self):
+        """Start the push thread once per process (safe across gunicorn forks)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name='live-analytics', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error pushing analytics: {str(e)}")
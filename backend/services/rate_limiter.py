@@ -0,0 +1,40 @@
+import threading
+import time
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets held in process memory.
+
+    Each key refills at rate tokens per second up to burst tokens; consume()
+    takes cost tokens at once so a batch is charged per event. Limits apply
+    per worker process. Buckets idle long enough to be full again are pruned
+    once max_keys is exceeded.
+    """
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, cost=1):
+        """Take cost tokens from key's bucket; returns (allowed, seconds until it would be allowed)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if cost > tokens:
+                self._buckets[key] = (tokens, now)
+                retry_after = (min(cost, self.burst) - tokens) / self.rate if self.rate else float('inf')
+                return False, retry_after
+            self._buckets[key] = (tokens - cost, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return True, 0.0
+
+    def _prune(self, now):
+        full_after = self.burst / self.rate if self.rate else float('inf')
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full_after:
+                del self._buckets[key]
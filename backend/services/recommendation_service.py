@@ -1,84 +1,204 @@
 from collections import Counter
+import hashlib
+import json
 import random
+from backend.config import Config
+from backend.metrics import timed
+from backend.services.cache import TTLCache
+from backend.services.industry_classifier import KeywordClassifier
+from backend.services.industry_model import IndustryModel, INDUSTRY_KEYWORDS, DEFAULT_INDUSTRY
 
 class RecommendationService:
     def __init__(self):
         # Mock data for testing
         self.mock_recommendations = {
-            'marketing': [
+            DEFAULT_INDUSTRY: [
                 'Create engaging social media content',
                 'Start an email newsletter',
                 'Run targeted ad campaigns',
                 'Optimize website for SEO',
                 'Create valuable blog content'
             ],
-            'technology': [
+            'Technology': [
                 'Implement website analytics',
                 'Optimize website performance',
                 'Add mobile responsiveness',
                 'Implement security best practices',
                 'Add user engagement features'
             ],
-            'ecommerce': [
+            'E-commerce': [
                 'Streamline checkout process',
                 'Add product recommendations',
                 'Implement abandoned cart recovery',
                 'Add customer reviews',
                 'Optimize product pages'
+            ],
+            'Finance': [
+                'Publish transparent rates and fees',
+                'Add a loan or savings calculator',
+                'Highlight security and compliance badges',
+                'Offer personalized financial guides',
+                'Simplify account application forms'
+            ],
+            'Healthcare': [
+                'Enable online appointment booking',
+                'Add provider profiles and specialties',
+                'Publish patient education resources',
+                'Show accepted insurance plans',
+                'Collect and display patient reviews'
+            ],
+            'Education': [
+                'Recommend related courses',
+                'Add course previews and syllabi',
+                'Track learner progress',
+                'Send enrollment reminders',
+                'Showcase student success stories'
+            ],
+            'Entertainment': [
+                'Recommend content based on viewing history',
+                'Add personalized watch or play lists',
+                'Promote trending releases',
+                'Enable social sharing of favorites',
+                'Send release and event notifications'
+            ],
+            'Real Estate': [
+                'Recommend similar listings',
+                'Add saved searches with alerts',
+                'Show neighborhood insights',
+                'Add virtual tours to listings',
+                'Offer a mortgage affordability calculator'
+            ],
+            'Automotive': [
+                'Recommend vehicles by budget and use',
+                'Add inventory comparison tools',
+                'Enable online test drive booking',
+                'Offer trade-in value estimates',
+                'Promote service and parts specials'
+            ],
+            'Travel': [
+                'Recommend destinations from past searches',
+                'Bundle flights, hotels and activities',
+                'Show price alerts for saved trips',
+                'Highlight traveler reviews and photos',
+                'Offer flexible booking options'
+            ],
+            'Food': [
+                'Recommend dishes from past orders',
+                'Add online ordering and delivery',
+                'Highlight seasonal menu items',
+                'Offer loyalty rewards',
+                'Show dietary and allergen filters'
             ]
         }
 
+        # Industry classifier, loaded once per service instance
+        if Config.INDUSTRY_CLASSIFIER == 'keywords':
+            self.classifier = KeywordClassifier(INDUSTRY_KEYWORDS, default=DEFAULT_INDUSTRY)
+        else:
+            self.classifier = IndustryModel.load_or_train()
+
+        # Results keyed by content fingerprint; unchanged content is never reclassified
+        self.cache = TTLCache(Config.RECOMMENDATION_CACHE_SIZE, Config.RECOMMENDATION_CACHE_TTL)
+
+    @timed('recommendations.get')
     def get_recommendations(self, website_content):
         """
         Generate recommendations based on website content.
-        For now, we'll use a simple keyword-based approach.
+        Content may be text or the (word, count) list returned by ScraperService.
+        The same content always yields the same recommendations.
         """
         try:
-            # Convert content to lowercase for better matching
-            content = website_content.lower() if website_content else ""
-            
-            # Simple keyword matching for industry detection
-            industry = self._detect_industry(content)
-            
-            # Get recommendations for the detected industry
-            recommendations = self._get_industry_recommendations(industry)
-            
+            content = website_content or ""
+            fingerprint = self.content_fingerprint(content)
+
+            cached = self.cache.get(fingerprint)
+            if cached is None:
+                # Classify the content into one of the industry categories
+                industry = self._detect_industry(content)
+
+                # Get recommendations for the detected industry
+                recommendations = self._get_industry_recommendations(industry, fingerprint)
+
+                cached = {
+                    'industry': industry,
+                    'recommendations': recommendations
+                }
+                self.cache.set(fingerprint, cached)
+
             return {
-                'industry': industry,
-                'recommendations': recommendations
+                'industry': cached['industry'],
+                'recommendations': list(cached['recommendations'])
             }
         except Exception as e:
             print(f"Error generating recommendations: {str(e)}")
             return {
                 'industry': 'unknown',
-                'recommendations': self._get_industry_recommendations('marketing')  # Default to marketing
+                'recommendations': self._get_industry_recommendations(DEFAULT_INDUSTRY)
             }
 
-    def _detect_industry(self, content):
+    @timed('recommendations.get_many')
+    def get_recommendations_many(self, contents):
         """
-        Simple keyword-based industry detection.
+        get_recommendations for many documents at once. Documents missing from
+        the cache are classified together in one classifier call.
         """
-        industry_keywords = {
-            'technology': ['software', 'tech', 'digital', 'app', 'platform', 'cloud'],
-            'ecommerce': ['shop', 'store', 'product', 'cart', 'buy', 'price'],
-            'marketing': ['marketing', 'brand', 'social media', 'content', 'campaign']
-        }
+        try:
+            contents = [content or "" for content in contents]
+            fingerprints = [self.content_fingerprint(content) for content in contents]
+            results = [self.cache.get(fingerprint) for fingerprint in fingerprints]
+
+            missing = [index for index, cached in enumerate(results) if cached is None]
+            if missing:
+                industries = self.detect_industries([contents[index] for index in missing])
+                for index, industry in zip(missing, industries):
+                    results[index] = {
+                        'industry': industry,
+                        'recommendations': self._get_industry_recommendations(industry, fingerprints[index])
+                    }
+                    self.cache.set(fingerprints[index], results[index])
+
+            return [
+                {'industry': cached['industry'], 'recommendations': list(cached['recommendations'])}
+                for cached in results
+            ]
+        except Exception as e:
+            print(f"Error generating recommendations: {str(e)}")
+            return [self.get_recommendations(content) for content in contents]
 
-        # Count keyword matches for each industry
-        scores = {industry: 0 for industry in industry_keywords}
-        
-        for industry, keywords in industry_keywords.items():
-            for keyword in keywords:
-                if keyword in content:
-                    scores[industry] += 1
+    @staticmethod
+    def content_fingerprint(content):
+        """Stable hash of text or a (word, count) list"""
+        if isinstance(content, str):
+            data = content.lower().encode('utf-8')
+        else:
+            data = json.dumps([[word, count] for word, count in content]).encode('utf-8')
+        return hashlib.sha1(data).hexdigest()
 
-        # Return the industry with highest score, default to marketing
-        return max(scores.items(), key=lambda x: x[1])[0] if any(scores.values()) else 'marketing'
+    def cache_stats(self):
+        """Hit/miss counters of the recommendation cache"""
+        return self.cache.stats()
+
+    def _detect_industry(self, content):
+        """
+        Industry detection with the configured classifier.
+        """
+        return self.classifier.classify(content)
+
+    @timed('recommendations.detect_industries')
+    def detect_industries(self, documents):
+        """
+        Detect the industry of many documents at once.
+        Documents may be text or (word, count) lists.
+        """
+        return self.classifier.classify_many(documents)
 
-    def _get_industry_recommendations(self, industry):
+    def _get_industry_recommendations(self, industry, fingerprint=''):
         """
         Get recommendations for a specific industry.
-        Returns a subset of recommendations to avoid overwhelming the user.
+        Returns a subset of recommendations to avoid overwhelming the user,
+        ranked with a seed derived from the industry and content fingerprint
+        so results are reproducible.
         """
-        recommendations = self.mock_recommendations.get(industry, self.mock_recommendations['marketing'])
-        return random.sample(recommendations, min(3, len(recommendations)))
+        recommendations = self.mock_recommendations.get(industry, self.mock_recommendations[DEFAULT_INDUSTRY])
+        rng = random.Random(f'{industry}:{fingerprint}')
+        return rng.sample(recommendations, min(3, len(recommendations)))
@@ -0,0 +1,92 @@
+from datetime import datetime
+from pymongo import UpdateOne
+from backend.config import Config
+from backend.database import get_collection
+from backend.services.cache import TTLCache
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ScrapeCache:
+    """
+    Persistent cache of scrape results keyed by normalized URL.
+
+    Each entry keeps the HTTP validators (ETag / Last-Modified) and a hash of
+    the page body, so a re-scrape can be answered with a conditional GET and
+    skip parsing entirely when the page has not changed.
+
+    Without MongoDB, entries are kept in a bounded in-process LRU
+    (SCRAPE_CACHE_MEMORY_SIZE entries, expiring like the collection's).
+    """
+
+    def __init__(self):
+        self._entries = TTLCache(Config.SCRAPE_CACHE_MEMORY_SIZE, Config.SCRAPE_CACHE_RETENTION_DAYS * 86400)
+
+    @property
+    def collection(self):
+        return get_collection('scrape_cache')
+
+    def get(self, url):
+        """Return the cache entry for a normalized URL, or None"""
+        if self.collection is None:
+            return self._entries.get(url)
+        try:
+            return self.collection.find_one({'url': url}, {'_id': 0})
+        except Exception as e:
+            logger.error(f"Error reading scrape cache: {str(e)}")
+            return None
+
+    def save(self, url, content, content_hash, etag=None, last_modified=None):
+        """Store fresh scrape results; any cached recommendations are dropped"""
+        entry = {
+            'url': url,
+            'content': content,
+            'content_hash': content_hash,
+            'etag': etag,
+            'last_modified': last_modified,
+            'recommendations': None,
+            'fetched_at': datetime.utcnow()
+        }
+        self._write(url, entry)
+
+    def touch(self, url, etag=None, last_modified=None):
+        """Record that an unchanged page was re-validated"""
+        update = {'fetched_at': datetime.utcnow()}
+        if etag:
+            update['etag'] = etag
+        if last_modified:
+            update['last_modified'] = last_modified
+        self._write(url, update)
+
+    def save_recommendations(self, url, recommendations):
+        """Attach the recommendations generated for the cached content"""
+        self._write(url, {'recommendations': recommendations})
+
+    def save_recommendations_many(self, recommendations):
+        """save_recommendations for {url: recommendations} in one bulk write"""
+        if not recommendations:
+            return
+        if self.collection is None:
+            for url, result in recommendations.items():
+                self._write(url, {'recommendations': result})
+            return
+        try:
+            self.collection.bulk_write([
+                UpdateOne({'url': url}, {'$set': {'recommendations': result}}, upsert=True)
+                for url, result in recommendations.items()
+            ], ordered=False)
+        except Exception as e:
+            logger.error(f"Error writing scrape cache: {str(e)}")
+
+    def _write(self, url, fields):
+        if self.collection is None:
+            entry = dict(self._entries.get(url) or {'url': url})
+            entry.update(fields)
+            self._entries.set(url, entry)
+            return
+        try:
+            self.collection.update_one({'url': url}, {'$set': fields}, upsert=True)
+        except Exception as e:
+            logger.error(f"Error writing scrape cache: {str(e)}")
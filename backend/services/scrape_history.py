@@ -0,0 +1,210 @@
+import threading
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from backend.database import get_collection
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Returned by page() unless more fields are asked for; content is the bulky part
+SUMMARY_FIELDS = ('version', 'url', 'industry', 'scraped_at')
+DETAIL_FIELDS = SUMMARY_FIELDS + ('content', 'recommendations')
+
+class ScrapeHistory:
+    """
+    Versioned scrape results per user, kept out of the users collection.
+
+    Each scrape is stored in scrape_history with a per-user version number
+    (old entries expire through a TTL index on scraped_at). The user only
+    keeps a small last_scrape reference to the newest version, written through
+    the user repository, so user lookups no longer carry page content around.
+    History is paged by version, newest first, with the last version seen as
+    the cursor.
+    """
+
+    # Attempts at claiming a version before giving up on concurrent scrapes
+    MAX_VERSION_ATTEMPTS = 5
+
+    def __init__(self, user_repository=None):
+        self.user_repository = user_repository
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        return get_collection('scrape_history')
+
+    @property
+    def users(self):
+        return get_collection('users')
+
+    def record(self, user_id, url, content, recommendations, scraped_at=None):
+        """Store a scrape as the user's next version and point the user at it; returns the reference"""
+        scraped_at = scraped_at or datetime.utcnow()
+        entry = {
+            'user_id': user_id,
+            'url': url,
+            'industry': recommendations.get('industry'),
+            'content': content,
+            'recommendations': recommendations,
+            'scraped_at': scraped_at
+        }
+
+        if self.collection is None:
+            with self._lock:
+                entries = self._entries.setdefault(user_id, [])
+                entry['version'] = len(entries) + 1
+                entries.append(entry)
+        else:
+            self._insert_next_version(entry)
+        return self._point_user(entry)
+
+    def _point_user(self, entry):
+        """Make entry the user's last_scrape if it is still their newest version; returns its reference"""
+        # Concurrent scrapes may finish out of order; only move the reference forward
+        reference = self._reference(entry)
+        if self.user_repository is not None and self._latest_version(entry['user_id']) == entry['version']:
+            self.user_repository.update(entry['user_id'], {'industry': entry['industry'], 'last_scrape': reference})
+        return reference
+
+    @staticmethod
+    def initial_reference(url, recommendations, scraped_at):
+        """The last_scrape reference of a new user's first scrape, to store on the user as it is created"""
+        return {
+            'version': 1,
+            'url': url,
+            'industry': recommendations.get('industry'),
+            'scraped_at': scraped_at
+        }
+
+    def record_initial(self, scrapes):
+        """
+        Store the first scrape of users created with an initial_reference() in
+        one insert. scrapes are (user_id, url, content, recommendations,
+        scraped_at) tuples.
+        """
+        entries = [{
+            'user_id': user_id,
+            'url': url,
+            'industry': recommendations.get('industry'),
+            'content': content,
+            'recommendations': recommendations,
+            'scraped_at': scraped_at,
+            'version': 1
+        } for user_id, url, content, recommendations, scraped_at in scrapes]
+        if not entries:
+            return
+
+        if self.collection is None:
+            with self._lock:
+                for entry in entries:
+                    self._entries.setdefault(entry['user_id'], []).append(entry)
+            return
+
+        self.collection.insert_many(entries, ordered=False)
+
+    def _latest_version(self, user_id):
+        if self.collection is None:
+            with self._lock:
+                return len(self._entries.get(user_id, []))
+        latest = self.collection.find_one({'user_id': user_id}, {'version': 1}, sort=[('version', -1)])
+        return latest['version'] if latest else 0
+
+    def _insert_next_version(self, entry):
+        """Insert entry as the user's next version; the unique (user_id, version) index arbitrates races"""
+        for _ in range(self.MAX_VERSION_ATTEMPTS):
+            entry['version'] = self._latest_version(entry['user_id']) + 1
+            entry.pop('_id', None)
+            try:
+                self.collection.insert_one(entry)
+                return
+            except DuplicateKeyError:
+                continue
+        raise RuntimeError(f"Could not allocate a scrape version for user {entry['user_id']}")
+
+    def page(self, user_id, cursor=None, limit=20, fields=SUMMARY_FIELDS):
+        """
+        One page of a user's history, newest first. cursor is the next_cursor
+        of the previous page; next_cursor is None on the last page.
+        """
+        fields = [field for field in fields if field in DETAIL_FIELDS]
+        if 'version' not in fields:
+            fields.append('version')
+
+        if self.collection is None:
+            with self._lock:
+                entries = [entry for entry in reversed(self._entries.get(user_id, []))
+                           if cursor is None or entry['version'] < cursor][:limit + 1]
+            items = [{field: entry[field] for field in fields} for entry in entries]
+        else:
+            query = {'user_id': user_id}
+            if cursor is not None:
+                query['version'] = {'$lt': cursor}
+            projection = dict.fromkeys(fields, 1)
+            projection['_id'] = 0
+            items = list(self.collection.find(query, projection).sort('version', -1).limit(limit + 1))
+
+        next_cursor = items[limit - 1]['version'] if len(items) > limit else None
+        return {
+            'items': items[:limit],
+            'next_cursor': next_cursor
+        }
+
+    def get(self, user_id, version):
+        """A single version with its content and recommendations, or None"""
+        if self.collection is None:
+            with self._lock:
+                for entry in self._entries.get(user_id, []):
+                    if entry['version'] == version:
+                        return {field: entry[field] for field in DETAIL_FIELDS}
+            return None
+        projection = dict.fromkeys(DETAIL_FIELDS, 1)
+        projection['_id'] = 0
+        return self.collection.find_one({'user_id': user_id, 'version': version}, projection)
+
+    def migrate_embedded(self, batch_size=100):
+        """
+        Move scrape results still embedded in user documents into the history
+        collection, leaving a reference behind. Returns the number moved.
+        Moved entries are marked migrated, so a rerun after a failure only
+        repoints users whose entry was already written.
+        """
+        if self.collection is None:
+            logger.warning("Scrape history migration skipped - MongoDB not available")
+            return 0
+
+        moved = 0
+        cursor = self.users.find(
+            {'last_scrape.content': {'$exists': True}},
+            {'last_scrape': 1}
+        ).batch_size(batch_size)
+        for user in cursor:
+            user_id = str(user['_id'])
+            entry = self.collection.find_one({'user_id': user_id, 'migrated': True}, {'_id': 0})
+            if entry is None:
+                last_scrape = user['last_scrape']
+                recommendations = last_scrape.get('recommendations') or {}
+                entry = {
+                    'user_id': user_id,
+                    'url': last_scrape.get('url'),
+                    'industry': recommendations.get('industry'),
+                    'content': last_scrape.get('content'),
+                    'recommendations': recommendations,
+                    'scraped_at': last_scrape.get('scraped_at') or datetime.utcnow(),
+                    'migrated': True
+                }
+                self._insert_next_version(entry)
+            self._point_user(entry)
+            moved += 1
+        return moved
+
+    @staticmethod
+    def _reference(entry):
+        return {
+            'version': entry['version'],
+            'url': entry['url'],
+            'industry': entry['industry'],
+            'scraped_at': entry['scraped_at']
+        }
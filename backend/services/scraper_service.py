@@ -1,33 +1,257 @@
-import requests
-from bs4 import BeautifulSoup
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
+import asyncio
+import hashlib
+import re
+from urllib.parse import urlsplit
 from collections import Counter
+from backend.config import Config
+from backend.metrics import span, timed
+from backend.services.crawl_engine import CrawlEngine
+from backend.services.crawl_frontier import CrawlFrontier, normalize_url
+from backend.services.scrape_cache import ScrapeCache
+from backend.services.stopwords import ENGLISH_STOP_WORDS
+from backend.services.text_pipeline import ParagraphTokenizer
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SITEMAP_LOC = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>', re.IGNORECASE)
 
 class ScraperService:
-    def __init__(self):
-        # Initialize NLTK resources
-        nltk.download('punkt', quiet=True)
-        nltk.download('stopwords', quiet=True)
-        self.stop_words = set(stopwords.words('english'))
+    def __init__(self, engine=None, cache=None):
+        # Bundled stop words; nothing is downloaded or loaded from disk at startup
+        self.stop_words = ENGLISH_STOP_WORDS
+
+        # Shared crawl engine (connection pool and event loop) for this worker
+        self.engine = engine or CrawlEngine()
+
+        # Persistent per-URL cache of validators, content hash and results
+        self.cache = cache or ScrapeCache()
 
     def scrape_text(self, url):
+        """Scrape a single URL and return its top 50 (word, count) pairs"""
+        return self.scrape_many([url])[0]
+
+    @timed('scraper.scrape_page')
+    def scrape_page(self, url):
+        """
+        Scrape a single URL through the scrape cache.
+        Returns a dict with the top 50 (word, count) pairs under 'content',
+        the cached recommendations for that content (or None) and whether the
+        result came from the cache; 'error' is set when the fetch failed.
+        Unchanged pages (304 response or identical body hash) are never
+        re-parsed.
+        """
+        key = normalize_url(url) or url
+        entry = self.cache.get(key)
         try:
-            response = requests.get(url)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Get all text from paragraphs
-            text = ' '.join([p.get_text() for p in soup.find_all('p')])
-            
-            # Tokenize and remove stopwords
-            tokens = word_tokenize(text.lower())
-            tokens = [t for t in tokens if t.isalnum() and t not in self.stop_words]
-            
-            # Get word frequencies
-            word_freq = Counter(tokens)
+            with span('scraper.fetch'):
+                page = self.engine.run(self.engine.fetch(url, headers=self._validators(entry)),
+                                       timeout=Config.CRAWL_TOTAL_TIMEOUT)
+        except Exception as e:
+            page = e
+        return self._page_result(url, key, entry, page)
+
+    @timed('scraper.scrape_pages')
+    def scrape_pages(self, urls):
+        """
+        scrape_page for many URLs: the cache entries are read first, then
+        every page is fetched concurrently in one run of the event loop.
+        Returns one scrape_page result per URL, in the same order as urls.
+        """
+        keys = [normalize_url(url) or url for url in urls]
+        entries = [self.cache.get(key) for key in keys]
+        with span('scraper.fetch'):
+            pages = self.engine.run(self._fetch_pages(urls, entries), timeout=Config.CRAWL_BATCH_TIMEOUT)
+        return [self._page_result(*args) for args in zip(urls, keys, entries, pages)]
+
+    async def _fetch_pages(self, urls, entries):
+        return await asyncio.gather(*(
+            asyncio.wait_for(self.engine.fetch(url, headers=self._validators(entry)), Config.CRAWL_TOTAL_TIMEOUT)
+            for url, entry in zip(urls, entries)
+        ), return_exceptions=True)
+
+    @staticmethod
+    def _validators(entry):
+        """Conditional request headers for a cached page"""
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def _page_result(self, url, key, entry, page):
+        """The scrape_page result for a fetched page, or for the exception its fetch raised"""
+        if isinstance(page, BaseException):
+            logger.error(f"Error scraping {url}: {str(page)}")
+            return {'content': [], 'recommendations': None, 'cached': False, 'error': str(page) or type(page).__name__}
+
+        etag = page['headers'].get('ETag')
+        last_modified = page['headers'].get('Last-Modified')
+
+        if entry and page['status'] == 304:
+            self.cache.touch(key, etag, last_modified)
+            return self._cached_result(entry)
+
+        digest = hashlib.sha256()
+        for chunk in page['chunks']:
+            digest.update(chunk)
+        content_hash = digest.hexdigest()
+        if entry and entry.get('content_hash') == content_hash:
+            self.cache.touch(key, etag, last_modified)
+            return self._cached_result(entry)
+
+        try:
+            word_freq, _ = self._extract_words(page)
+            content = word_freq.most_common(50)  # Return top 50 words
+        except Exception as e:
+            logger.error(f"Error scraping {url}: {str(e)}")
+            return {'content': [], 'recommendations': None, 'cached': False}
+
+        if page['status'] == 200:
+            self.cache.save(key, content, content_hash, etag, last_modified)
+        return {'content': content, 'recommendations': None, 'cached': False}
+
+    def save_recommendations(self, url, recommendations):
+        """Cache the recommendations generated from a scrape_page result"""
+        self.cache.save_recommendations(normalize_url(url) or url, recommendations)
+
+    def save_recommendations_many(self, recommendations):
+        """save_recommendations for {url: recommendations} in one write"""
+        self.cache.save_recommendations_many(
+            {normalize_url(url) or url: result for url, result in recommendations.items()}
+        )
+
+    def _cached_result(self, entry):
+        return {
+            'content': [tuple(pair) for pair in entry.get('content', [])],
+            'recommendations': entry.get('recommendations'),
+            'cached': True
+        }
+
+    @timed('scraper.scrape_many')
+    def scrape_many(self, urls):
+        """
+        Scrape many URLs concurrently.
+        Returns a list of top 50 (word, count) lists in the same order as urls.
+        """
+        return self.engine.run(self._scrape_many(urls), timeout=Config.CRAWL_BATCH_TIMEOUT)
+
+    @timed('scraper.crawl_site')
+    def crawl_site(self, url, max_depth=None, max_pages=None, use_sitemap=True):
+        """
+        Crawl same-site pages reachable from url and return the top 50
+        (word, count) pairs across every page visited. Raises RuntimeError
+        when not a single page could be fetched and parsed.
+        """
+        max_depth = Config.CRAWL_MAX_DEPTH if max_depth is None else max_depth
+        max_pages = Config.CRAWL_MAX_PAGES if max_pages is None else max_pages
+        return self.engine.run(
+            self._crawl_site(url, max_depth, max_pages, use_sitemap),
+            timeout=Config.CRAWL_BATCH_TIMEOUT
+        )
+
+    async def _scrape_many(self, urls):
+        return await asyncio.gather(*(self._scrape(url) for url in urls))
+
+    async def _scrape(self, url):
+        try:
+            with span('scraper.fetch'):
+                page = await self.engine.fetch(url)
+            word_freq, _ = await self._parse(page)
             return word_freq.most_common(50)  # Return top 50 words
-            
+
+        except Exception as e:
+            logger.error(f"Error scraping {url}: {str(e)}")
+            return []
+
+    async def _crawl_site(self, url, max_depth, max_pages, use_sitemap):
+        frontier = CrawlFrontier(url, max_depth=max_depth, max_size=max_pages * 10)
+        frontier.push(url, 0)
+
+        if use_sitemap and max_depth > 0:
+            for loc in await self._sitemap_urls(url, max_pages):
+                frontier.push(loc, 1)
+
+        # Word counts are merged page by page as fetches complete
+        word_freq = Counter()
+        pages = 0
+
+        while frontier and pages < max_pages:
+            batch = []
+            while frontier and len(batch) < min(Config.CRAWL_PER_HOST_LIMIT, max_pages - pages):
+                batch.append(frontier.pop())
+
+            for task in asyncio.as_completed([self._crawl_page(u, d) for u, d in batch]):
+                depth, page_freq, links = await task
+                if page_freq is None:
+                    continue
+                pages += 1
+                word_freq.update(page_freq)
+                for link in links:
+                    frontier.push(link, depth + 1)
+
+        if not pages:
+            raise RuntimeError(f'No page of {url} could be fetched')
+        return word_freq.most_common(50)
+
+    async def _crawl_page(self, url, depth):
+        try:
+            with span('scraper.fetch'):
+                page = await self.engine.fetch(url)
+            if page['status'] >= 400 or 'html' not in page['headers'].get('Content-Type', 'text/html'):
+                return depth, None, []
+            page_freq, links = await self._parse(page, with_links=True)
+            return depth, page_freq, links
         except Exception as e:
-            print(f"Error scraping {url}: {str(e)}")
-            return []
\ No newline at end of file
+            logger.error(f"Error crawling {url}: {str(e)}")
+            return depth, None, []
+
+    async def _sitemap_urls(self, url, limit):
+        """Read page URLs from the site's sitemap.xml (one level of sitemap index)"""
+        parts = urlsplit(normalize_url(url) or url)
+        sitemaps = [f"{parts.scheme}://{parts.netloc}/sitemap.xml"]
+        urls = []
+
+        while sitemaps and len(urls) < limit:
+            try:
+                page = await self.engine.fetch(sitemaps.pop(0))
+            except Exception:
+                continue
+            if page['status'] != 200:
+                continue
+
+            for loc in SITEMAP_LOC.findall(self.engine.page_text(page)):
+                if loc.endswith('.xml'):
+                    if len(sitemaps) < 5:
+                        sitemaps.append(loc)
+                elif len(urls) < limit:
+                    urls.append(loc)
+
+        return urls
+
+    async def _parse(self, page, with_links=False):
+        # Tokenizing is CPU bound, keep it off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._extract_words, page, with_links)
+
+    def _extract_words(self, page, with_links=False):
+        """
+        Count the words in a fetched page's paragraphs, chunk by chunk.
+        Returns (Counter of words, list of absolute links); links are only
+        collected when with_links is set.
+        """
+        tokenizer = ParagraphTokenizer(
+            self.stop_words,
+            max_bytes=Config.SCRAPE_MAX_BYTES,
+            encoding=page['encoding'],
+            base_url=page['url'] if with_links else None
+        )
+        with span('scraper.parse'):
+            for chunk in page['chunks']:
+                if not tokenizer.feed_bytes(chunk):
+                    break
+            tokenizer.close()
+        return tokenizer.counts, tokenizer.links
@@ -0,0 +1,192 @@
+import codecs
+import re
+from collections import Counter
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+# NLTKWordTokenizer's substitutions (nltk 3.8.1, the tokenizer behind
+# word_tokenize) in the order it applies them. Its two end-of-string period
+# rules are left out: word_tokenize runs them per Punkt sentence, which
+# SENTENCE_END stands in for.
+TREEBANK_PREFIX_RULES = [(re.compile(pattern), replacement) for pattern, replacement in (
+    # Starting quotes
+    ('([«“‘„]|[`]+)', r' \1 '),
+    (r'^"', r'``'),
+    (r'(``)', r' \1 '),
+    (r'([ \(\[{<])(\"|\'{2})', r'\1 `` '),
+    (r"(?i)(\')(?!re|ve|ll|m|t|s|d|n)(\w)\b", r'\1 \2'),
+    # Punctuation
+    (r'([:,])([^\d])', r' \1 \2'),
+    (r'([:,])$', r' \1 '),
+    (r'\.{2,}', r' \g<0> '),
+    (r'[;@#$%&]', r' \g<0> '),
+    (r'[?!]', r' \g<0> '),
+    (r"([^'])' ", r"\1 ' "),
+    (r'[*]', r' \g<0> '),
+    # Brackets and double dashes
+    (r'[\]\[\(\)\{\}\<\>]', r' \g<0> '),
+    (r'--', r' -- '),
+)]
+
+# Applied after the text is padded with a space on each side
+TREEBANK_SUFFIX_RULES = [(re.compile(pattern), replacement) for pattern, replacement in (
+    # Ending quotes and contractions split from the preceding word
+    ('([»”’])', r' \1 '),
+    (r"''", " '' "),
+    (r'"', " '' "),
+    (r"([^' ])('[sS]|'[mM]|'[dD]|') ", r'\1 \2 '),
+    (r"([^' ])('ll|'LL|'re|'RE|'ve|'VE|n't|N'T) ", r'\1 \2 '),
+    # MacIntyre contractions
+    (r'(?i)\b(can)(?#X)(not)\b', r' \1 \2 '),
+    (r"(?i)\b(d)(?#X)('ye)\b", r' \1 \2 '),
+    (r'(?i)\b(gim)(?#X)(me)\b', r' \1 \2 '),
+    (r'(?i)\b(gon)(?#X)(na)\b', r' \1 \2 '),
+    (r'(?i)\b(got)(?#X)(ta)\b', r' \1 \2 '),
+    (r'(?i)\b(lem)(?#X)(me)\b', r' \1 \2 '),
+    (r"(?i)\b(more)(?#X)('n)\b", r' \1 \2 '),
+    (r'(?i)\b(wan)(?#X)(na)(?=\s)', r' \1 \2 '),
+    (r"(?i) ('t)(?#X)(is)\b", r' \1 \2 '),
+    (r"(?i) ('t)(?#X)(was)\b", r' \1 \2 '),
+)]
+
+# A word ending in a period, optionally followed by closing brackets or quotes
+SENTENCE_END = re.compile(r'(\S*[^\s.])\.([\]\)}>"\'»”’]*)(?=\s|$)')
+
+# Abbreviations the Punkt sentence splitter keeps their trailing period on
+ABBREVIATIONS = frozenset({
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'vs', 'etc', 'inc',
+    'ltd', 'co', 'corp', 'no', 'jan', 'feb', 'mar', 'apr', 'jun', 'jul',
+    'aug', 'sep', 'sept', 'oct', 'nov', 'dec'
+})
+
+# Paragraph text is tokenized in pieces of about this many characters
+TOKENIZE_BATCH = 32 * 1024
+
+# Tags whose text BeautifulSoup's get_text() leaves out
+SKIPPED_TAGS = ('script', 'style', 'template')
+
+def _split_sentence_end(match):
+    word = match.group(1)
+    if word.lstrip('([{<"\'`«“‘„') in ABBREVIATIONS:
+        return match.group(0)
+    return f'{word} .{match.group(2)}'
+
+def iter_words(text):
+    """
+    Yield the alphanumeric word tokens of lowercased text.
+
+    Mirrors NLTK word_tokenize followed by an isalnum() filter by applying
+    the Treebank tokenizer's own substitutions: punctuation and quotes are
+    split off, contractions are separated (don't, cannot, gonna), a trailing
+    period is treated as the end of a sentence unless it follows a known
+    abbreviation, and tokens that keep inner punctuation (e-mail, 3.5, u.s.,
+    a leading apostrophe) are dropped.
+    """
+    text = SENTENCE_END.sub(_split_sentence_end, text)
+    for regexp, replacement in TREEBANK_PREFIX_RULES:
+        text = regexp.sub(replacement, text)
+    text = f' {text} '
+    for regexp, replacement in TREEBANK_SUFFIX_RULES:
+        text = regexp.sub(replacement, text)
+    for token in text.split():
+        if token.isalnum():
+            yield token
+
+class ParagraphTokenizer(HTMLParser):
+    """
+    Incremental word counter for the <p> text of an HTML document.
+
+    Chunks of the response body are fed as they arrive; paragraph text is
+    joined with spaces, like the original ' '.join over <p> tags, and
+    tokenized up to the last word boundary whenever TOKENIZE_BATCH characters
+    have collected, so memory stays flat regardless of page size. At most
+    max_bytes of input are processed.
+    """
+
+    def __init__(self, stop_words, max_bytes=None, encoding='utf-8', base_url=None):
+        super().__init__(convert_charrefs=True)
+        self.stop_words = stop_words
+        self.max_bytes = max_bytes
+        self.base_url = base_url
+        self.counts = Counter()
+        self.links = []
+        self.bytes_read = 0
+        self.truncated = False
+
+        try:
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._in_paragraph = False
+        self._skip_depth = 0
+        self._pending = []
+        self._pending_size = 0
+
+    def feed_bytes(self, chunk):
+        """Feed a chunk of the raw body. Returns False once the byte cap is reached."""
+        if self.truncated:
+            return False
+        if self.max_bytes is not None and self.bytes_read + len(chunk) > self.max_bytes:
+            chunk = chunk[:self.max_bytes - self.bytes_read]
+            self.truncated = True
+        self.bytes_read += len(chunk)
+        self.feed(self._decoder.decode(chunk))
+        return not self.truncated
+
+    def close(self):
+        self.feed(self._decoder.decode(b'', final=True))
+        super().close()
+        self._flush()
+
+    def most_common(self, n=50):
+        return self.counts.most_common(n)
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'p':
+            self._end_paragraph()
+            self._in_paragraph = True
+        elif tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag == 'a' and self.base_url is not None:
+            href = dict(attrs).get('href')
+            if href:
+                self.links.append(urljoin(self.base_url, href))
+
+    def handle_endtag(self, tag):
+        if tag == 'p':
+            self._end_paragraph()
+            self._in_paragraph = False
+        elif tag in SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._in_paragraph or self._skip_depth:
+            return
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size < TOKENIZE_BATCH:
+            return
+
+        # Only tokenize up to the last whitespace; the tail may be a partial word
+        text = ''.join(self._pending)
+        cut = max(text.rfind(' '), text.rfind('\n'), text.rfind('\t'))
+        if cut < 0:
+            return
+        self._pending = [text[cut + 1:]]
+        self._pending_size = len(self._pending[0])
+        self._count(text[:cut])
+
+    def _end_paragraph(self):
+        if self._in_paragraph and self._pending_size:
+            self._pending.append(' ')
+            self._pending_size += 1
+
+    def _flush(self):
+        if self._pending_size:
+            self._count(''.join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def _count(self, text):
+        stop_words = self.stop_words
+        self.counts.update(word for word in iter_words(text.lower()) if word not in stop_words)
@@ -0,0 +1,545 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from bson import ObjectId
+from pymongo import UpdateOne
+from backend.config import Config
+from backend.concurrency import offload
+from backend.database import get_collection, get_firestore
+from backend.metrics import timed
+from backend.services.cache import TTLCache, SqliteCache, TieredCache
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Never returned by the public user endpoints
+PRIVATE_FIELDS = ('password',)
+
+# Value of a user's role field that lets them manage other users
+ADMIN_ROLE = 'admin'
+
+def project(user, fields=None):
+    """A copy of user limited to fields (plus its id)"""
+    if user is None:
+        return None
+    if not fields:
+        return dict(user)
+    projected = {field: user[field] for field in fields if field in user}
+    projected['id'] = user['id']
+    return projected
+
+def public_user(user):
+    """user without PRIVATE_FIELDS, for API responses"""
+    if user is None:
+        return None
+    return {field: value for field, value in user.items() if field not in PRIVATE_FIELDS}
+
+class UserRepository(ABC):
+    """
+    Storage interface for user accounts. Users are plain dicts whose
+    identifier is the string 'id'; fields, where accepted, limits the fields
+    read. Backends implement every abstract method; create(), update() and
+    iter() are built on them.
+    """
+
+    @abstractmethod
+    def get(self, user_id, fields=None):
+        """The user, or None if there is no such user"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_many(self, user_ids, fields=None):
+        """Users in the order of user_ids, with None for unknown ids, in as few reads as possible"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_by_email(self, email, fields=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_by_emails(self, emails, fields=None):
+        """{email: user} for the emails that belong to a user, in as few reads as possible"""
+        raise NotImplementedError
+
+    def create(self, user):
+        """Store a new user; returns it with its new id"""
+        return self.create_many([user])[0]
+
+    @abstractmethod
+    def create_many(self, users):
+        """Store new users in batched writes; returns them with their ids"""
+        raise NotImplementedError
+
+    def update(self, user_id, fields):
+        """Set fields on a user; returns False if there is no such user"""
+        return self.update_many({user_id: fields})[user_id]
+
+    @abstractmethod
+    def update_many(self, updates):
+        """Apply {user_id: fields} in batched writes; returns {user_id: found}"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, user_id):
+        """Delete a user; returns False if there was no such user"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def page(self, limit, start_after=None, fields=None):
+        """
+        One page of users ordered by id. start_after is the next_page_token of
+        the previous page. Returns (users, next_page_token), the token being
+        None after the last page. Raises ValueError for a malformed token.
+        """
+        raise NotImplementedError
+
+    def iter(self, fields=None, start_after=None, page_size=500):
+        """Yield every user, holding only one page in memory"""
+        while True:
+            users, start_after = self.page(page_size, start_after, fields)
+            yield from users
+            if start_after is None:
+                return
+
+class InMemoryUserRepository(UserRepository):
+    """Users in a dict; for tests, benchmarks and running without a database"""
+
+    def __init__(self):
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, fields=None):
+        with self._lock:
+            return project(self._users.get(user_id), fields)
+
+    def get_many(self, user_ids, fields=None):
+        with self._lock:
+            return [project(self._users.get(user_id), fields) for user_id in user_ids]
+
+    def find_by_email(self, email, fields=None):
+        with self._lock:
+            for user in self._users.values():
+                if user.get('email') == email:
+                    return project(user, fields)
+        return None
+
+    def find_by_emails(self, emails, fields=None):
+        wanted = set(emails)
+        with self._lock:
+            return {user['email']: project(user, fields) for user in self._users.values()
+                    if user.get('email') in wanted}
+
+    def create_many(self, users):
+        created = []
+        with self._lock:
+            for user in users:
+                user = dict(user, id=str(ObjectId()))
+                self._users[user['id']] = user
+                created.append(dict(user))
+        return created
+
+    def update_many(self, updates):
+        found = {}
+        with self._lock:
+            for user_id, fields in updates.items():
+                user = self._users.get(user_id)
+                found[user_id] = user is not None
+                if user is not None:
+                    user.update(fields)
+        return found
+
+    def delete(self, user_id):
+        with self._lock:
+            return self._users.pop(user_id, None) is not None
+
+    def page(self, limit, start_after=None, fields=None):
+        with self._lock:
+            ids = sorted(user_id for user_id in self._users if start_after is None or user_id > start_after)[:limit]
+            users = [project(self._users[user_id], fields) for user_id in ids]
+        return users, (ids[-1] if len(ids) == limit else None)
+
+class MongoUserRepository(UserRepository):
+    """Users in the MongoDB users collection, keyed by ObjectId"""
+
+    def __init__(self, collection=None):
+        self._collection = collection
+
+    @property
+    def collection(self):
+        collection = self._collection if self._collection is not None else get_collection('users')
+        if collection is None:
+            raise RuntimeError('MongoDB is not available')
+        return collection
+
+    @staticmethod
+    def _projection(fields):
+        return dict.fromkeys(fields, 1) if fields else None
+
+    @staticmethod
+    def _to_user(document):
+        if document is None:
+            return None
+        document['id'] = str(document.pop('_id'))
+        return document
+
+    def get(self, user_id, fields=None):
+        if not ObjectId.is_valid(user_id):
+            return None
+        return self._to_user(self.collection.find_one({'_id': ObjectId(user_id)}, self._projection(fields)))
+
+    def get_many(self, user_ids, fields=None):
+        object_ids = [ObjectId(user_id) for user_id in set(user_ids) if ObjectId.is_valid(user_id)]
+        users = {}
+        if object_ids:
+            for document in self.collection.find({'_id': {'$in': object_ids}}, self._projection(fields)):
+                user = self._to_user(document)
+                users[user['id']] = user
+        return [project(users.get(user_id)) for user_id in user_ids]
+
+    def find_by_email(self, email, fields=None):
+        return self._to_user(self.collection.find_one({'email': email}, self._projection(fields)))
+
+    def find_by_emails(self, emails, fields=None):
+        projection = self._projection(list(fields) + ['email'] if fields else None)
+        users = {}
+        for document in self.collection.find({'email': {'$in': list(set(emails))}}, projection):
+            user = self._to_user(document)
+            users[user['email']] = project(user, fields)
+        return users
+
+    def create_many(self, users):
+        documents = [dict(user, _id=ObjectId()) for user in users]
+        if documents:
+            self.collection.insert_many(documents, ordered=True)
+        return [self._to_user(document) for document in documents]
+
+    def update(self, user_id, fields):
+        if not ObjectId.is_valid(user_id):
+            return False
+        return self.collection.update_one({'_id': ObjectId(user_id)}, {'$set': fields}).matched_count == 1
+
+    def update_many(self, updates):
+        found = {user_id: False for user_id in updates}
+        valid = {user_id: fields for user_id, fields in updates.items() if ObjectId.is_valid(user_id)}
+        if not valid:
+            return found
+        object_ids = [ObjectId(user_id) for user_id in valid]
+        existing = {str(document['_id']) for document in self.collection.find({'_id': {'$in': object_ids}}, {'_id': 1})}
+        operations = [UpdateOne({'_id': ObjectId(user_id)}, {'$set': fields})
+                      for user_id, fields in valid.items() if user_id in existing]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        found.update(dict.fromkeys(existing, True))
+        return found
+
+    def delete(self, user_id):
+        if not ObjectId.is_valid(user_id):
+            return False
+        return self.collection.delete_one({'_id': ObjectId(user_id)}).deleted_count == 1
+
+    def page(self, limit, start_after=None, fields=None):
+        query = {}
+        if start_after:
+            if not ObjectId.is_valid(start_after):
+                raise ValueError('Invalid page token')
+            query['_id'] = {'$gt': ObjectId(start_after)}
+        documents = self.collection.find(query, self._projection(fields)).sort('_id', 1).limit(limit)
+        users = [self._to_user(document) for document in documents]
+        return users, (users[-1]['id'] if len(users) == limit else None)
+
+class FirestoreUserRepository(UserRepository):
+    """
+    Users in a Firestore collection, keyed by document id. Calls go through
+    offload() because gRPC would otherwise block an eventlet worker's hub.
+    """
+
+    # Firestore allows at most 500 writes per batch
+    BATCH_SIZE = 500
+    IN_QUERY_SIZE = 30  # Firestore's limit on the values of an 'in' filter
+
+    def __init__(self, collection='users', client=None):
+        self.collection_name = collection
+        self._client = client
+
+    @property
+    def client(self):
+        client = self._client or get_firestore()
+        if client is None:
+            raise RuntimeError('Firestore is not available')
+        return client
+
+    @property
+    def collection(self):
+        return self.client.collection(self.collection_name)
+
+    @staticmethod
+    def _options():
+        from google.api_core.retry import Retry
+        # Retry transient errors, bounded by FIRESTORE_RETRY_DEADLINE
+        return {'retry': Retry(deadline=Config.FIRESTORE_RETRY_DEADLINE), 'timeout': Config.FIRESTORE_TIMEOUT}
+
+    @staticmethod
+    def _to_user(snapshot):
+        if not snapshot.exists:
+            return None
+        user = snapshot.to_dict() or {}
+        user['id'] = snapshot.id
+        return user
+
+    @timed('firestore.get')
+    def get(self, user_id, fields=None):
+        return self._to_user(offload(self.collection.document(user_id).get, field_paths=fields, **self._options()))
+
+    @timed('firestore.get_many')
+    def get_many(self, user_ids, fields=None):
+        collection = self.collection
+        unique_ids = list(dict.fromkeys(user_ids))
+        snapshots = offload(lambda: list(self.client.get_all(
+            [collection.document(user_id) for user_id in unique_ids],
+            field_paths=fields,
+            **self._options()
+        )))
+        users = {snapshot.id: self._to_user(snapshot) for snapshot in snapshots}
+        return [project(users.get(user_id)) for user_id in user_ids]
+
+    @timed('firestore.find_by_email')
+    def find_by_email(self, email, fields=None):
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        query = self.collection.where(filter=FieldFilter('email', '==', email)).limit(1)
+        if fields:
+            query = query.select(fields)
+        for snapshot in offload(lambda: list(query.stream(**self._options()))):
+            return self._to_user(snapshot)
+        return None
+
+    @timed('firestore.find_by_emails')
+    def find_by_emails(self, emails, fields=None):
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        emails = list(set(emails))
+        users = {}
+        for offset in range(0, len(emails), self.IN_QUERY_SIZE):
+            query = self.collection.where(filter=FieldFilter('email', 'in', emails[offset:offset + self.IN_QUERY_SIZE]))
+            if fields:
+                query = query.select(list(fields) + ['email'])
+            for snapshot in offload(lambda: list(query.stream(**self._options()))):
+                user = self._to_user(snapshot)
+                users[user['email']] = project(user, fields)
+        return users
+
+    @timed('firestore.create_many')
+    def create_many(self, users):
+        collection = self.collection
+        created = []
+        for offset in range(0, len(users), self.BATCH_SIZE):
+            batch = self.client.batch()
+            for user in users[offset:offset + self.BATCH_SIZE]:
+                doc_ref = collection.document()
+                batch.create(doc_ref, user)
+                created.append(dict(user, id=doc_ref.id))
+            offload(batch.commit, **self._options())
+        return created
+
+    @timed('firestore.update_many')
+    def update_many(self, updates):
+        from google.api_core.exceptions import NotFound
+
+        collection = self.collection
+        if len(updates) == 1:
+            # update() carries an exists precondition, so a missing user costs no extra read
+            [(user_id, fields)] = updates.items()
+            try:
+                offload(collection.document(user_id).update, fields, **self._options())
+                return {user_id: True}
+            except NotFound:
+                return {user_id: False}
+
+        # A batch fails as a whole on a missing document, so look the ids up first
+        found = {user_id: user is not None for user_id, user in zip(updates, self.get_many(list(updates), fields=[]))}
+        present = [user_id for user_id in updates if found[user_id]]
+        for offset in range(0, len(present), self.BATCH_SIZE):
+            batch = self.client.batch()
+            for user_id in present[offset:offset + self.BATCH_SIZE]:
+                batch.update(collection.document(user_id), updates[user_id])
+            offload(batch.commit, **self._options())
+        return found
+
+    @timed('firestore.delete')
+    def delete(self, user_id):
+        from google.api_core.exceptions import NotFound
+
+        # One round-trip: the exists precondition replaces a read before the delete
+        try:
+            offload(self.collection.document(user_id).delete,
+                    option=self.client.write_option(exists=True), **self._options())
+            return True
+        except NotFound:
+            return False
+
+    @timed('firestore.page')
+    def page(self, limit, start_after=None, fields=None):
+        from google.cloud.firestore_v1.field_path import FieldPath
+
+        collection = self.collection
+        query = collection.order_by(FieldPath.document_id()).limit(limit)
+        if fields:
+            query = query.select(fields)
+        if start_after:
+            query = query.start_after({FieldPath.document_id(): collection.document(start_after)})
+        users = [self._to_user(snapshot) for snapshot in offload(lambda: list(query.stream(**self._options())))]
+        return users, (users[-1]['id'] if len(users) == limit else None)
+
+class CachedUserRepository(UserRepository):
+    """
+    Read-through cache in front of any UserRepository.
+
+    User documents without their PRIVATE_FIELDS are cached by id (missing ids
+    for USER_CACHE_NEGATIVE_TTL seconds) and projected on the way out; reads
+    that ask for a private field go to the backend. Every write through this
+    repository invalidates the ids it touches in every tier and leaves a
+    marker, so a read that started before the write cannot put the old
+    document back. Email lookups and pages are not cached.
+    """
+
+    NOT_FOUND = '__not_found__'
+
+    # Longer than any backend read, so a read that raced a write sees its marker
+    INVALIDATION_TTL = 60
+
+    def __init__(self, backend, cache=None):
+        self.backend = backend
+        self.cache = cache or TieredCache(
+            TTLCache(Config.USER_CACHE_SIZE, Config.USER_CACHE_TTL),
+            SqliteCache(Config.USER_CACHE_SHARED_PATH, Config.USER_CACHE_SHARED_TTL)
+            if Config.USER_CACHE_SHARED_PATH else None
+        )
+
+    @staticmethod
+    def _key(user_id):
+        return f'user:{user_id}'
+
+    @staticmethod
+    def _private(fields):
+        return fields is not None and any(field in PRIVATE_FIELDS for field in fields)
+
+    def _store(self, user_id, user, read_at):
+        """Cache what the backend returned at read_at, unless the user was written since"""
+        invalidated_at = self.cache.get(f'{self._key(user_id)}:invalidated')
+        if invalidated_at is not None and invalidated_at >= read_at:
+            return
+        if user is None:
+            self.cache.set(self._key(user_id), self.NOT_FOUND, Config.USER_CACHE_NEGATIVE_TTL)
+        else:
+            self.cache.set(self._key(user_id), public_user(user))
+
+    def _invalidate(self, user_ids):
+        now = time.time()
+        for user_id in user_ids:
+            self.cache.set(f'{self._key(user_id)}:invalidated', now, self.INVALIDATION_TTL)
+            self.cache.delete(self._key(user_id))
+
+    def _cached(self, user_id):
+        """(hit, user) from the cache; user is None for a cached missing id"""
+        cached = self.cache.get(self._key(user_id))
+        if cached is None:
+            return False, None
+        return True, (None if cached == self.NOT_FOUND else cached)
+
+    def get(self, user_id, fields=None):
+        if self._private(fields):
+            return self.backend.get(user_id, fields)
+        hit, user = self._cached(user_id)
+        if not hit:
+            read_at = time.time()
+            user = self.backend.get(user_id)
+            self._store(user_id, user, read_at)
+        return project(public_user(user), fields)
+
+    def get_many(self, user_ids, fields=None):
+        if self._private(fields):
+            return self.backend.get_many(user_ids, fields)
+        users = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            hit, user = self._cached(user_id)
+            if hit:
+                users[user_id] = user
+            else:
+                missing.append(user_id)
+        if missing:
+            read_at = time.time()
+            for user_id, user in zip(missing, self.backend.get_many(missing)):
+                self._store(user_id, user, read_at)
+                users[user_id] = public_user(user)
+        return [project(users[user_id], fields) for user_id in user_ids]
+
+    def find_by_email(self, email, fields=None):
+        return self.backend.find_by_email(email, fields)
+
+    def find_by_emails(self, emails, fields=None):
+        return self.backend.find_by_emails(emails, fields)
+
+    def create_many(self, users):
+        created = self.backend.create_many(users)
+        self._invalidate(user['id'] for user in created)
+        return created
+
+    def update_many(self, updates):
+        try:
+            found = self.backend.update_many(updates)
+        finally:
+            # Invalidate even on failure: part of the batch may have been written
+            self._invalidate(updates)
+        return found
+
+    def delete(self, user_id):
+        deleted = self.backend.delete(user_id)
+        self._invalidate([user_id])
+        return deleted
+
+    def page(self, limit, start_after=None, fields=None):
+        return self.backend.page(limit, start_after, fields)
+
+def migrate_users(source, target, page_size=500, dry_run=False):
+    """
+    Copy every user of source into target, a page at a time. Users get new
+    ids in target and keep their old one as legacy_id. Users whose email
+    target already has are skipped, so the copy can be rerun. Returns counts
+    per outcome.
+    """
+    counts = {'copied': 0, 'already present': 0, 'without email': 0}
+    start_after = None
+    while True:
+        users, start_after = source.page(page_size, start_after)
+        existing = target.find_by_emails([user['email'] for user in users if user.get('email')], fields=['email'])
+        copies = []
+        for user in users:
+            if not user.get('email'):
+                logger.warning(f"User {user['id']} has no email; not copied")
+                counts['without email'] += 1
+            elif user['email'] in existing:
+                counts['already present'] += 1
+            else:
+                existing[user['email']] = user
+                copies.append({**{field: value for field, value in user.items() if field != 'id'},
+                               'legacy_id': user['id']})
+        if copies and not dry_run:
+            target.create_many(copies)
+        counts['copied'] += len(copies)
+        if start_after is None:
+            return counts
+
+def create_user_repository(store=None):
+    """The cached repository for USER_STORE ('mongo', 'firestore' or 'memory')"""
+    store = store or Config.USER_STORE
+    backends = {
+        'mongo': MongoUserRepository,
+        'firestore': FirestoreUserRepository,
+        'memory': InMemoryUserRepository
+    }
+    if store not in backends:
+        raise ValueError(f'Unknown USER_STORE {store!r}; expected one of {sorted(backends)}')
+    return CachedUserRepository(backends[store]())
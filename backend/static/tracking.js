@@ -2,8 +2,16 @@ class ReccyTracker {
     constructor(userId, apiUrl) {
         this.userId = userId;
         this.apiUrl = apiUrl;
+        this.sessionId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
         this.sessionStartTime = Date.now();
         this.lastInteractionTime = this.sessionStartTime;
+
+        // Events are sent in batches (NDJSON, one event per line)
+        this.queue = [];
+        this.batchSize = 20;
+        this.flushInterval = 5000; // ms
+        this.flushTimer = null;
+
         this.setupTracking();
     }
 
@@ -14,10 +22,11 @@ class ReccyTracker {
         // Track clicks
         document.addEventListener('click', (e) => {
             this.trackInteraction('click', {
-                element: e.target.tagName,
                 elementId: e.target.id,
-                elementClass: e.target.className,
+                elementClass: String(e.target.className),
                 text: e.target.textContent?.substring(0, 100)
+            }, {
+                element: e.target.tagName
             });
         });
 
@@ -39,6 +48,7 @@ class ReccyTracker {
         document.addEventListener('visibilitychange', () => {
             if (document.visibilityState === 'hidden') {
                 this.trackTimeOnPage();
+                this.flush();
             }
         });
 
@@ -51,22 +61,43 @@ class ReccyTracker {
         });
     }
 
-    async trackInteraction(type, data = {}) {
-        try {
-            const interaction = {
-                user_id: this.userId,
-                type: type,
+    trackInteraction(type, properties = {}, fields = {}) {
+        // Fields of the /track-interaction event schema; anything else goes under properties
+        this.queue.push({
+            type: type,
+            timestamp: Date.now(),
+            session_id: this.sessionId,
+            url: window.location.href.substring(0, 2048),
+            ...fields,
+            properties: {
                 page: window.location.pathname,
-                timestamp: new Date().toISOString(),
-                ...data
-            };
+                ...properties
+            }
+        });
 
-            await fetch(`${this.apiUrl}/track-interaction`, {
+        if (this.queue.length >= this.batchSize) {
+            this.flush();
+        } else if (!this.flushTimer) {
+            this.flushTimer = setTimeout(() => this.flush(), this.flushInterval);
+        }
+    }
+
+    async flush() {
+        clearTimeout(this.flushTimer);
+        this.flushTimer = null;
+        if (!this.queue.length) {
+            return;
+        }
+        const events = this.queue.splice(0);
+
+        try {
+            await fetch(`${this.apiUrl}/track-interaction?user_id=${encodeURIComponent(this.userId)}`, {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json'
+                    'Content-Type': 'application/x-ndjson'
                 },
-                body: JSON.stringify(interaction)
+                body: events.map((event) => JSON.stringify(event)).join('\n'),
+                keepalive: true // lets the last batch finish after the page is hidden
             });
         } catch (error) {
             console.error('Failed to track interaction:', error);
@@ -75,8 +106,9 @@ class ReccyTracker {
 
     trackPageView() {
         this.trackInteraction('pageview', {
-            title: document.title,
-            referrer: document.referrer
+            title: document.title.substring(0, 256)
+        }, {
+            referrer: document.referrer.substring(0, 2048)
         });
     }
 
@@ -0,0 +1,24 @@
+import os
+import sys
+
+# Never reach for the cluster in backend/.env; tests install mongomock instead
+os.environ['MONGODB_URI'] = ''
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import mongomock
+import pytest
+from backend.database import storage
+
+@pytest.fixture
+def mongo():
+    """A fresh mongomock database with the declared indexes, used by every service"""
+    storage.install(mongomock.MongoClient(), database='reccy_ai_test')
+    yield storage.get_db()
+    storage.install()
+
+@pytest.fixture
+def no_mongo():
+    """Storage reported unavailable, so services use their in-memory fallbacks"""
+    storage.install()
+    yield
+    storage.install()
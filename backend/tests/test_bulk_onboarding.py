@@ -0,0 +1,121 @@
+import json
+import pytest
+from backend.services.auth_service import AuthService
+from backend.services.bulk_onboarding import BulkOnboarding, BulkSignupError, parse_upload, validate_row
+from backend.services.rate_limiter import TokenBucketLimiter
+from backend.services.scrape_history import ScrapeHistory
+from backend.services.user_repository import InMemoryUserRepository
+
+ROW = {'email': 'owner@example.com', 'password': 'secret', 'website_url': 'https://example.com'}
+
+class StubScraper:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.saved = {}
+        self.calls = []
+
+    def scrape_pages(self, urls):
+        self.calls.append(urls)
+        return [{'content': [], 'recommendations': None, 'cached': False, 'error': 'unreachable'}
+                if url in self.failing else {'content': [{'text': url}], 'recommendations': None, 'cached': False}
+                for url in urls]
+
+    def save_recommendations_many(self, recommendations):
+        self.saved.update(recommendations)
+
+class StubRecommender:
+    def get_recommendations_many(self, contents):
+        return [{'industry': 'retail', 'recommendations': []} for _ in contents]
+
+class StubJobs:
+    def __init__(self):
+        self.enqueued = []
+
+    def enqueue(self, kind, payload, user_id=None, dedup_key=None, created_by=None):
+        self.enqueued.append((kind, payload, created_by))
+        return {'job_id': f'job{len(self.enqueued)}'}
+
+@pytest.fixture
+def onboarding(no_mongo):
+    users = InMemoryUserRepository()
+    return BulkOnboarding(AuthService(users, secret_key='test-key', previous_keys=[]),
+                          StubScraper(['https://down.example.com']), StubRecommender(), ScrapeHistory(users),
+                          StubJobs(), concurrency=2, batch_size=2, flush_interval=0.01)
+
+def test_csv_upload():
+    body = b'\xef\xbb\xbfEmail, Password ,website_url\r\na@example.com,pw,https://a.example.com\r\n,,\r\nb@example.com,pw,https://b.example.com\r\n'
+    rows = parse_upload(body, 'text/csv')
+    assert [line for line, _ in rows] == [2, 4]
+    assert rows[0][1] == {'email': 'a@example.com', 'password': 'pw', 'website_url': 'https://a.example.com'}
+
+def test_ndjson_and_array_uploads():
+    lines = [json.dumps(ROW), '', json.dumps(dict(ROW, email='other@example.com'))]
+    assert [line for line, _ in parse_upload('\n'.join(lines).encode())] == [1, 3]
+    assert parse_upload(json.dumps([ROW]).encode(), 'application/json') == [(1, ROW)]
+
+@pytest.mark.parametrize('body, content_type, status', [
+    (b'', None, 400),
+    (b'   \n', None, 400),
+    (b'\xff\xfe', None, 400),
+    (b'email,password\nx,y', 'text/csv', 400),
+    (b'[{"email": ', None, 400),
+    (b'[' * 100000 + b']' * 100000, None, 400),
+    (b'x' * 101, None, 413),
+    ('\n'.join([json.dumps(ROW)] * 4).encode(), None, 413)
+])
+def test_rejected_uploads(body, content_type, status):
+    with pytest.raises(BulkSignupError) as error:
+        parse_upload(body, content_type, max_rows=3, max_bytes=100 if body == b'x' * 101 else None)
+    assert error.value.status == status
+
+def test_validate_row():
+    assert validate_row(json.dumps(dict(ROW, email=' owner@example.com ', extra=1))) == ROW
+
+@pytest.mark.parametrize('raw', [
+    '[]', '{not json', dict(ROW, email=''), dict(ROW, email='no-at-sign'), dict(ROW, website_url='ftp://example.com'),
+    dict(ROW, password=5), dict(ROW, website_url='https://example.com/' + 'x' * 2048)
+])
+def test_invalid_rows(raw):
+    with pytest.raises(ValueError):
+        validate_row(raw)
+
+def test_run_reports_every_row(onboarding):
+    onboarding.users.create(dict(ROW, email='taken@example.com'))
+    rows = [
+        (1, dict(ROW, email='a@example.com', website_url='https://a.example.com')),
+        (2, dict(ROW, email='a@example.com')),
+        (3, dict(ROW, email='taken@example.com')),
+        (4, '{"email": ' * 10000),
+        (5, '[' * 100000 + ']' * 100000),
+        (6, dict(ROW, email='b@example.com', website_url='https://down.example.com')),
+        (7, dict(ROW, email='c@example.com', website_url='https://c.example.com'))
+    ]
+    results = list(onboarding.run(rows, import_id='import1', created_by='admin1'))
+    summary = results.pop()
+    assert summary == {'status': 'done', 'import_id': 'import1', 'rows': 7, 'created': 3, 'failed': 4}
+
+    by_line = {result['line']: result for result in results}
+    assert {line for line, result in by_line.items() if result['status'] == 'created'} == {1, 6, 7}
+    assert by_line[2]['error'] == 'Email appears more than once in the upload'
+    assert by_line[3]['error'] == 'Email already exists'
+    assert by_line[5]['error'] == 'row is nested too deeply'
+    assert by_line[1]['industry'] == 'retail' and by_line[1]['scrape_version'] == 1
+    assert by_line[6]['industry'] is None and by_line[6]['job_id'] == 'job1'
+    assert onboarding.jobs.enqueued[0][2] == 'admin1'
+    assert all('token' not in result for result in results)
+    assert onboarding.scraper.calls == [['https://a.example.com', 'https://down.example.com'], ['https://c.example.com']]
+
+    created = onboarding.users.find_by_email('a@example.com')
+    assert created['import_id'] == 'import1' and created['created_by'] == 'admin1'
+    assert created['last_scrape']['version'] == 1
+    assert onboarding.history.get(created['id'], 1)['url'] == 'https://a.example.com'
+    assert set(onboarding.scraper.saved) == {'https://a.example.com', 'https://c.example.com'}
+
+def test_admit_rate_limits_per_user(onboarding):
+    rows = [(line, ROW) for line in range(1, 11)]
+    onboarding.limiter = TokenBucketLimiter(rate=1, burst=15)
+    onboarding.admit('user1', rows)
+    with pytest.raises(BulkSignupError) as error:
+        onboarding.admit('user1', rows)
+    assert error.value.status == 429 and error.value.retry_after > 0
+    onboarding.admit('user2', rows)
@@ -0,0 +1,71 @@
+import threading
+import time
+import mongomock
+import pytest
+from pymongo.errors import ConnectionFailure
+from backend import database
+from backend.config import Config
+from backend.database import storage
+
+class FlakyClient:
+    """A mongomock client whose ping fails until up is set, and blocks while gate is clear"""
+
+    def __init__(self):
+        self.client = mongomock.MongoClient()
+        self.up = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    @property
+    def admin(self):
+        return self
+
+    def command(self, name):
+        self.gate.wait(5)
+        if not self.up.is_set():
+            raise ConnectionFailure('server down')
+        return {'ok': 1}
+
+    def __getitem__(self, name):
+        return self.client[name]
+
+@pytest.fixture
+def flaky(monkeypatch):
+    monkeypatch.setattr(Config, 'MONGO_CONNECT_RETRIES', 1)
+    monkeypatch.setattr(Config, 'MONGO_RECONNECT_INTERVAL', 0)
+    applied = []
+    monkeypatch.setattr(database, 'ensure_indexes', lambda db: applied.append(db) or [])
+    client = FlakyClient()
+    storage.install(client, database='reccy_ai_test')
+    yield client, applied
+    client.gate.set()
+    storage.install()
+
+def wait_for_db(timeout=5):
+    deadline = time.monotonic() + timeout
+    while storage.get_db() is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return storage.get_db()
+
+def test_reconnect_runs_in_the_background(flaky):
+    client, applied = flaky
+    assert storage.get_db() is None
+
+    # While the reconnect waits on the server, callers get the fallback at once
+    client.gate.clear()
+    started = time.monotonic()
+    assert storage.get_db() is None
+    assert storage.get_db() is None
+    assert time.monotonic() - started < 0.5
+
+    client.up.set()
+    client.gate.set()
+    assert wait_for_db() is not None
+    assert len(applied) == 1
+
+def test_indexes_are_applied_once_per_client(flaky):
+    client, applied = flaky
+    client.up.set()
+    assert storage.get_db() is not None
+    assert storage.get_db() is not None
+    assert len(applied) == 1
@@ -0,0 +1,53 @@
+import glob
+import os
+import time
+import mongomock
+from bson import ObjectId, json_util
+from backend.services.event_writer import BufferedEventWriter
+
+def writer(tmp_path, collection, **kwargs):
+    return BufferedEventWriter('ev', collection=collection, batch_size=10, flush_interval=0.05,
+                               spill_dir=str(tmp_path), **kwargs)
+
+def wait_for_count(collection, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while collection.count_documents({}) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return collection.count_documents({})
+
+def test_corrupt_spill_lines_are_quarantined_and_the_thread_survives(tmp_path):
+    collection = mongomock.MongoClient().db.ev
+    spilled = [{'_id': ObjectId(), 'n': n} for n in range(2)]
+    with open(tmp_path / 'ev-1.ndjson', 'w') as spill:
+        spill.writelines(json_util.dumps(event) + '\n' for event in spilled)
+        spill.write('{"broken')
+
+    events = writer(tmp_path, collection)
+    events.write({'n': 2})
+    assert wait_for_count(collection, 3) == 3
+
+    # The writer thread keeps flushing after the replay
+    events.write({'n': 3})
+    assert wait_for_count(collection, 4) == 4
+    assert events._thread.is_alive()
+    events.close()
+
+    assert sorted(os.listdir(tmp_path)) == [f'ev-{os.getpid()}.corrupt']
+    assert (tmp_path / f'ev-{os.getpid()}.corrupt').read_text() == '{"broken\n'
+
+def test_failed_replay_releases_the_claimed_file(tmp_path):
+    class Flaky:
+        calls = 0
+
+        def insert_many(self, events, ordered=True):
+            self.calls += 1
+            if self.calls > 1:
+                raise RuntimeError('replay failed')
+
+    (tmp_path / 'ev-1.ndjson').write_text(json_util.dumps({'_id': ObjectId()}) + '\n')
+    events = writer(tmp_path, Flaky())
+    events.write({'n': 0})
+    events.flush()
+    events.close()
+
+    assert [os.path.basename(path) for path in glob.glob(str(tmp_path / '*'))] == ['ev-1.ndjson']
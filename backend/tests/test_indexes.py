@@ -0,0 +1,23 @@
+from backend.indexes import INDEXES, OBSOLETE_INDEXES, QUERY_SHAPES, check_query_coverage, ensure_indexes, index_name
+
+def test_every_query_shape_uses_an_index(mongo):
+    assert check_query_coverage(mongo) == []
+
+def test_missing_index_is_reported(mongo):
+    mongo.users.drop_index('email_1')
+    uncovered = dict(check_query_coverage(mongo))
+    assert list(uncovered) == ['user by email']
+    assert 'COLLSCAN' in uncovered['user by email']
+
+def test_every_shape_names_a_planned_collection():
+    assert {shape['collection'] for shape in QUERY_SHAPES} <= set(INDEXES)
+
+def test_migration_is_idempotent_and_drops_obsolete_indexes(mongo):
+    assert ensure_indexes(mongo) == []
+
+    mongo.analytics.create_index([('user_id', 1), ('date', -1)])
+    assert ensure_indexes(mongo) == ['analytics.user_id_1_date_-1: dropped (obsolete)']
+    for collection, names in OBSOLETE_INDEXES.items():
+        assert not set(names) & set(mongo[collection].index_information())
+    for collection, specs in INDEXES.items():
+        assert {index_name(spec['keys']) for spec in specs} <= set(mongo[collection].index_information())
@@ -0,0 +1,35 @@
+import os
+import shutil
+import numpy as np
+from backend.services.industry_model import IndustryModel
+
+def small_model(fingerprint):
+    model = IndustryModel.train(['software cloud api', 'hotel flight cruise'], ['Technology', 'Travel'],
+                                n_features=1024)
+    model.fingerprint = fingerprint
+    return model
+
+def test_save_swaps_versions_behind_a_symlink(tmp_path):
+    path = tmp_path / 'industry_tfidf'
+    # A plain directory, as written by earlier releases
+    small_model('old').save(tmp_path / 'old')
+    shutil.copytree(tmp_path / 'old', path)
+    shutil.rmtree(os.path.realpath(tmp_path / 'old'))
+    os.unlink(tmp_path / 'old')
+
+    small_model('v1').save(path)
+    assert path.is_symlink() and IndustryModel.load(path).fingerprint == 'v1'
+    first = os.path.realpath(path)
+
+    small_model('v2').save(path)
+    assert IndustryModel.load(path).fingerprint == 'v2'
+    assert not os.path.exists(first)
+    assert {entry.name for entry in tmp_path.iterdir()} == {'industry_tfidf', os.path.basename(os.path.realpath(path))}
+
+def test_zero_counts_weigh_nothing():
+    model = small_model(None)
+    with np.errstate(all='raise'):
+        scores = model.score_matrix([[('software', 0), ('cloud', 2)], [('hotel', 0)], []])
+    assert np.isfinite(scores).all()
+    assert model.labels[int(np.argmax(scores[0]))] == 'Technology'
+    assert not scores[1].any() and not scores[2].any()
@@ -0,0 +1,132 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from backend.services.interaction_service import (InteractionError, InteractionService, check_keys, parse_timestamp,
+                                                  validate_event)
+from backend.services.user_repository import InMemoryUserRepository
+
+RECEIVED_AT = datetime(2024, 6, 1, 12, 0)
+USER_ID = '0123456789abcdef01234567'
+
+class RecordingWriter:
+    def __init__(self):
+        self.events = []
+
+    def write(self, event):
+        self.events.append(event)
+
+    def flush(self):
+        pass
+
+class FixedLimiter:
+    def __init__(self, allowed=True):
+        self.allowed = allowed
+        self.consumed = []
+
+    def consume(self, key, cost=1):
+        self.consumed.append((key, cost))
+        return (True, 0) if self.allowed else (False, 7)
+
+class TenantRepository(InMemoryUserRepository):
+    """Knows USER_ID and a Firestore-style document id"""
+
+    def __init__(self):
+        super().__init__()
+        for user_id in (USER_ID, 'Xk2aPq9rLm3sTt8uVv1w'):
+            self._users[user_id] = {'id': user_id, 'email': f'{user_id}@example.com'}
+
+@pytest.fixture
+def service():
+    service = InteractionService(TenantRepository(), limiter=FixedLimiter())
+    service.writer = RecordingWriter()
+    return service
+
+def test_timestamp_formats():
+    assert parse_timestamp(None, RECEIVED_AT) == RECEIVED_AT
+    assert parse_timestamp(1717243200000, RECEIVED_AT) == datetime(2024, 6, 1, 12, 0)
+    assert parse_timestamp('2024-06-01T13:00:00+02:00', RECEIVED_AT) == datetime(2024, 6, 1, 11, 0)
+    assert parse_timestamp('2024-06-01T11:30:00', RECEIVED_AT) == datetime(2024, 6, 1, 11, 30)
+
+@pytest.mark.parametrize('value', [
+    -1, 1e300, float('nan'), float('inf'), True, [], '9999-12-31T23:59:59-05:00', 'yesterday',
+    (RECEIVED_AT + timedelta(hours=1)).isoformat()
+])
+def test_bad_timestamps_are_value_errors(value):
+    with pytest.raises(ValueError):
+        parse_timestamp(value, RECEIVED_AT)
+
+def test_event_keeps_only_known_fields():
+    event = validate_event({'type': 'click', 'url': 'https://example.com', 'admin': True, 'properties': {'x': 1}},
+                           USER_ID, RECEIVED_AT)
+    assert event == {'user_id': USER_ID, 'type': 'click', 'timestamp': RECEIVED_AT, 'received_at': RECEIVED_AT,
+                     'url': 'https://example.com', 'properties': {'x': 1}}
+
+@pytest.mark.parametrize('raw', [
+    [], {}, {'type': ''}, {'type': 'x' * 65}, {'type': 'click', 'url': 5}, {'type': 'click', 'element': 'x' * 257},
+    {'type': 'click', 'properties': []}, {'type': 'click', 'properties': {'$where': 1}},
+    {'type': 'click', 'properties': {'a': [{'b.c': 1}]}}
+])
+def test_invalid_events(raw):
+    with pytest.raises(ValueError):
+        validate_event(raw, USER_ID, RECEIVED_AT)
+
+def test_check_keys_allows_plain_keys():
+    check_keys({'a': {'b': [{'c_d': 1}, 2]}, 'price$': 3})
+
+def test_ndjson_batch_reports_bad_lines(service):
+    body = b'\n'.join([
+        json.dumps({'type': 'view'}).encode(),
+        b'',
+        b'{not json',
+        json.dumps({'type': 'click', 'properties': {'$gt': 1}}).encode(),
+        b'[' * 10000 + b']' * 10000,
+        json.dumps({'type': 'click'}).encode()
+    ])
+    result = service.ingest(USER_ID, body)
+    assert result['accepted'] == 2 and result['rejected'] == 3
+    assert [error['line'] for error in result['errors']] == [3, 4, 5]
+    assert [event['type'] for event in service.writer.events] == ['view', 'click']
+    # Only the valid events are charged against the rate limit
+    assert service.limiter.consumed == [(USER_ID, 2)]
+
+def test_tracking_snippet_batch_is_accepted(service):
+    # A pageview and a click as static/tracking.js queues them
+    page = {'type': 'pageview', 'timestamp': 1717243200000, 'session_id': 'lx2k9f-4abc', 'url': 'https://shop.example.com/',
+            'referrer': 'https://search.example.com/', 'properties': {'page': '/', 'title': 'Shop'}}
+    click = {'type': 'click', 'timestamp': 1717243201000, 'session_id': 'lx2k9f-4abc', 'url': 'https://shop.example.com/',
+             'element': 'BUTTON', 'properties': {'page': '/', 'elementId': 'buy', 'elementClass': 'btn', 'text': 'Buy'}}
+    result = service.ingest(USER_ID, '\n'.join(json.dumps(event) for event in (page, click)).encode())
+    assert result['accepted'] == 2
+    assert service.writer.events[0]['properties']['title'] == 'Shop'
+    assert service.writer.events[1]['element'] == 'BUTTON'
+
+def test_tenant_ids_come_from_the_user_store(service):
+    assert service.ingest('Xk2aPq9rLm3sTt8uVv1w', b'{"type": "view"}')['accepted'] == 1
+
+def test_invalid_batch_is_not_charged(service):
+    result = service.ingest(USER_ID, b'{not json\n{"type": ""}')
+    assert result['accepted'] == 0 and result['rejected'] == 2
+    assert service.limiter.consumed == []
+
+def test_json_array_batch(service):
+    result = service.ingest(USER_ID, json.dumps([{'type': 'view'}, 'oops']).encode())
+    assert result == {'accepted': 1, 'rejected': 1, 'errors': [{'line': 2, 'error': 'event must be a JSON object'}]}
+
+@pytest.mark.parametrize('user_id, body, status', [
+    ('not-an-id', b'{"type": "view"}', 400),
+    ('fedcba9876543210fedcba98', b'{"type": "view"}', 400),
+    (None, b'{"type": "view"}', 400),
+    (USER_ID, b'[{"type": ', 400),
+    (USER_ID, b'[' * 100000 + b']' * 100000, 400)
+])
+def test_rejected_batches(service, user_id, body, status):
+    with pytest.raises(InteractionError) as error:
+        service.ingest(user_id, body)
+    assert error.value.status == status
+
+def test_rate_limited_batch(service):
+    service.limiter.allowed = False
+    with pytest.raises(InteractionError) as error:
+        service.ingest(USER_ID, b'{"type": "view"}')
+    assert error.value.status == 429 and error.value.retry_after == 7
+    assert service.writer.events == []
@@ -0,0 +1,132 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from backend.config import Config
+from backend.services.job_service import FAILED, QUEUED, RUNNING, SUCCEEDED, JobService, JobStore
+
+@pytest.fixture(params=['memory', 'mongo'])
+def store(request):
+    request.getfixturevalue('no_mongo' if request.param == 'memory' else 'mongo')
+    return JobStore()
+
+@pytest.fixture
+def jobs(store, monkeypatch):
+    monkeypatch.setattr(Config, 'JOB_RETRY_BACKOFF', 0.01)
+    jobs = JobService(store=store, workers=2)
+    yield jobs
+    jobs.stop()
+
+def wait_for(jobs, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id)
+        if job['status'] in (SUCCEEDED, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} did not finish: {jobs.get(job_id)}')
+
+def job(job_id, status, **fields):
+    now = datetime.utcnow()
+    return dict({'_id': job_id, 'kind': 'test', 'payload': {}, 'status': status, 'attempts': 0, 'max_attempts': 3,
+                 'created_at': now, 'updated_at': now}, **fields)
+
+def test_job_runs_its_handler(jobs):
+    jobs.register('double', lambda payload: payload['n'] * 2)
+    queued = jobs.enqueue('double', {'n': 21}, user_id='user1', created_by='admin1')
+    assert queued['status'] == QUEUED and not queued['deduplicated']
+    finished = wait_for(jobs, queued['job_id'])
+    assert finished['status'] == SUCCEEDED and finished['result'] == 42 and finished['attempts'] == 1
+    assert finished['user_id'] == 'user1' and finished['created_by'] == 'admin1'
+
+def test_unknown_kind_is_rejected(jobs):
+    with pytest.raises(ValueError):
+        jobs.enqueue('missing', {})
+
+def test_active_job_deduplicates(jobs):
+    release = threading.Event()
+    jobs.register('slow', lambda payload: release.wait(5))
+    first = jobs.enqueue('slow', {}, dedup_key='slow:1')
+    second = jobs.enqueue('slow', {}, dedup_key='slow:1')
+    assert second['job_id'] == first['job_id'] and second['deduplicated']
+
+    release.set()
+    wait_for(jobs, first['job_id'])
+    third = jobs.enqueue('slow', {}, dedup_key='slow:1')
+    assert third['job_id'] != first['job_id'] and not third['deduplicated']
+    wait_for(jobs, third['job_id'])
+
+def test_failed_job_is_retried(jobs):
+    calls = []
+
+    def flaky(payload):
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise RuntimeError('try again')
+        return 'done'
+
+    jobs.register('flaky', flaky)
+    finished = wait_for(jobs, jobs.enqueue('flaky', {})['job_id'])
+    assert finished['status'] == SUCCEEDED and finished['attempts'] == 3 and finished['error'] is None
+    # Backoff doubles per attempt
+    assert calls[2] - calls[1] >= 0.015
+
+def test_job_fails_after_max_attempts(jobs):
+    jobs.register('broken', lambda payload: 1 / 0)
+    finished = wait_for(jobs, jobs.enqueue('broken', {}, max_attempts=2)['job_id'])
+    assert finished['status'] == FAILED and finished['attempts'] == 2
+    assert 'division by zero' in finished['error']
+
+def test_lease_guards_claims_and_updates(store):
+    store.insert(job('a', QUEUED))
+    assert store.claim('a', 'worker1', 60)['attempts'] == 1
+    assert store.claim('a', 'worker2', 60) is None
+    assert not store.update('a', {'status': SUCCEEDED}, owner='worker2')
+    assert store.update('a', {'status': SUCCEEDED}, unset_active=True, owner='worker1')
+    assert store.get('a')['status'] == SUCCEEDED
+
+def test_recovery_requeues_expired_leases_and_keeps_backoff(store):
+    # Whole seconds survive the round trip through BSON unchanged
+    now = datetime.utcnow().replace(microsecond=0)
+    later = now + timedelta(minutes=5)
+    store.insert(job('expired', RUNNING, owner='dead', lease_expires_at=now - timedelta(seconds=1)))
+    store.insert(job('leased', RUNNING, owner='alive', lease_expires_at=later))
+    store.insert(job('backing-off', QUEUED, run_after=later))
+
+    recovered = dict(store.recoverable(now))
+    assert recovered == {'expired': now, 'backing-off': later}
+    assert store.get('leased')['status'] == RUNNING
+
+def test_recovery_of_jobs_claimed_before_leases(mongo):
+    store = JobStore()
+    old = datetime.utcnow() - timedelta(seconds=Config.JOB_LEASE_SECONDS + 1)
+    store.insert(job('legacy-stale', RUNNING, updated_at=old))
+    store.insert(job('legacy-recent', RUNNING))
+    assert [job_id for job_id, _ in store.recoverable(datetime.utcnow())] == ['legacy-stale']
+
+def test_insert_retries_when_the_duplicate_finishes_meanwhile(mongo):
+    store = JobStore()
+    store.insert(job('first', QUEUED, dedup_key='key', active=True))
+
+    # The active job finishes between the failed insert and the lookup
+    find_one = mongo.jobs.find_one
+    def finish_then_find(query, *args, **kwargs):
+        mongo.jobs.update_one({'_id': 'first'}, {'$unset': {'active': ''}})
+        mongo.jobs.find_one = find_one
+        return find_one(query, *args, **kwargs)
+    mongo.jobs.find_one = finish_then_find
+
+    assert store.insert(job('second', QUEUED, dedup_key='key', active=True)) is None
+    assert mongo.jobs.find_one is find_one
+    assert store.get('second') is not None
+
+def test_running_service_recovers_jobs_whose_lease_expires_later(jobs, store):
+    jobs.recovery_interval = 0.05
+    jobs.register('test', lambda payload: 'recovered')
+    jobs.start()
+
+    # A worker elsewhere died holding this job, after this service started
+    store.insert(job('orphan', RUNNING, owner='dead', attempts=1,
+                     lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    finished = wait_for(jobs, 'orphan')
+    assert finished['status'] == SUCCEEDED and finished['result'] == 'recovered' and finished['attempts'] == 2
@@ -0,0 +1,53 @@
+from datetime import datetime
+from backend.services.analytics_service import (AnalyticsService, bin_timestamps, bucket_plan, rollup_increments,
+                                                truncate)
+
+def rollups(mongo):
+    return {(rollup['user_id'], rollup['granularity'], rollup['bucket']): (rollup['count'], rollup['industries'])
+            for rollup in mongo.analytics_rollups.find({}, {'_id': 0})}
+
+def test_increments_per_hour_and_day():
+    events = [
+        {'user_id': 'u1', 'industry': 'retail', 'recommendations': [1, 2], 'timestamp': datetime(2024, 6, 1, 9, 15)},
+        {'user_id': 'u1', 'industry': 'a.b$c', 'recommendations': None, 'timestamp': datetime(2024, 6, 1, 9, 45)},
+        {'user_id': 'u1', 'industry': None, 'recommendations': [1], 'timestamp': datetime(2024, 6, 1, 17, 0)}
+    ]
+    totals = rollup_increments(events)
+    assert totals[('u1', 'hour', datetime(2024, 6, 1, 9))] == {'count': 2, 'industries': {'retail': 2, 'a_b_c': 0}}
+    assert totals[('u1', 'day', datetime(2024, 6, 1))] == \
+        {'count': 3, 'industries': {'retail': 2, 'a_b_c': 0, 'Unknown': 1}}
+    assert len(totals) == 3
+
+def test_buckets():
+    now = datetime(2024, 6, 10, 12, 30)
+    assert truncate(now, 'hour') == datetime(2024, 6, 10, 12)
+    assert bucket_plan('weekly', now) == (datetime(2024, 6, 3), 'day', 8, '%Y-%m-%d')
+    counts = bin_timestamps([datetime(2024, 6, 3, 1), datetime(2024, 6, 3, 23), datetime(2024, 6, 10, 12),
+                             datetime(2024, 6, 2, 23), datetime(2024, 6, 11)], datetime(2024, 6, 3), 'day', 8)
+    assert list(counts) == [2, 0, 0, 0, 0, 0, 0, 1]
+
+def test_flushed_events_update_rollups_and_rebuild_matches(mongo):
+    analytics = AnalyticsService()
+    for industry, recommendations in [('retail', ['a', 'b']), ('retail', ['c']), ('saas', [])]:
+        analytics.track_recommendation('u1', recommendations, industry=industry)
+    analytics.track_recommendation('u2', ['a'], industry='retail')
+    analytics.flush()
+
+    assert mongo.analytics.count_documents({}) == 4
+    tracked = rollups(mongo)
+    day = truncate(mongo.analytics.find_one({'user_id': 'u2'})['timestamp'], 'day')
+    assert tracked[('u2', 'day', day)] == (1, {'retail': 1})
+    assert sum(count for (user_id, unit, _), (count, _) in tracked.items() if (user_id, unit) == ('u1', 'day')) == 3
+
+    analytics.rebuild_rollups()
+    assert rollups(mongo) == tracked
+
+def test_rebuild_for_one_user_leaves_others(mongo):
+    analytics = AnalyticsService()
+    analytics.track_recommendation('u1', ['a'], industry='retail')
+    analytics.track_recommendation('u2', ['a'], industry='retail')
+    analytics.flush()
+    mongo.analytics_rollups.update_many({}, {'$inc': {'count': 10}})
+
+    analytics.rebuild_rollups('u1')
+    assert {user_id: count for (user_id, _, _), (count, _) in rollups(mongo).items()} == {'u1': 1, 'u2': 11}
@@ -0,0 +1,31 @@
+import asyncio
+import pytest
+from backend.services.scraper_service import ScraperService
+
+class StubEngine:
+    """Serves pages from a dict; any other URL is refused"""
+
+    def __init__(self, pages=None):
+        self.pages = pages or {}
+
+    def run(self, coro, timeout=None):
+        return asyncio.run(coro)
+
+    async def fetch(self, url, headers=None, max_bytes=None):
+        if url not in self.pages:
+            raise ConnectionRefusedError(f'Cannot connect to {url}')
+        return {'url': url, 'status': 200, 'headers': {'Content-Type': 'text/html'}, 'encoding': 'utf-8',
+                'chunks': [self.pages[url].encode()], 'truncated': False}
+
+def test_crawl_counts_words_across_pages(no_mongo):
+    scraper = ScraperService(engine=StubEngine({
+        'https://example.com/': '<p>Hotels and flights</p><a href="/deals">deals</a>',
+        'https://example.com/deals': '<p>Cheap flights</p>'
+    }))
+    assert dict(scraper.crawl_site('https://example.com/', max_depth=1, max_pages=5, use_sitemap=False)) == \
+        {'flights': 2, 'hotels': 1, 'cheap': 1}
+
+def test_crawl_without_a_single_page_raises(no_mongo):
+    scraper = ScraperService(engine=StubEngine())
+    with pytest.raises(RuntimeError, match='No page of http://127.0.0.1:9/ could be fetched'):
+        scraper.crawl_site('http://127.0.0.1:9/', max_depth=1, max_pages=5)
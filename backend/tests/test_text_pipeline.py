@@ -0,0 +1,47 @@
+from collections import Counter
+from html import escape
+from backend.services.stopwords import ENGLISH_STOP_WORDS
+from backend.services.text_pipeline import ParagraphTokenizer, iter_words
+
+SENTENCES = [
+    "we can't offer a 'single' plan, but we cannot refuse.",
+    "send an email*star rating to support@example.com today!",
+    "he's gonna wanna see the \"best\" deals (and more) -- really?",
+    "'tis the season: 10:30 pm, 1,000 users and 3.5 stars.",
+    "our clients' results were great... they'd say so.",
+    "dr. smith met mr. jones at acme inc. in the u.s. last week.",
+    "rock'n'roll, o'neil's “smart” pricing [beta] {new} <fast> tools.",
+    "students’ books aren't cheap; won't you gimme a deal?",
+    "lemme know if you've got more'n enough gotta-have items.",
+    "prices: $5 & 10% off #deal ``now'' for e-commerce sites.",
+]
+
+# nltk 3.8.1: [t for s in SENTENCES for t in word_tokenize(s) if t.isalnum()]
+NLTK_WORDS = [
+    'we', 'ca', 'offer', 'a', 'plan', 'but', 'we', 'can', 'not', 'refuse',
+    'send', 'an', 'email', 'star', 'rating', 'to', 'support', 'today',
+    'he', 'gon', 'na', 'wan', 'na', 'see', 'the', 'best', 'deals', 'and', 'more', 'really',
+    'is', 'the', 'season', 'pm', 'users', 'and', 'stars',
+    'our', 'clients', 'results', 'were', 'great', 'they', 'say', 'so',
+    'smith', 'met', 'jones', 'at', 'acme', 'in', 'the', 'last', 'week',
+    'smart', 'pricing', 'beta', 'new', 'fast', 'tools',
+    'students', 'books', 'are', 'cheap', 'wo', 'you', 'gim', 'me', 'a', 'deal',
+    'lem', 'me', 'know', 'if', 'you', 'got', 'more', 'enough', 'got', 'ta', 'items',
+    'prices', '5', '10', 'off', 'deal', 'now', 'for', 'sites',
+]
+
+def test_words_match_word_tokenize():
+    assert list(iter_words(' '.join(SENTENCES))) == NLTK_WORDS
+
+def test_streamed_paragraphs_match_word_tokenize_top_words():
+    html = ''.join(f'<p>{escape(sentence.upper(), quote=False)}</p><script>var ignored = 1;</script>'
+                   for sentence in SENTENCES).encode('utf-8')
+
+    tokenizer = ParagraphTokenizer(ENGLISH_STOP_WORDS)
+    # Chunk boundaries fall inside words and multi-byte characters
+    for start in range(0, len(html), 7):
+        tokenizer.feed_bytes(html[start:start + 7])
+    tokenizer.close()
+
+    expected = Counter(word for word in NLTK_WORDS if word not in ENGLISH_STOP_WORDS)
+    assert tokenizer.most_common(50) == expected.most_common(50)
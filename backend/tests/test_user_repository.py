@@ -0,0 +1,149 @@
+import pickle
+import sqlite3
+import pytest
+from backend.services.cache import SqliteCache, TieredCache, TTLCache
+from backend.services.user_repository import (CachedUserRepository, InMemoryUserRepository, MongoUserRepository,
+                                              UserRepository, migrate_users)
+
+@pytest.fixture(params=['memory', 'mongo', 'cached'])
+def users(request):
+    if request.param == 'memory':
+        return InMemoryUserRepository()
+    if request.param == 'mongo':
+        return MongoUserRepository(request.getfixturevalue('mongo').users)
+    return CachedUserRepository(InMemoryUserRepository(), cache=TTLCache(100, 60))
+
+def new_user(number):
+    return {'email': f'user{number}@example.com', 'password': 'secret', 'website_url': f'https://site{number}.example.com'}
+
+def test_repository_is_abstract():
+    with pytest.raises(TypeError):
+        UserRepository()
+
+def test_create_and_read(users):
+    created = users.create(new_user(1))
+    assert created['id']
+    assert users.get(created['id'])['email'] == 'user1@example.com'
+    assert users.get(created['id'], fields=['email']) == {'id': created['id'], 'email': 'user1@example.com'}
+    assert users.find_by_email('user1@example.com')['id'] == created['id']
+    assert users.find_by_email('nobody@example.com') is None
+
+def test_batched_reads_keep_order_and_report_unknown_ids(users):
+    first, second = users.create_many([new_user(1), new_user(2)])
+    unknown = '0' * 24
+    assert [user and user['id'] for user in users.get_many([second['id'], unknown, first['id']])] == \
+        [second['id'], None, first['id']]
+    assert set(users.find_by_emails(['user1@example.com', 'user2@example.com', 'nobody@example.com'])) == \
+        {'user1@example.com', 'user2@example.com'}
+
+def test_update_and_delete(users):
+    user = users.create(new_user(1))
+    assert users.update(user['id'], {'industry': 'retail'})
+    assert users.get(user['id'])['industry'] == 'retail'
+    assert users.update_many({user['id']: {'industry': 'saas'}, '0' * 24: {'industry': 'saas'}}) == \
+        {user['id']: True, '0' * 24: False}
+    assert users.get(user['id'])['industry'] == 'saas'
+    assert users.delete(user['id'])
+    assert users.get(user['id']) is None
+    assert not users.delete(user['id'])
+
+def test_pages_cover_every_user_once(users):
+    created = users.create_many([new_user(number) for number in range(7)])
+    first, token = users.page(3)
+    assert len(first) == 3 and token == first[-1]['id']
+    assert sorted(user['id'] for user in users.iter(page_size=3)) == sorted(user['id'] for user in created)
+
+def test_last_page_has_no_token(users):
+    users.create_many([new_user(number) for number in range(2)])
+    page, token = users.page(5)
+    assert len(page) == 2 and token is None
+
+def test_malformed_page_token_is_rejected(mongo):
+    with pytest.raises(ValueError):
+        MongoUserRepository(mongo.users).page(10, 'not-a-token')
+
+def test_cache_is_invalidated_by_writes():
+    backend = InMemoryUserRepository()
+    users = CachedUserRepository(backend, cache=TTLCache(100, 60))
+    user = users.create(new_user(1))
+    assert users.get(user['id'])['email'] == 'user1@example.com'
+
+    # A write straight to the backend is not seen until the cached entry goes
+    backend.update(user['id'], {'industry': 'retail'})
+    assert 'industry' not in users.get(user['id'])
+    users.update(user['id'], {'website_url': 'https://moved.example.com'})
+    assert users.get(user['id'])['industry'] == 'retail'
+
+    users.delete(user['id'])
+    assert users.get(user['id']) is None
+
+def test_private_fields_are_never_cached(tmp_path):
+    shared = SqliteCache(str(tmp_path / 'users.db'), 300)
+    users = CachedUserRepository(InMemoryUserRepository(), cache=TieredCache(TTLCache(100, 60), shared))
+    user = users.create(new_user(1))
+
+    assert 'password' not in users.get(user['id'])
+    assert 'password' not in users.get_many([user['id']])[0]
+    assert 'password' not in shared.get(f"user:{user['id']}")
+    assert users.get(user['id'], fields=['password']) == {'id': user['id'], 'password': 'secret'}
+
+def test_update_invalidates_every_tier(tmp_path):
+    path = str(tmp_path / 'users.db')
+    backend = InMemoryUserRepository()
+    user = backend.create(new_user(1))
+    # Two workers sharing the SQLite tier, each with its own local tier
+    worker = CachedUserRepository(backend, cache=TieredCache(TTLCache(100, 60), SqliteCache(path, 300)))
+    admin_cli = CachedUserRepository(backend, cache=TieredCache(TTLCache(100, 60), SqliteCache(path, 300)))
+
+    backend.update(user['id'], {'role': 'admin'})
+    assert worker.get(user['id'], fields=['role'])['role'] == 'admin'
+    admin_cli.update(user['id'], {'role': None})
+    worker.cache.local.clear()
+    assert worker.get(user['id'], fields=['role'])['role'] is None
+
+def test_read_racing_a_write_does_not_refill_the_cache():
+    class RacingBackend(InMemoryUserRepository):
+        """The write lands while a cached repository's read is in flight"""
+        race = None
+
+        def get(self, user_id, fields=None):
+            user = super().get(user_id, fields)
+            if self.race:
+                race, self.race = self.race, None
+                race()
+            return user
+
+    backend = RacingBackend()
+    users = CachedUserRepository(backend, cache=TTLCache(100, 60))
+    user = users.create(new_user(1))
+    backend.race = lambda: users.update(user['id'], {'role': 'admin'})
+
+    assert 'role' not in users.get(user['id'])
+    assert users.get(user['id'])['role'] == 'admin'
+
+def test_shared_cache_stores_json_and_ignores_other_formats(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = SqliteCache(path, 300)
+    cache.set('user:1', {'email': 'a@example.com', 'tags': ['x']})
+    assert cache.get('user:1') == {'email': 'a@example.com', 'tags': ['x']}
+    assert sqlite3.connect(path).execute("SELECT value FROM cache WHERE key = 'user:1'").fetchone()[0].startswith('{')
+
+    # A pickled entry from an earlier release is never unpickled
+    cache._connection().execute('UPDATE cache SET value = ? WHERE key = ?', (pickle.dumps(object()), 'user:1'))
+    assert cache.get('user:1') is None
+    cache.set('user:2', object())
+    assert cache.get('user:2') is None
+
+def test_migrate_users_copies_once(mongo):
+    source = InMemoryUserRepository()
+    source.create_many([new_user(number) for number in range(5)] + [{'website_url': 'https://no-email.example.com'}])
+    target = MongoUserRepository(mongo.users)
+
+    assert migrate_users(source, target, page_size=2, dry_run=True) == \
+        {'copied': 5, 'already present': 0, 'without email': 1}
+    assert mongo.users.count_documents({}) == 0
+
+    assert migrate_users(source, target, page_size=2) == {'copied': 5, 'already present': 0, 'without email': 1}
+    assert migrate_users(source, target, page_size=2) == {'copied': 0, 'already present': 5, 'without email': 1}
+    copy = target.find_by_email('user0@example.com')
+    assert copy['legacy_id'] == source.find_by_email('user0@example.com')['id']